@@ -0,0 +1,159 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+import config
+import instrumentation
+import sample_cache
+import sampling
+import snowflake_client
+
+# Set up logging
+logger = common.get_logger()
+
+# Max samples in flight at once: submitted, running in the warehouse, or landed and not yet profiled. Queries beyond
+# what the warehouse runs at once are queued by Snowflake, so this mostly bounds the samples held in memory
+DEFAULT_MAX_IN_FLIGHT = 8
+# Status polling: the delay between polls of a running query starts at POLL_FIRST_DELAY seconds and grows by
+# POLL_BACKOFF each time, up to POLL_MAX_DELAY, so short queries land quickly and long ones aren't polled often
+POLL_FIRST_DELAY = 0.1
+POLL_BACKOFF = 1.5
+POLL_MAX_DELAY = 5.0
+
+# Marks the end of the landed samples
+_DONE = object()
+
+
+def run_on_connection(function, *args):
+    """Run 'function(conn, *args)' on a pooled connection (in one of the event loop's threads)."""
+    with snowflake_client.get_connection_pool().connection() as conn:
+        return function(conn, *args)
+
+
+async def wait_for_query(query_id):
+    """Poll a submitted query until it's finished, backing off between polls. Raises the query's error if it failed."""
+    delay = POLL_FIRST_DELAY
+    while await asyncio.to_thread(run_on_connection, snowflake_client.is_query_running, query_id):
+        await asyncio.sleep(delay)
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+
+async def query_sample(input_table, table_spec):
+    """Submit a table's sample query, wait for it and read its results, returning a DataFrame."""
+    sampling_spec = table_spec.sampling or sampling.DEFAULT_SAMPLING_SPEC
+    sql_query = sampling.build_sample_query(
+        input_table, table_spec.row_count_limit, sampling_spec, projection=table_spec.projection
+    )
+    query_id = await asyncio.to_thread(run_on_connection, snowflake_client.submit_query, sql_query)
+    logger.debug(f"Submitted the sample query of '{input_table}': {query_id}")
+    await wait_for_query(query_id)
+
+    df = await asyncio.to_thread(
+        run_on_connection, snowflake_client.fetch_query_results, query_id, table_spec.row_count_limit, sampling_spec
+    )
+    sampling.report_sample(input_table, len(df), table_spec.row_count, sampling_spec)
+    return df
+
+
+async def fetch_sample(input_table, table_spec, cache=None):
+    """Fetch a table's sample (from the sample cache if it's there), as sample_cache.fetch_sample does."""
+    with instrumentation.table_scope(input_table):
+        sampling_spec = table_spec.sampling or sampling.DEFAULT_SAMPLING_SPEC
+        if cache is not None:
+            key = sample_cache.sample_cache_key(
+                cache, input_table, table_spec.row_count_limit, sampling_spec, table_spec.projection
+            )
+            df = await asyncio.to_thread(sample_cache.read_cached_sample, cache, key, input_table)
+            if df is not None:
+                return config.drop_excluded_columns(df, table_spec.exclude_columns)
+
+        # timed from submission until the results are read, so this includes the time queued in the warehouse
+        with instrumentation.timer("fetch"):
+            df = await query_sample(input_table, table_spec)
+        instrumentation.record("rows", len(df))
+
+        if cache is not None:
+            await asyncio.to_thread(sample_cache.write_cached_sample, cache, key, df)
+
+    return config.drop_excluded_columns(df, table_spec.exclude_columns)
+
+
+class SampleFetcher:
+    """Fetches the input tables' samples concurrently, yielding (input_table, df, error) as each one lands.
+
+    Every table's sample query is submitted without waiting for the others, so the warehouse runs them
+    concurrently. Queries are polled with backoff, and each one's results are read as soon as it finishes, so the
+    caller can profile each sample while the rest are still running. A table that fails is yielded with its error
+    (and no DataFrame) rather than raised. The queries run on an event loop in a background thread.
+
+    A table takes one of 'max_in_flight' slots before its query is submitted, and keeps it until the caller calls
+    release_slot() once it's done with the sample (e.g. once it's been profiled), so at most that many samples are
+    in the warehouse or held in memory at once. A failed table's slot is released when it's yielded.
+    """
+
+    def __init__(self, input_tables, table_specs, cache=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self.input_tables = input_tables
+        self.table_specs = table_specs
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        self.landed = queue.Queue()  # (input_table, df, error), then _DONE
+        self.loop = asyncio.new_event_loop()
+        self.slots = None  # created on the event loop
+        self.main_task = self.loop.create_task(self.fetch_samples())
+        self.thread = threading.Thread(target=self.run_event_loop, name="async_sampler", daemon=True)
+
+    async def fetch_samples(self):
+        # threads for submitting, polling and reading results, which block on the connector
+        max_threads = max(1, min(self.max_in_flight, len(self.input_tables)))
+        self.loop.set_default_executor(ThreadPoolExecutor(max_workers=max_threads))
+        self.slots = asyncio.Semaphore(self.max_in_flight)
+
+        async def fetch(input_table):
+            await self.slots.acquire()
+            try:
+                df = await fetch_sample(input_table, self.table_specs[input_table], self.cache)
+            except Exception as e:
+                self.landed.put((input_table, None, e))
+            else:
+                self.landed.put((input_table, df, None))
+
+        try:
+            # tasks start in the listed order, so the queries are submitted in the tables' scheduled order
+            await asyncio.gather(*(fetch(input_table) for input_table in self.input_tables))
+        finally:
+            self.landed.put(_DONE)
+
+    def run_event_loop(self):
+        try:
+            self.loop.run_until_complete(self.main_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_default_executor())
+            self.loop.close()
+
+    def call_on_loop(self, callback):
+        try:
+            self.loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass  # the loop has finished (and closed), so there's nothing left to fetch
+
+    def release_slot(self, *_):
+        """Free a table's slot, so the next table can be fetched. Can be called from any thread, e.g. as a
+        Future's done callback.
+        """
+        self.call_on_loop(self.slots.release)
+
+    def __iter__(self):
+        self.thread.start()
+        try:
+            while (item := self.landed.get()) is not _DONE:
+                if item[2] is not None:
+                    self.release_slot()
+                yield item
+        finally:
+            # e.g. the caller stopped early: cancel the remaining fetches
+            self.call_on_loop(self.main_task.cancel)
+            self.thread.join()
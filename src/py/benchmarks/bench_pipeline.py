@@ -0,0 +1,184 @@
+"""Benchmark the pipeline end to end (and per stage) against a local SQLite stand-in for Snowflake.
+
+Synthetic tables of '--columns' columns and '--rows' rows (each column with up to '--cardinality' distinct values
+and a '--null-ratio' share of nulls) are written to a SQLite database. Each run then loads them into a new GX
+project, profiles them, builds and validates their expectation suites and patches the data docs, with
+snowflake_client and the GX datasource pointed at the database (see local_warehouse). The best time and
+throughput of each stage is reported, along with the run report of the last run (see instrumentation).
+
+Usage:
+    python src/py/benchmarks/bench_pipeline.py --tables 4 --rows 100000 --columns 20 --repeat 3
+    python src/py/benchmarks/bench_pipeline.py --profiling-mode pushdown --output results.json
+
+Runs offline: no Snowflake connection, credentials or existing GX project are needed.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+import common  # noqa: E402
+import create_gx_data_profiler  # noqa: E402
+import create_gx_expectation_suite  # noqa: E402
+import create_gx_snowflake_table_loader  # noqa: E402
+import instrumentation  # noqa: E402
+import local_warehouse  # noqa: E402
+import rendering  # noqa: E402
+import update_gx_data_docs  # noqa: E402
+from great_expectations.data_context import FileDataContext  # noqa: E402
+
+logger = common.get_logger()
+
+GX_DATA_SRC_NAME = "local_warehouse"
+STAGES = ["load_tables", "profile", "expectation_suites", "data_docs"]
+
+
+def run_stage(stage, input_tables, other_params):
+    """Run a pipeline stage, raising if any table fails."""
+    if stage == "load_tables":
+        failed_tables = create_gx_snowflake_table_loader.register_snowflake_tables(input_tables, other_params)
+    elif stage == "profile":
+        failed_tables = create_gx_data_profiler.profile_input_tables(input_tables, other_params)
+    elif stage == "expectation_suites":
+        failed_tables = create_gx_expectation_suite.create_expectation_suites(input_tables, other_params)
+    else:
+        update_gx_data_docs.update_data_docs(input_tables, open_data_docs=False)
+        failed_tables = {}
+
+    if failed_tables:
+        raise RuntimeError(f"Stage '{stage}' failed for table(s): {', '.join(sorted(failed_tables))}")
+
+
+def run_pipeline(project_dir, db_file, input_tables, other_params):
+    """Run every stage in a new GX project in 'project_dir'. Returns {stage: elapsed seconds}."""
+    FileDataContext.create(project_root_dir=project_dir)
+    os.chdir(project_dir)
+
+    # a new GX context, renderers (with their bytecode cache in this project) and run report for each run
+    common.reset_gx_context()
+    for cached_function in (
+        rendering.get_bytecode_cache,
+        rendering.get_jinja_environment,
+        rendering.get_page_view,
+        rendering.get_profiling_results_renderer,
+        rendering.get_expectation_suite_renderer,
+    ):
+        cached_function.cache_clear()
+    local_warehouse.add_gx_datasource(common.get_gx_context(), GX_DATA_SRC_NAME, db_file)
+    os.environ.pop(instrumentation.RUN_ID_ENV_VAR, None)
+    run_id = instrumentation.start_run()
+
+    stage_times = {}
+    try:
+        for stage in STAGES:
+            start_time = perf_counter()
+            run_stage(stage, input_tables, other_params)
+            stage_times[stage] = perf_counter() - start_time
+    finally:
+        instrumentation.finish_run(run_id)
+
+    return stage_times
+
+
+def summarise(best_times, table_count, rows_per_table, column_count):
+    """Return each stage's (and the whole run's) best time and throughput."""
+    best_times = dict(best_times, total=sum(best_times.values()))
+    rows = table_count * rows_per_table
+    return {
+        stage: {
+            "seconds": round(elapsed_time, 3),
+            "tables_per_second": round(table_count / elapsed_time, 2),
+            "rows_per_second": round(rows / elapsed_time),
+            "cells_per_second": round(rows * column_count / elapsed_time),
+        }
+        for stage, elapsed_time in best_times.items()
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=4, help="Synthetic tables to generate")
+    parser.add_argument("--rows", type=int, default=10000, help="Rows per table")
+    parser.add_argument("--columns", type=int, default=12, help="Columns per table (ints, floats, text, timestamps)")
+    parser.add_argument("--cardinality", type=int, default=100, help="Distinct values per column, at most")
+    parser.add_argument("--null-ratio", type=float, default=0.1, help="Share of null values per column")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data")
+    parser.add_argument("--row-count-limit", type=int, default=10000, help="The config's 'row_count_limit'")
+    parser.add_argument("--max-workers", type=int, default=1, help="The config's 'max_workers'")
+    parser.add_argument(
+        "--profiling-mode", choices=create_gx_data_profiler.PROFILING_MODES, default="basic", help="Profiling mode"
+    )
+    parser.add_argument("--sample-cache", action="store_true", help="Enable the sample cache")
+    parser.add_argument("--async-queries", action="store_true", help="Submit the sample queries asynchronously")
+    parser.add_argument("--batch-validation", action="store_true", help="Validate every table in one checkpoint run")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs, each in a new GX project (the best is reported)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--keep", action="store_true", help="Keep the database and GX projects (logs their path)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # the Snowflake stand-in is patched into this process, so worker processes must be forked from it
+    if "fork" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("fork", force=True)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    output_file = os.path.abspath(args.output) if args.output else None
+    other_params = {
+        "gx_data_src_name": GX_DATA_SRC_NAME,
+        "row_count_limit": args.row_count_limit,
+        "max_workers": args.max_workers,
+        "profiling_mode": args.profiling_mode,
+        "pushdown_dialect": "sqlite",
+        "sample_cache": args.sample_cache,
+        "batch_validation": args.batch_validation,
+        "async_queries": args.async_queries,
+    }
+
+    try:
+        db_file = os.path.join(work_dir, "warehouse.db")
+        logger.info(f"Generating {args.tables} table(s) of {args.rows} rows x {args.columns} columns in {db_file}")
+        input_tables = local_warehouse.create_synthetic_tables(
+            db_file, args.tables, args.rows, args.columns, args.cardinality, args.null_ratio, args.seed
+        )
+        local_warehouse.install(db_file)
+
+        runs = [
+            run_pipeline(os.path.join(work_dir, f"run_{i}"), db_file, input_tables, other_params)
+            for i in range(args.repeat)
+        ]
+    finally:
+        os.chdir(SCRIPT_DIR)
+        if args.keep:
+            logger.info(f"Kept the database and GX projects in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    rows_per_table = args.rows if args.profiling_mode == "pushdown" else min(args.rows, args.row_count_limit)
+    results = summarise(
+        {stage: min(run[stage] for run in runs) for stage in STAGES}, args.tables, rows_per_table, args.columns
+    )
+
+    logger.info(f"\n{'stage':<20} {'best (s)':>9} {'tables/s':>9} {'rows/s':>11} {'cells/s':>13}")
+    for stage, result in results.items():
+        logger.info(
+            f"{stage:<20} {result['seconds']:>9.2f} {result['tables_per_second']:>9.2f}"
+            f" {result['rows_per_second']:>11} {result['cells_per_second']:>13}"
+        )
+
+    if output_file:
+        with open(output_file, "w") as file:
+            json.dump({"settings": vars(args), "stages": results}, file, indent=2)
+        logger.info(f"Results written to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
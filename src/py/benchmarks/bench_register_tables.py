@@ -0,0 +1,106 @@
+"""Compare registering tables with the GX datasource one asset at a time (as before) with the bulk registration in
+create_gx_snowflake_table_loader.
+
+Each implementation registers '--tables' query assets in a new GX project, against a local SQLite datasource (see
+local_warehouse). The previous one saves great_expectations.yml once per table; the bulk one diffs the wanted
+assets against those registered and saves it once. Re-registering the same tables (a no-op) is timed too.
+
+Usage:
+    python src/py/benchmarks/bench_register_tables.py --tables 2000 --legacy-tables 200
+
+Runs offline: no Snowflake connection or GX project is needed.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+import common  # noqa: E402
+import create_gx_snowflake_table_loader  # noqa: E402
+import local_warehouse  # noqa: E402
+import sampling  # noqa: E402
+from great_expectations.data_context import FileDataContext  # noqa: E402
+
+logger = common.get_logger()
+
+GX_DATA_SRC_NAME = "local_warehouse"
+
+
+def legacy_register_tables(input_tables, other_params):
+    """The previous implementation: the datasource is looked up, and its config saved, once per table."""
+    context = common.get_gx_context()
+    gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
+
+    for table in input_tables:
+        datasource = create_gx_snowflake_table_loader.get_or_create_datasource(context, gx_data_src_name)
+        if table in datasource.get_asset_names():
+            datasource.delete_asset(table)
+        sampling_spec = sampling.get_sampling_spec(table, other_params)
+        query = sampling.build_sample_query(table, row_count_limit, sampling_spec, warehouse_only=True)
+        datasource.add_query_asset(name=table, query=query)
+
+
+REGISTER_METHODS = {
+    "legacy": legacy_register_tables,
+    "bulk": create_gx_snowflake_table_loader.register_snowflake_tables,
+}
+
+
+def time_registration(register_method, project_dir, input_tables, other_params):
+    """Register the tables twice in a new GX project, returning (first run, re-run) seconds."""
+    FileDataContext.create(project_root_dir=project_dir)
+    os.chdir(project_dir)
+    common.reset_gx_context()
+    local_warehouse.add_gx_datasource(
+        common.get_gx_context(), GX_DATA_SRC_NAME, os.path.join(project_dir, "warehouse.db")
+    )
+
+    timings = []
+    for _ in range(2):
+        start_time = perf_counter()
+        REGISTER_METHODS[register_method](input_tables, other_params)
+        timings.append(perf_counter() - start_time)
+
+    registered_assets = common.get_gx_context().get_datasource(GX_DATA_SRC_NAME).get_asset_names()
+    if sorted(registered_assets) != sorted(input_tables):
+        raise RuntimeError(f"'{register_method}' registered {len(registered_assets)} of {len(input_tables)} tables")
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=2000, help="Tables to register in bulk")
+    parser.add_argument(
+        "--legacy-tables", type=int, default=200, help="Tables to register one at a time (it's quadratic, so fewer)"
+    )
+    args = parser.parse_args()
+
+    # the tables don't exist, so their columns can't be described
+    other_params = {"gx_data_src_name": GX_DATA_SRC_NAME, "row_count_limit": 1000, "column_projection": False}
+    table_counts = {"legacy": args.legacy_tables, "bulk": args.tables}
+    work_dir = tempfile.mkdtemp(prefix="bench_register_tables_")
+
+    logger.info(f"{'method':<8} {'tables':>7} {'register (s)':>13} {'per table (ms)':>15} {'re-register (s)':>16}")
+    try:
+        for register_method, table_count in table_counts.items():
+            input_tables = [f"table_{i}" for i in range(table_count)]
+            first_run, rerun = time_registration(
+                register_method, os.path.join(work_dir, register_method), input_tables, other_params
+            )
+            logger.info(
+                f"{register_method:<8} {table_count:>7} {first_run:>13.2f} {first_run / table_count * 1000:>15.1f}"
+                f" {rerun:>16.2f}"
+            )
+    finally:
+        os.chdir(SCRIPT_DIR)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
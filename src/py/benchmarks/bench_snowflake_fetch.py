@@ -0,0 +1,100 @@
+"""Compare the row-based (fetchall) and Arrow-based DataFrame fetch paths in snowflake_client.
+
+Usage:
+    python src/py/benchmarks/bench_snowflake_fetch.py --table MY_TABLE --row-count-limit 100000 --repeat 3
+
+Requires the usual Snowflake environment variables (see .env_template).
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import common  # noqa: E402
+import instrumentation  # noqa: E402
+import snowflake_client  # noqa: E402
+
+logger = common.get_logger()
+
+FETCH_METHODS = {
+    "fetchall": snowflake_client.fetch_dataframe_from_rows,
+    "arrow": snowflake_client.fetch_dataframe_from_arrow,
+}
+
+
+def run_fetch(conn, sql_query, fetch_method):
+    """Execute the query and build a DataFrame with the given fetch method, returning the frame and its timings.
+
+    The memory used is the growth in the process' peak RSS while the frame is built, which (unlike tracemalloc)
+    includes Arrow's allocations. Only the first fetch in a process measures it, see measure_fetch().
+    """
+    snowflake_cursor = conn.cursor()
+    try:
+        snowflake_cursor.execute(sql_query)
+
+        baseline_rss = instrumentation.peak_rss_mb()
+        start_time = perf_counter()
+        df = FETCH_METHODS[fetch_method](snowflake_cursor)
+        elapsed_time = perf_counter() - start_time
+        peak_memory = instrumentation.peak_rss_mb() - baseline_rss
+    finally:
+        snowflake_cursor.close()
+
+    return df, elapsed_time, peak_memory
+
+
+def measure_fetch(sql_query, fetch_method):
+    """Run one fetch in a fresh process (so its peak RSS isn't raised by earlier runs), returning its timings and
+    the summary of the frame.
+    """
+    with snowflake_client.get_connection_pool(pool_size=1).connection() as conn:
+        df, elapsed_time, peak_memory = run_fetch(conn, sql_query, fetch_method)
+    return elapsed_time, peak_memory, summarise_dataframe(df)
+
+
+def summarise_dataframe(df):
+    """Return the row count, in-memory size and number of object-dtype columns of a DataFrame."""
+    object_columns = sum(1 for dtype in df.dtypes if dtype == object)
+    return len(df), df.memory_usage(deep=True).sum(), object_columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", required=True, help="Snowflake table to fetch")
+    parser.add_argument("--row-count-limit", type=int, default=100000, help="Rows to fetch per run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per fetch method (the best run is reported)")
+    args = parser.parse_args()
+
+    sql_query = f"SELECT * FROM {args.table} LIMIT {args.row_count_limit};"
+    pool = snowflake_client.get_connection_pool(pool_size=1)
+
+    logger.info(
+        f"{'method':<10} {'rows':>10} {'best (s)':>10} {'peak RSS (MB)':>14} {'df size (MB)':>14} {'object cols':>12}"
+    )
+    # warm the warehouse/result cache so both methods are measured against the same conditions
+    with pool.connection() as conn:
+        run_fetch(conn, sql_query, "arrow")
+
+    spawn_context = multiprocessing.get_context("spawn")
+    for fetch_method in FETCH_METHODS:
+        timings, peak_memories = [], []
+        for _ in range(args.repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn_context) as executor:
+                elapsed_time, peak_memory, summary = executor.submit(measure_fetch, sql_query, fetch_method).result()
+            timings.append(elapsed_time)
+            peak_memories.append(peak_memory)
+        best_time, peak_memory = min(timings), max(peak_memories)
+        row_count, df_size, object_columns = summary
+
+        logger.info(
+            f"{fetch_method:<10} {row_count:>10} {best_time:>10.3f} {peak_memory:>14.1f}"
+            f" {df_size / 1e6:>14.1f} {object_columns:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Compare the previous (BeautifulSoup + regex) data docs patcher with the single-pass one in update_gx_data_docs.
+
+A synthetic index.html with '--suites' expectation suites and validation results is rendered with GX's own index
+page renderer, then patched to list '--tables' profiling results by each implementation. The previous one inlines
+every link into index.html; the current one writes them to a separate manifest loaded by the browser on demand.
+
+Usage:
+    python src/py/benchmarks/bench_update_data_docs.py --suites 2000 --tables 2000 --repeat 3
+
+Runs offline: no Snowflake connection or GX project is needed.
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import common  # noqa: E402
+import page_store  # noqa: E402
+import profiling_index  # noqa: E402
+import update_gx_data_docs  # noqa: E402
+from bs4 import BeautifulSoup  # noqa: E402
+from great_expectations.render.renderer import SiteIndexPageRenderer  # noqa: E402
+from great_expectations.render.view import DefaultJinjaIndexPageView  # noqa: E402
+from jinja2 import Environment  # noqa: E402
+from jinja2 import FileSystemLoader  # noqa: E402
+
+logger = common.get_logger()
+
+# The replacement snippet and patterns used by the previous implementation
+LEGACY_TARGET_HTML_FILE = os.path.join(update_gx_data_docs.SCRIPT_DIR, "txt", "target_html.txt")
+LEGACY_HTML_PATTERN = r"</script>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*<footer>\s*<p>\s*Stay current on everything GX with our newsletter"  # noqa
+LEGACY_JS_PATTERN = r'\$\(document\)\.ready\(function\(\)\s*\{\s*\$\("#section-1-content-block-2-2-body-table"\)\.on\(\'click-row\.bs\.table\',\s*function\(e,\s*row,\s*\$element\)\s*\{\s*window\.location\s*=\s*\$element\.data\("href"\);\s*\}\)\s*}\s*\);\s*'  # noqa
+LEGACY_NAV_PATTERN = r'<li class="nav-item">\s*<a\s*aria-controls="Expectation-Suites"\s*aria-selected="false"\s*class="nav-link"\s*data-toggle="tab"\s*href="#Expectation-Suites"\s*id="Expectation-Suites-tab"\s*role="tab">\s*Expectation Suites\s*</a>\s*</li>'  # noqa
+
+
+def render_synthetic_index(suite_count):
+    """Render a GX data docs index page listing 'suite_count' expectation suites and validation results."""
+    index_links_dict = {
+        "site_name": "local_site",
+        "expectations_links": [
+            {
+                "expectation_suite_name": f"20240101_table_{i}",
+                "filepath": f"expectations/20240101_table_{i}.html",
+                "source": "expectations",
+            }
+            for i in range(suite_count)
+        ],
+        "validations_links": [
+            {
+                "expectation_suite_name": f"20240101_table_{i}",
+                "filepath": f"validations/20240101_table_{i}/run/20240101T000000Z/asset.html",
+                "source": "validations",
+                "run_id": "run",
+                "run_name": "run",
+                "run_time": "2024-01-01T00:00:00+00:00",
+                "batch_identifier": f"table_{i}",
+                "asset_name": f"table_{i}",
+                "batch_kwargs": {},
+                "batch_spec": {},
+                "validation_success": True,
+            }
+            for i in range(suite_count)
+        ],
+        "profiling_links": [],
+    }
+    return DefaultJinjaIndexPageView().render(SiteIndexPageRenderer.render(index_links_dict))
+
+
+def seed_page_manifest(input_tables):
+    """Record a profiling page and an expectation suite page for each table in the page manifest (see page_store),
+    so the single-pass patcher links every table, as the legacy one does.
+    """
+    page_manifest = {}
+    for i, input_table in enumerate(input_tables):
+        page_store.record_pages(
+            page_manifest,
+            input_table,
+            "2024-01-01",
+            {
+                page_type: f"{page_type}/{i:0{page_store.HASH_LENGTH}x}.html"
+                for page_type in ("profiling_results", "expectation_suite")
+            },
+        )
+    page_store.save_page_manifest(page_manifest)
+
+
+def legacy_prettify(html_file):
+    with open(html_file, encoding="utf-8") as file:
+        prettified_html = BeautifulSoup(file.read(), "html.parser").prettify()
+    with open(html_file, "w", encoding="utf-8") as file:
+        file.write(prettified_html)
+    return prettified_html
+
+
+def legacy_patch(index_file, input_tables, work_dir):
+    """The previous pipeline: backup, 3 BeautifulSoup passes, regex searches/substitutions and a full Jinja render."""
+    shutil.copyfile(index_file, update_gx_data_docs.GX_DATA_DOCS_BACKUP_FILE)
+    prettified_html = legacy_prettify(index_file)
+
+    combined_html_pattern = LEGACY_JS_PATTERN + LEGACY_HTML_PATTERN
+    for pattern in (LEGACY_HTML_PATTERN, LEGACY_JS_PATTERN, combined_html_pattern):
+        if not re.search(pattern, prettified_html, re.DOTALL):
+            raise ValueError("Legacy pattern not found in the index")
+    with open(LEGACY_TARGET_HTML_FILE, encoding="utf-8") as file:
+        target_html = file.read()
+    updated_html = re.sub(combined_html_pattern, target_html, prettified_html, flags=re.DOTALL)
+
+    jinja_template_file = os.path.join(work_dir, "index.html.j2")
+    for html_file in (index_file, jinja_template_file):
+        with open(html_file, "w") as file:
+            file.write(updated_html)
+        legacy_prettify(html_file)
+
+    jinja_env = Environment(loader=FileSystemLoader(work_dir), autoescape=True)
+    with open(index_file, "w") as file:
+        file.write(
+            jinja_env.get_template("index.html.j2").render(
+                input_tables=input_tables, current_data_str=update_gx_data_docs.CURRENT_DATE_STR
+            )
+        )
+
+    with open(index_file) as file:
+        content = file.read()
+    if not re.search(LEGACY_NAV_PATTERN, content, re.DOTALL):
+        raise ValueError("Legacy nav pattern not found in the index")
+    with open(index_file, "w") as file:
+        file.write(re.sub(LEGACY_NAV_PATTERN, update_gx_data_docs.PROFILING_RESULTS_NAV_ITEM, content))
+
+
+def single_pass_patch(index_file, input_tables, work_dir):
+    update_gx_data_docs.add_data_profiling_content(index_file, input_tables)
+
+
+PATCHERS = {"legacy": legacy_patch, "single_pass": single_pass_patch}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", type=int, default=2000, help="Expectation suites/validations in the index")
+    parser.add_argument("--tables", type=int, default=2000, help="Profiled tables to link from the index")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation (the best run is reported)")
+    args = parser.parse_args()
+
+    index_html = render_synthetic_index(args.suites)
+    input_tables = [f"table_{i}" for i in range(args.tables)]
+
+    logger.info(f"Synthetic index: {len(index_html) / 1e6:.1f} MB, {args.suites} suites, {args.tables} tables")
+    logger.info(
+        f"{'implementation':<14} {'best (s)':>10} {'index (MB)':>11} {'manifest (MB)':>14} {'profiling links':>16}"
+    )
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # the patchers write the backup relative to the working directory, as in a GX project
+        os.chdir(work_dir)
+        os.makedirs(update_gx_data_docs.GX_DATA_DOCS_DIR)
+        index_file = update_gx_data_docs.GX_DATA_DOCS_HTML_FILE
+        seed_page_manifest(input_tables)
+
+        link_counts = {}
+        for patcher_name, patcher in PATCHERS.items():
+            timings = []
+            for _ in range(args.repeat):
+                with open(index_file, "w", encoding="utf-8") as file:
+                    file.write(index_html)
+
+                start_time = perf_counter()
+                patcher(index_file, input_tables, work_dir)
+                timings.append(perf_counter() - start_time)
+
+            with open(index_file, encoding="utf-8") as file:
+                patched_html = file.read()
+            manifest_file = os.path.join(update_gx_data_docs.GX_DATA_DOCS_DIR, profiling_index.PROFILING_MANIFEST_FILE)
+            manifest = ""
+            if os.path.exists(manifest_file):
+                with open(manifest_file, encoding="utf-8") as file:
+                    manifest = file.read()
+                os.remove(manifest_file)
+            profiling_links = patched_html.count("'_table_row_link_path': 'profiling_results/") + manifest.count(
+                '"profiling_results_path"'
+            )
+
+            logger.info(
+                f"{patcher_name:<14} {min(timings):>10.3f} {len(patched_html) / 1e6:>11.2f} {len(manifest) / 1e6:>14.2f}"
+                f" {profiling_links:>16}"
+            )
+            link_counts[patcher_name] = profiling_links
+
+    if len(set(link_counts.values())) > 1:
+        logger.error(f"The implementations link different numbers of profiling results: {link_counts}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Check the scripts' import-time cost against a budget, using Python's '-X importtime' output.
+
+Each script is imported in a fresh interpreter. The check fails (exit code 1) if a script takes longer than
+'--budget-ms' to import, or if it imports one of the heavy modules that are meant to be loaded on first use (see
+common.lazy_import).
+
+Usage:
+    python src/py/benchmarks/check_import_time.py --budget-ms 1500
+
+Runs offline: no Snowflake connection or GX project is needed.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+import common  # noqa: E402
+
+logger = common.get_logger()
+
+SCRIPTS = [
+    "create_gx_snowflake_table_loader",
+    "create_gx_data_profiler",
+    "create_gx_expectation_suite",
+    "update_gx_data_docs",
+    "run_pipeline",
+]
+# Modules the scripts should only import once they need them
+DEFERRED_MODULES = ["great_expectations", "snowflake.connector"]
+DEFAULT_BUDGET_MS = 1500
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative microseconds} from '-X importtime' output."""
+    import_times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line.split("|")
+        import_times[module.strip()] = int(cumulative_us)
+    return import_times
+
+
+def measure_import(module):
+    """Import a module in a fresh interpreter and return its '-X importtime' timings."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing '{module}' failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Import-time budget per script")
+    args = parser.parse_args()
+
+    failures = []
+    logger.info(f"{'script':<36} {'import (ms)':>12}  deferred modules imported")
+    for script in SCRIPTS:
+        import_times = measure_import(script)
+        import_ms = import_times[script] / 1000
+        eagerly_imported = [module for module in DEFERRED_MODULES if module in import_times]
+        logger.info(f"{script:<36} {import_ms:>12.0f}  {', '.join(eagerly_imported) or '-'}")
+
+        if import_ms > args.budget_ms:
+            failures.append(f"{script} took {import_ms:.0f} ms to import (budget: {args.budget_ms:.0f} ms)")
+        if eagerly_imported:
+            failures.append(f"{script} imports {', '.join(eagerly_imported)} at startup")
+
+    if failures:
+        logger.error("\nImport-time check failed:\n" + "\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""A local SQLite stand-in for Snowflake, so the pipeline can be benchmarked offline.
+
+Synthetic tables are generated into a SQLite database file. install() then points snowflake_client's connection
+pool at that file (with cursors that return Arrow batches, like the Snowflake connector), and
+add_gx_datasource() registers it as the GX datasource the table loader adds its query assets to.
+"""
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import snowflake_client
+
+# Rows per Arrow batch returned by LocalCursor.fetch_arrow_batches()
+ARROW_BATCH_ROWS = 100000
+# The synthetic columns cycle through these types
+COLUMN_TYPES = ["int", "float", "text", "timestamp"]
+START_TIMESTAMP = pd.Timestamp("2024-01-01")
+
+# Queries submitted with LocalCursor.execute_async(), by query id. They're run when their results are read, on
+# whichever connection reads them (as with Snowflake, a query id isn't tied to the session that submitted it)
+_submitted_queries = {}
+
+
+def synthetic_column(column_type, row_count, cardinality, null_ratio, rng):
+    """Return a column of 'row_count' values with up to 'cardinality' distinct values and 'null_ratio' nulls."""
+    codes = rng.integers(0, cardinality, row_count)
+    if column_type == "int":
+        values = pd.Series(codes, dtype="Int64")
+    elif column_type == "float":
+        values = pd.Series(codes * 1.5 + 0.25)
+    elif column_type == "text":
+        values = pd.Series(np.char.add("value_", codes.astype(str)), dtype=object)
+    else:
+        # SQLite has no timestamp type, so they're stored as ISO 8601 text
+        values = pd.Series((START_TIMESTAMP + pd.to_timedelta(codes, unit="m")).strftime("%Y-%m-%d %H:%M:%S"))
+
+    return values.mask(rng.random(row_count) < null_ratio)
+
+
+def synthetic_table(row_count, column_count, cardinality, null_ratio, seed=None):
+    """Build a DataFrame of 'column_count' columns, cycling through COLUMN_TYPES."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            f"{COLUMN_TYPES[i % len(COLUMN_TYPES)]}_col_{i}": synthetic_column(
+                COLUMN_TYPES[i % len(COLUMN_TYPES)], row_count, cardinality, null_ratio, rng
+            )
+            for i in range(column_count)
+        }
+    )
+
+
+def create_synthetic_tables(db_file, table_count, row_count, column_count, cardinality, null_ratio, seed=0):
+    """Write 'table_count' synthetic tables (bench_table_0, bench_table_1, ...) to a SQLite database.
+
+    Returns the table names.
+    """
+    table_names = [f"bench_table_{i}" for i in range(table_count)]
+    with sqlite3.connect(db_file) as conn:
+        for i, table_name in enumerate(table_names):
+            df = synthetic_table(row_count, column_count, cardinality, null_ratio, seed + i)
+            df.to_sql(table_name, conn, if_exists="replace", index=False, chunksize=10000)
+    return table_names
+
+
+class LocalCursor:
+    """A SQLite cursor with the parts of the Snowflake cursor API that snowflake_client uses."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        # execute(), fetchone(), fetchmany(), fetchall(), description and close() are SQLite's own
+        return getattr(self._cursor, name)
+
+    def execute_async(self, sql_query):
+        self.sfqid = str(uuid.uuid4())
+        _submitted_queries[self.sfqid] = sql_query
+
+    def get_results_from_sfqid(self, query_id):
+        self._cursor.execute(_submitted_queries.pop(query_id))
+
+    def fetch_arrow_batches(self):
+        """Yield the result as Arrow tables of up to ARROW_BATCH_ROWS rows (none for an empty result)."""
+        column_names = [desc[0] for desc in self._cursor.description]
+        while rows := self._cursor.fetchmany(ARROW_BATCH_ROWS):
+            yield pa.Table.from_arrays([pa.array(column) for column in zip(*rows)], names=column_names)
+
+
+class LocalConnection:
+    """A SQLite connection whose cursors are LocalCursors, with the Snowflake connection's query status checks."""
+
+    def __init__(self, db_file):
+        self._conn = sqlite3.connect(db_file)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        return LocalCursor(self._conn.cursor())
+
+    def get_query_status_throw_if_error(self, query_id):
+        if query_id not in _submitted_queries:
+            raise sqlite3.ProgrammingError(f"No submitted query with id {query_id}")
+        return "SUCCESS"
+
+    def is_still_running(self, status):
+        return status in ("QUEUED", "RUNNING", "RESUMING_WAREHOUSE")
+
+
+class LocalConnectionPool:
+    """Stands in for snowflake_client.SnowflakeConnectionPool.
+
+    SQLite connections are cheap and can't be shared between threads, so each checkout opens its own.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+
+    @contextmanager
+    def connection(self):
+        conn = LocalConnection(self.db_file)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close_all(self):
+        pass
+
+
+def install(db_file):
+    """Route snowflake_client's connections to the SQLite database instead of Snowflake.
+
+    This patches the module in this process, so worker processes only see it if they're forked from it.
+    """
+    pool = LocalConnectionPool(os.path.abspath(db_file))
+    snowflake_client.get_connection_pool = lambda pool_size=None: pool
+    return pool
+
+
+def add_gx_datasource(context, gx_data_src_name, db_file):
+    """Register the SQLite database as the GX datasource the table loader adds its query assets to."""
+    # the suites are validated on several threads (batch validation), which share the datasource's engine
+    return context.sources.add_or_update_sqlite(
+        name=gx_data_src_name,
+        connection_string=f"sqlite:///{os.path.abspath(db_file)}",
+        kwargs={"connect_args": {"check_same_thread": False}},
+    )
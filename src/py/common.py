@@ -1,8 +1,9 @@
+import importlib
 import logging
 import os
+from functools import lru_cache
 
 import colorlog
-import yaml
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -22,6 +23,38 @@ class MissingEnvironmentVariableError(Exception):
     pass
 
 
+# Lazy Initialisation
+# great_expectations alone takes seconds to import (and the Snowflake connector most of a second), so the scripts
+# only import them, and create the GX context, once they're actually needed.
+class LazyObject:
+    """Stand-in for an object that's expensive to create: 'factory' is only called on first attribute access.
+
+    The factory is called on every access, so it should cache what it returns (e.g. with lru_cache).
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+
+def lazy_import(module_name):
+    """Return a stand-in for a module that's only imported on first attribute access."""
+    return LazyObject(lambda: importlib.import_module(module_name))
+
+
+@lru_cache(maxsize=None)
+def get_gx_context():
+    """Return the GX context, created (and great_expectations imported) on first use."""
+    return importlib.import_module("great_expectations").get_context()
+
+
+def reset_gx_context():
+    """Drop the cached GX context, e.g. in a worker process: the next get_gx_context() call creates a new one."""
+    get_gx_context.cache_clear()
+
+
 # Logger Setup
 def get_logger(log_level=logging.INFO):
     """Set up a specific logger with desired output level and colored formatting"""
@@ -49,45 +82,6 @@ def get_logger(log_level=logging.INFO):
     return logger
 
 
-# Configuration Loading
-def load_config_from_yaml(file_path="config.yaml"):
-    """Load and validate configuration data from a YAML file."""
-    try:
-        logger = get_logger()
-
-        with open(file_path) as file:
-            # Load YAML data into a Python dictionary
-            data = yaml.safe_load(file)
-
-        input_tables = data.get("input_tables")
-        other_params = data.get("other_params", {})
-
-        # Validate if "input_tables" key is present, is a list, and is not empty
-        if (
-            input_tables is None
-            or not isinstance(input_tables, list)
-            or not input_tables
-            or all(not item for item in input_tables)
-        ):
-            raise ValueError("Invalid or empty 'input_tables' in the YAML file.")
-
-        # Validate if the required keys in other_params are present
-        required_other_params_keys = ["gx_data_src_name", "row_count_limit"]
-        for key in required_other_params_keys:
-            if key is None or key not in other_params or not other_params[key]:
-                raise ValueError(f"Invalid or missing key '{key}' in other_params.")
-
-        logger.debug(input_tables)
-        logger.debug(other_params)
-
-    except FileNotFoundError:
-        raise InvalidYAMLFileError(f"YAML file '{file_path}' not found.")
-    except yaml.YAMLError as e:
-        raise InvalidYAMLFileError(f"Error loading YAML: {e}")
-
-    return input_tables, other_params
-
-
 # Snowflake Connection String Creation
 def validate_environment_variables():
     """Validates required Snowflake connection environment variables."""
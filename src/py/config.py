@@ -0,0 +1,284 @@
+import copy
+import fnmatch
+import os
+
+import common
+import sampling
+import yaml
+
+# Set up logging
+logger = common.get_logger()
+
+REQUIRED_OTHER_PARAMS_KEYS = ["gx_data_src_name", "row_count_limit"]
+# Settings that can be overridden per table under 'other_params.tables', e.g.
+#
+#     other_params:
+#         exclude_columns: [DWH_CREATED_DT, DWH_UPDATED_DT]
+#         tables:
+#             table_b: {row_count_limit: 1000, exclude_columns: [LOAD_ID], priority: 10}
+#             SALES.FACT_*: {priority: 5, max_text_length: 256}
+TABLE_SETTINGS = ("row_count_limit", "exclude_columns", "priority", "max_text_length")
+DEFAULT_PRIORITY = 0
+
+# Parsed config files, by path: {path: ((mtime_ns, size), Config)}
+_loaded_configs = {}
+
+
+class TableSpec:
+    """A table's resolved settings: the defaults in 'other_params' with its overrides from 'other_params.tables'.
+
+    Specs are immutable (and small, they're handed to worker processes), see get_table_spec(). 'projection' is
+    the select list its samples are queried with, set once its columns are known (see projection). 'row_count' is
+    the table's row count from INFORMATION_SCHEMA, if it was looked up (see table_discovery).
+    """
+
+    __slots__ = (
+        "name",
+        "row_count_limit",
+        "sampling",
+        "exclude_columns",
+        "priority",
+        "max_text_length",
+        "projection",
+        "row_count",
+    )
+
+    def __init__(
+        self,
+        name,
+        row_count_limit,
+        sampling,
+        exclude_columns=(),
+        priority=DEFAULT_PRIORITY,
+        max_text_length=None,
+        projection="*",
+        row_count=None,
+    ):
+        values = (
+            name,
+            row_count_limit,
+            sampling,
+            tuple(exclude_columns),
+            priority,
+            max_text_length,
+            projection,
+            row_count,
+        )
+        for slot, value in zip(self.__slots__, values):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"TableSpec is immutable, can't set '{name}'")
+
+    def __reduce__(self):
+        return TableSpec, tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, TableSpec) and self.__reduce__() == other.__reduce__()
+
+    def __repr__(self):
+        return "TableSpec(" + ", ".join(f"{slot}={getattr(self, slot)!r}" for slot in self.__slots__) + ")"
+
+    def replace(self, **changes):
+        """Return a copy of the spec with some of its settings changed."""
+        return TableSpec(**{slot: changes.get(slot, getattr(self, slot)) for slot in self.__slots__})
+
+    def exclude_column_names(self):
+        """The excluded columns as written and in upper and lower case, for GX (which matches column names exactly).
+
+        Unquoted Snowflake column names are upper case, but a SQLAlchemy-based datasource reports them in lower case.
+        """
+        return sorted({name for column in self.exclude_columns for name in (column, column.upper(), column.lower())})
+
+    def settings(self):
+        """The settings that change a table's outputs, e.g. for its fingerprint (see table_state)."""
+        return {
+            "row_count_limit": self.row_count_limit,
+            "sampling": self.sampling,
+            "exclude_columns": list(self.exclude_columns),
+            "max_text_length": self.max_text_length,
+        }
+
+
+class Config:
+    """The validated contents of config.yaml. Read-only: 'other_params' returns a copy each time."""
+
+    __slots__ = ("file_path", "input_tables", "_other_params")
+
+    def __init__(self, file_path, input_tables, other_params):
+        object.__setattr__(self, "file_path", file_path)
+        object.__setattr__(self, "input_tables", tuple(input_tables))
+        object.__setattr__(self, "_other_params", copy.deepcopy(other_params))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Config is immutable, can't set '{name}'")
+
+    @property
+    def other_params(self):
+        return copy.deepcopy(self._other_params)
+
+
+def is_positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def validate_table_settings(settings, where):
+    """Check the types of the per-table settings in 'settings' (the defaults, or a table's overrides)."""
+    if "row_count_limit" in settings and not is_positive_int(settings["row_count_limit"]):
+        raise ValueError(f"Invalid 'row_count_limit' in {where}: expected a positive integer.")
+    exclude_columns = settings.get("exclude_columns")
+    if exclude_columns is not None and (
+        not isinstance(exclude_columns, list) or not all(isinstance(column, str) for column in exclude_columns)
+    ):
+        raise ValueError(f"Invalid 'exclude_columns' in {where}: expected a list of column names.")
+    priority = settings.get("priority")
+    if priority is not None and (not isinstance(priority, int) or isinstance(priority, bool)):
+        raise ValueError(f"Invalid 'priority' in {where}: expected an integer.")
+    if settings.get("max_text_length") is not None and not is_positive_int(settings["max_text_length"]):
+        raise ValueError(f"Invalid 'max_text_length' in {where}: expected a positive integer.")
+
+
+def validate_input_tables(input_tables):
+    """Check 'input_tables' is a non-empty list of table names, returning it without blanks or repeated entries."""
+    # Validate if "input_tables" key is present, is a list, and is not empty
+    if (
+        input_tables is None
+        or not isinstance(input_tables, list)
+        or not input_tables
+        or all(not item for item in input_tables)
+    ):
+        raise ValueError("Invalid or empty 'input_tables' in the YAML file.")
+    if not all(isinstance(item, str) for item in input_tables if item):
+        raise ValueError("Invalid 'input_tables' in the YAML file: expected a list of table names.")
+
+    # tables listed more than once (or blank entries) would otherwise be processed, and fail, more than once
+    return list(dict.fromkeys(item for item in input_tables if item))
+
+
+def validate_other_params(other_params):
+    """Check 'other_params' has the required keys, and the types of its run-wide settings and table defaults."""
+    if not isinstance(other_params, dict):
+        raise ValueError("Invalid 'other_params' in the YAML file: expected a mapping.")
+
+    # Validate if the required keys in other_params are present
+    for key in REQUIRED_OTHER_PARAMS_KEYS:
+        if key not in other_params or not other_params[key]:
+            raise ValueError(f"Invalid or missing key '{key}' in other_params.")
+    for key in ("max_workers", "max_queries_in_flight"):
+        if key in other_params and not is_positive_int(other_params[key]):
+            raise ValueError(f"Invalid '{key}' in other_params: expected a positive integer.")
+
+    validate_table_settings(other_params, "other_params")
+
+
+def validate_table_overrides(table_overrides):
+    """Check the per-table (or table pattern) overrides under 'other_params.tables'."""
+    if not isinstance(table_overrides, dict):
+        raise ValueError("Invalid 'tables' in other_params: expected a mapping of table names to settings.")
+    for table, settings in table_overrides.items():
+        if not isinstance(settings, dict):
+            raise ValueError(f"Invalid settings for table '{table}' in other_params.tables: expected a mapping.")
+        unknown_settings = set(settings) - set(TABLE_SETTINGS)
+        if unknown_settings:
+            raise ValueError(
+                f"Unknown setting(s) {sorted(unknown_settings)} for table '{table}' in other_params.tables. "
+                f"Expected any of {TABLE_SETTINGS}."
+            )
+        validate_table_settings(settings, f"other_params.tables.{table}")
+
+
+def validate_config(data):
+    """Validate the parsed config.yaml, returning (input_tables, other_params)."""
+    if not isinstance(data, dict):
+        raise ValueError("Invalid YAML file: expected the 'input_tables' and 'other_params' keys.")
+    input_tables = validate_input_tables(data.get("input_tables"))
+    other_params = data.get("other_params") or {}
+    validate_other_params(other_params)
+    validate_table_overrides(other_params.get("tables") or {})
+
+    return input_tables, other_params
+
+
+def load_config(file_path="config.yaml"):
+    """Load and validate a config file, returning a Config.
+
+    The parsed config is cached until the file changes (by modification time and size), so every stage of a run
+    shares one parse.
+    """
+    path = os.path.abspath(file_path)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise common.InvalidYAMLFileError(f"YAML file '{file_path}' not found.")
+
+    file_version = (stat.st_mtime_ns, stat.st_size)
+    cached = _loaded_configs.get(path)
+    if cached is not None and cached[0] == file_version:
+        return cached[1]
+
+    try:
+        with open(path) as file:
+            # Load YAML data into a Python dictionary
+            data = yaml.safe_load(file) or {}
+    except yaml.YAMLError as e:
+        raise common.InvalidYAMLFileError(f"Error loading YAML: {e}")
+
+    input_tables, other_params = validate_config(data)
+    logger.debug(input_tables)
+    logger.debug(other_params)
+
+    config = Config(file_path, input_tables, other_params)
+    _loaded_configs[path] = (file_version, config)
+    return config
+
+
+def load_config_from_yaml(file_path="config.yaml"):
+    """Load and validate configuration data from a YAML file, returning (input_tables, other_params).
+
+    The file is parsed once and cached until it changes, see load_config().
+    """
+    config = load_config(file_path)
+    return list(config.input_tables), config.other_params
+
+
+def find_table_overrides(input_table, other_params):
+    """Merge a table's overrides from 'other_params.tables': entries whose (glob) pattern matches the table name
+    apply in the listed order, and an entry for the exact name applies last.
+    """
+    table_overrides = other_params.get("tables") or {}
+    overrides = {}
+    for pattern, settings in table_overrides.items():
+        if pattern != input_table and fnmatch.fnmatchcase(input_table.upper(), pattern.upper()):
+            overrides.update(settings or {})
+    overrides.update(table_overrides.get(input_table) or {})
+    return overrides
+
+
+def get_table_spec(input_table, other_params):
+    """Return a table's TableSpec: the 'other_params' defaults, its overrides and its sampling settings."""
+    settings = {
+        **{key: other_params.get(key) for key in TABLE_SETTINGS},
+        **find_table_overrides(input_table, other_params),
+    }
+    return TableSpec(
+        input_table,
+        settings["row_count_limit"],
+        sampling.get_sampling_spec(input_table, other_params),
+        exclude_columns=settings["exclude_columns"] or (),
+        priority=settings["priority"] if settings["priority"] is not None else DEFAULT_PRIORITY,
+        max_text_length=settings["max_text_length"],
+        row_count=((other_params.get("table_metadata") or {}).get(input_table) or {}).get("row_count"),
+    )
+
+
+def get_table_specs(input_tables, other_params):
+    """Return {input_table: TableSpec} for the input tables."""
+    return {input_table: get_table_spec(input_table, other_params) for input_table in input_tables}
+
+
+def drop_excluded_columns(df, exclude_columns):
+    """Drop the excluded columns (matched case-insensitively, as Snowflake's unquoted names are) from a DataFrame."""
+    excluded = {column.upper() for column in exclude_columns}
+    if not excluded:
+        return df
+    return df.drop(columns=[column for column in df.columns if str(column).upper() in excluded])
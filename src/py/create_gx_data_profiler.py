@@ -2,106 +2,492 @@ import logging
 import os
 import sys
 import warnings
-from datetime import datetime
+from concurrent.futures import as_completed
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 
+import async_sampler
 import common
+import config
+import instrumentation
+import page_store
+import profiling_index
+import projection
+import pushdown_profiler
+import rendering
+import sample_cache
+import scheduling
+import sharded_profiler
 import snowflake_client
-from great_expectations.profile.basic_dataset_profiler import BasicDatasetProfiler
-from great_expectations.render.renderer import ExpectationSuitePageRenderer
-from great_expectations.render.renderer import ProfilingResultsPageRenderer
-from great_expectations.render.view import DefaultJinjaPageView
+import streaming_profiler
+import table_discovery
+import table_state
 
 # Set up logging
 logger = common.get_logger(log_level=logging.INFO)
 
+# great_expectations is only imported once a table is profiled in this process
+gx_pandas_dataset = common.lazy_import("great_expectations.dataset.pandas_dataset")
+gx_basic_dataset_profiler = common.lazy_import("great_expectations.profile.basic_dataset_profiler")
+
+
+# 'basic' profiles an in-memory sample with BasicDatasetProfiler, 'sharded' does the same with each table's columns
+# split across worker processes, 'streaming' profiles batch by batch and 'pushdown' computes the column statistics
+# in Snowflake over the whole table
+PROFILING_MODES = ("basic", "sharded", "streaming", "pushdown")
+
+# Name of this stage's section in the table state file (see table_state)
+PROFILING_STAGE = "profiling"
+
+DATA_DOCS_DIR = "gx/uncommitted/data_docs/local_site/"
+PROFILING_RESULTS_DIR = os.path.join(DATA_DOCS_DIR, "profiling_results")
+EXPECTATION_SUITE_DIR = os.path.join(DATA_DOCS_DIR, "expectation_suite")
 
 # Suppress DeprecationWarning for create_expectation_suite
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 warnings.simplefilter(action="ignore", category=FutureWarning)
 
 
-def remove_relative_paths_from_html(html_file_path):
-    """Removes occurrences of the string '../../../../' from the html file."""
+def generate_data_profiling_html(pandas_dataset, input_table):
+    # Run the basic profiler
+    with instrumentation.timer("profile"):
+        expectation_suite_based_on_profiling, validation_result_based_on_profiling = pandas_dataset.profile(
+            gx_basic_dataset_profiler.BasicDatasetProfiler
+        )
+
+    return write_data_profiling_html(
+        expectation_suite_based_on_profiling, validation_result_based_on_profiling, input_table
+    )
+
+
+def write_data_profiling_html(expectation_suite_based_on_profiling, validation_result_based_on_profiling, input_table):
+    """Render the profiling results and expectation suite pages for a table and write them to data docs.
+
+    Returns the table's profiling index entry (see profiling_index).
+    """
+    # Render html content for profiling and expectation suite
+    with instrumentation.timer("render"):
+        profiling_result_html = rendering.render_profiling_results_page(validation_result_based_on_profiling)
+        expectation_based_on_profiling_html = rendering.render_expectation_suite_page(
+            expectation_suite_based_on_profiling
+        )
+
+    # Pages are stored under their content hash: a page identical to one already stored isn't written again
+    with instrumentation.timer("write"):
+        output_files = [
+            page_store.write_page(directory, content)
+            for directory, content in zip(
+                (PROFILING_RESULTS_DIR, EXPECTATION_SUITE_DIR),
+                [profiling_result_html, expectation_based_on_profiling_html],
+            )
+        ]
+
+    logger.info(f"Created data profile for table: {input_table}")
+
+    return profiling_index.build_entry(input_table, output_files, validation_result_based_on_profiling)
+
+
+def fetch_table(input_table, table_spec, cache=None):
+    """Fetch a sample of the input table from Snowflake (or the sample cache) as a pandas DataFrame.
+
+    Only the columns in the table's projection are read, so its excluded columns are usually left out by the query
+    already. They're dropped here otherwise (e.g. if its columns couldn't be described, see projection).
+    """
+    logger.debug(f"Fetching table: {input_table}")
+    with instrumentation.table_scope(input_table):
+        df = sample_cache.fetch_sample(
+            input_table,
+            table_spec.row_count_limit,
+            table_spec.sampling,
+            cache,
+            table_spec.projection,
+            table_spec.row_count,
+        )
+    return config.drop_excluded_columns(df, table_spec.exclude_columns)
+
+
+def profile_table(df, input_table):
+    """Profile a fetched DataFrame and write its HTML pages (runs inside a worker process)."""
+    with instrumentation.table_scope(input_table):
+        # PandasDataset doesn't survive pickling, so it's built on the worker side
+        entry = generate_data_profiling_html(gx_pandas_dataset.PandasDataset(df), input_table)
+        instrumentation.record_peak_rss()
+    return entry
+
+
+def profile_table_streaming(input_table, batch_size, table_specs):
+    """Profile a table batch by batch as it streams from Snowflake, then write its HTML pages."""
+    table_spec = table_specs[input_table]
+    with instrumentation.table_scope(input_table):
+        # Fetching and profiling are interleaved, batch by batch, so they're timed together as 'profile'
+        with instrumentation.timer("profile"), snowflake_client.get_connection_pool().connection() as conn:
+            expectation_suite, validation_result = streaming_profiler.profile_table(
+                conn,
+                input_table,
+                table_spec.row_count_limit,
+                batch_size,
+                table_spec.sampling,
+                table_spec.exclude_columns,
+                table_spec.projection,
+            )
+        entry = write_data_profiling_html(expectation_suite, validation_result, input_table)
+        instrumentation.record_peak_rss()
+    return entry
+
 
-    # Read the content of the HTML file and modify it
-    with open(html_file_path) as file:
-        content = file.read()
-        modified_content = content.replace("../../../../", "../")
+def profile_table_pushdown(input_table, table_specs, dialect_name="snowflake"):
+    """Profile a whole table with a single aggregate query run in Snowflake, then write its HTML pages."""
+    with instrumentation.table_scope(input_table):
+        with snowflake_client.get_connection_pool().connection() as conn:
+            expectation_suite, validation_result = pushdown_profiler.profile_table(
+                conn, input_table, dialect_name, exclude_columns=table_specs[input_table].exclude_columns
+            )
+        entry = write_data_profiling_html(expectation_suite, validation_result, input_table)
+        instrumentation.record_peak_rss()
+    return entry
+
+
+def profile_table_sharded(input_table, executor, shard_count, table_specs, cache=None):
+    """Fetch a table, profile its columns in shards across the worker processes, then write its HTML pages."""
+    df = fetch_table(input_table, table_specs[input_table], cache)
+    with instrumentation.table_scope(input_table):
+        with instrumentation.timer("profile"):
+            expectation_suite, validation_result = sharded_profiler.profile_dataframe(df, executor, shard_count)
+        del df
+        entry = write_data_profiling_html(expectation_suite, validation_result, input_table)
+        instrumentation.record_peak_rss()
+    return entry
 
-    # Write the modified content back to the HTML file
-    with open(html_file_path, "w") as file:
-        file.write(modified_content)
 
+def run_table_batch(task, batch, *task_args):
+    """Run 'task(input_table, *task_args)' for each table in a batch, returning ({table: result}, {table: exception})."""
+    results, errors = {}, {}
+    for input_table in batch:
+        try:
+            results[input_table] = task(input_table, *task_args)
+        except Exception as e:
+            errors[input_table] = e
+    return results, errors
 
-def write_html_file(directory, filename, content):
-    """Write HTML content to a file in the specified directory"""
-    with open(os.path.join(directory, filename), "w") as file:
-        file.write(content)
 
+def run_per_table(task, input_tables, max_workers, executor_class, *task_args, batches=None):
+    """Run 'task(input_table, *task_args)' for each table, on an executor when max_workers > 1.
 
-def create_directory(directory):
-    """Create a directory if it doesn't exist"""
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-        logger.debug(f"Directory created: {directory}")
+    'batches' (see scheduling.schedule) groups the tables into the executor's tasks, in the order they're submitted.
+    Returns ({input_table: result}, {input_table: exception}): failures are isolated per table.
+    """
+    profiled_tables, failed_tables = {}, {}
+    batches = batches or [[input_table] for input_table in input_tables]
+
+    if max_workers > 1:
+        with executor_class(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_table_batch, task, batch, *task_args): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    results, errors = future.result()
+                except Exception as e:
+                    results, errors = {}, {input_table: e for input_table in futures[future]}
+                profiled_tables.update(results)
+                failed_tables.update(errors)
     else:
-        logger.debug(f"Directory already exists: {directory}")
+        for batch in batches:
+            results, errors = run_table_batch(task, batch, *task_args)
+            profiled_tables.update(results)
+            failed_tables.update(errors)
 
+    for input_table, error in failed_tables.items():
+        logger.error(f"Error profiling table '{input_table}': {error}")
 
-def generate_data_profiling_html(pandas_dataset, input_table):
-    # Run the basic profiler
-    expectation_suite_based_on_profiling, validation_result_based_on_profiling = pandas_dataset.profile(
-        BasicDatasetProfiler
-    )
+    return profiled_tables, failed_tables
 
-    # Render html content for profiling and expectation suite
-    profiling_result_html = DefaultJinjaPageView().render(
-        ProfilingResultsPageRenderer().render(validation_result_based_on_profiling)
-    )
-    expectation_based_on_profiling_html = DefaultJinjaPageView().render(
-        ExpectationSuitePageRenderer().render(expectation_suite_based_on_profiling)
-    )
 
-    DATA_DOCS_DIR = "gx/uncommitted/data_docs/local_site/"
-    PROFILING_RESULTS_DIR = os.path.join(DATA_DOCS_DIR, "profiling_results")
-    EXPECTATION_SUITE_DIR = os.path.join(DATA_DOCS_DIR, "expectation_suite")
-    CURRENT_DATE_STR = datetime.now().strftime("%Y%m%d")
+def profile_tables_serially(input_tables, table_specs, cache=None):
+    """Fetch and profile each input table in turn, returning the profiled tables and any per-table failures."""
+    profiled_tables, failed_tables = {}, {}
 
-    # Define file information as tuples (directory, filename, content)
-    files_to_process = [
-        (PROFILING_RESULTS_DIR, f"{CURRENT_DATE_STR}_{input_table}.html", profiling_result_html),
-        (EXPECTATION_SUITE_DIR, f"{CURRENT_DATE_STR}_{input_table}.html", expectation_based_on_profiling_html),
-    ]
+    for input_table in input_tables:
+        logger.debug(f"Input table = {input_table}")
+        try:
+            profiled_tables[input_table] = profile_table(
+                fetch_table(input_table, table_specs[input_table], cache), input_table
+            )
+        except Exception as e:
+            logger.error(f"Error profiling table '{input_table}': {e}")
+            failed_tables[input_table] = e
 
-    # loop through 'files_to_process' to call the same functions below on each
-    for directory, filename, content in files_to_process:
-        create_directory(directory)  # Create directories if they don't exist
-        write_html_file(directory, filename, content)  # Write HTML content to files
-        remove_relative_paths_from_html(os.path.join(directory, filename))  # Remove relative file paths
+    return profiled_tables, failed_tables
 
-    logger.info(f"Created data profile for table: {input_table}")
 
-    return
+def profile_tables_concurrently(input_tables, max_workers, table_specs, cache=None):
+    """Overlap Snowflake fetches on a thread pool and run profiling/rendering on a process pool.
 
+    Each table is handed to the process pool as soon as its fetch completes, so profiling of earlier tables
+    overlaps with fetching of later ones. Returns the profiled tables and any per-table failures.
+    """
+    profiled_tables, failed_tables = {}, {}
 
-def main():
+    with ThreadPoolExecutor(max_workers=max_workers) as fetch_pool, ProcessPoolExecutor(
+        max_workers=max_workers
+    ) as profile_pool:
+        fetch_futures = {
+            fetch_pool.submit(fetch_table, input_table, table_specs[input_table], cache): input_table
+            for input_table in input_tables
+        }
+        profile_futures = {}
+
+        for fetch_future in as_completed(fetch_futures):
+            input_table = fetch_futures[fetch_future]
+            try:
+                df = fetch_future.result()
+            except Exception as e:
+                logger.error(f"Error fetching table '{input_table}': {e}")
+                failed_tables[input_table] = e
+                continue
+            profile_futures[profile_pool.submit(profile_table, df, input_table)] = input_table
+
+        for profile_future in as_completed(profile_futures):
+            input_table = profile_futures[profile_future]
+            try:
+                profiled_tables[input_table] = profile_future.result()
+            except Exception as e:
+                logger.error(f"Error profiling table '{input_table}': {e}")
+                failed_tables[input_table] = e
+
+    return profiled_tables, failed_tables
+
+
+def profile_in_process(df, input_table):
+    """Profile a fetched DataFrame in this process, returning a (completed) Future like a process pool's."""
+    future = Future()
     try:
-        input_tables, other_params = common.load_config_from_yaml()
-        gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
-        logger.debug(
-            f"input tables = {input_tables}\ngx_data_src_name = {gx_data_src_name}\nrow_count_limit = {row_count_limit}"
+        future.set_result(profile_table(df, input_table))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def profile_tables_async(input_tables, max_workers, table_specs, cache=None, max_in_flight=None):
+    """Submit every table's sample query at once (see async_sampler) and profile each sample as it lands.
+
+    Samples are profiled in this process with max_workers == 1, or on a process pool otherwise, while the remaining
+    queries are still running in the warehouse. Returns the profiled tables and any per-table failures.
+    """
+    profiled_tables, failed_tables = {}, {}
+    fetcher = async_sampler.SampleFetcher(
+        input_tables, table_specs, cache, max_in_flight or async_sampler.DEFAULT_MAX_IN_FLIGHT
+    )
+
+    with ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else nullcontext() as profile_pool:
+        profile_futures = {}
+        for input_table, df, error in fetcher:
+            if error is not None:
+                logger.error(f"Error fetching table '{input_table}': {error}")
+                failed_tables[input_table] = error
+                continue
+            if profile_pool is None:
+                profile_future = profile_in_process(df, input_table)
+            else:
+                profile_future = profile_pool.submit(profile_table, df, input_table)
+            # a table's slot is freed once it's profiled, so samples waiting for a worker count towards
+            # 'max_in_flight' too
+            profile_future.add_done_callback(fetcher.release_slot)
+            profile_futures[profile_future] = input_table
+
+        for profile_future in as_completed(profile_futures):
+            input_table = profile_futures[profile_future]
+            try:
+                profiled_tables[input_table] = profile_future.result()
+            except Exception as e:
+                logger.error(f"Error profiling table '{input_table}': {e}")
+                failed_tables[input_table] = e
+
+    return profiled_tables, failed_tables
+
+
+def select_changed_tables(input_tables, state, fingerprints):
+    """Return the input tables whose data (or profiling settings) changed since they were last profiled.
+
+    Unchanged tables aren't fetched or profiled again: their existing HTML pages are reused. These are returned
+    too, as {input_table: [page files]}.
+    """
+    changed_tables, reused_tables = [], {}
+
+    for input_table in input_tables:
+        entry = table_state.get_unchanged_entry(state, PROFILING_STAGE, input_table, fingerprints[input_table])
+        if entry is None:
+            changed_tables.append(input_table)
+            continue
+
+        reused_tables[input_table] = entry["outputs"]
+        logger.info(f"Skipped unchanged table: {input_table}")
+
+    logger.info(f"{len(changed_tables)} of {len(input_tables)} table(s) changed since they were last profiled")
+
+    return changed_tables, reused_tables
+
+
+def record_profiled_tables(profiled_tables, state, fingerprints):
+    """Record the fingerprints and HTML pages of the successfully profiled tables in the table state file."""
+    for input_table, entry in profiled_tables.items():
+        outputs = list(profiling_index.entry_pages(entry).values())
+        table_state.record_table_state(state, PROFILING_STAGE, input_table, fingerprints[input_table], outputs=outputs)
+
+    table_state.save_table_state(state)
+
+
+def update_profiling_index(profiled_tables, reused_tables):
+    """Add this run's tables to the profiling index listed by the data docs, and their pages to the page manifest.
+
+    Tables whose pages were reused (see select_changed_tables) keep their previous statistics and profiling date.
+    """
+    index = profiling_index.load_profiling_index()
+    for input_table, output_files in reused_tables.items():
+        previous_entry = index.get(input_table, {})
+        index[input_table] = {
+            **profiling_index.build_entry(input_table, output_files),
+            **{key: previous_entry[key] for key in ("date", "row_count", "column_count") if key in previous_entry},
+        }
+    index.update(profiled_tables)
+    profiling_index.save_profiling_index(index)
+
+    page_manifest = page_store.load_page_manifest()
+    for input_table, entry in profiled_tables.items():
+        page_store.record_pages(page_manifest, input_table, entry["date"], profiling_index.entry_pages(entry))
+    page_store.save_page_manifest(page_manifest)
+
+
+def report_failed_tables(failed_tables, table_count):
+    """Log a summary of the tables that failed to profile."""
+    logger.error(f"\n{len(failed_tables)} of {table_count} table(s) failed to profile:")
+    for input_table, error in failed_tables.items():
+        logger.error(f"{input_table}: {error}")
+
+
+def profile_input_tables(input_tables, other_params):
+    """Profile the input tables and write their data docs pages. Returns the tables that failed, with their errors.
+
+    This is the profiling stage of both this script and the pipeline runner (run_pipeline.py).
+    """
+    gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
+    max_workers = int(other_params.get("max_workers", 1))
+    profiling_mode = other_params.get("profiling_mode", "basic")
+    logger.debug(
+        f"input tables = {input_tables}\ngx_data_src_name = {gx_data_src_name}\nrow_count_limit = {row_count_limit}"
+    )
+
+    # One pooled Snowflake session per fetch thread, reused across tables
+    snowflake_client.get_connection_pool(pool_size=max_workers)
+
+    if profiling_mode not in PROFILING_MODES:
+        raise ValueError(
+            f"Invalid 'profiling_mode' in other_params: {profiling_mode}. Expected one of {PROFILING_MODES}."
         )
+    # row_count_limit, sampling and excluded columns, per table (see config.get_table_spec)
+    table_specs = config.get_table_specs(input_tables, other_params)
+
+    # With 'incremental' set, tables whose data hasn't changed since their last successful run are skipped
+    incremental = bool(other_params.get("incremental", False))
+    tables_to_profile, reused_tables = input_tables, {}
+    if incremental:
+        state = table_state.load_table_state()
+        settings_by_table = {
+            input_table: {"profiling_mode": profiling_mode, **table_specs[input_table].settings()}
+            for input_table in input_tables
+        }
+        fingerprints = table_state.fetch_table_fingerprints(input_tables, settings_by_table)
+        tables_to_profile, reused_tables = select_changed_tables(input_tables, state, fingerprints)
 
-        for input_table in input_tables:
-            logger.debug(f"Input table = {input_table}")
+    # Highest priority and largest tables first, so none of them is left running alone at the end (see scheduling).
+    # In pushdown mode the whole table is read
+    table_metadata, sampled = other_params.get("table_metadata"), profiling_mode != "pushdown"
+    tables_to_profile = scheduling.order_largest_first(tables_to_profile, table_metadata, table_specs, sampled)
 
-            pandas_dataset = snowflake_client.snowflake_query(
-                snowflake_client.setup_snowflake_connection(), input_table, row_count_limit
+    # Only the profilable columns are queried, in a compact form where they're large (see projection). Pushdown mode
+    # reads the columns' types itself, and only transfers their statistics. Tables that can't be projected fail alone
+    projection_failures = {}
+    if profiling_mode != "pushdown":
+        table_specs, projection_failures = projection.project_table_specs(table_specs, other_params, tables_to_profile)
+        tables_to_profile = [input_table for input_table in tables_to_profile if input_table not in projection_failures]
+
+    # Samples shared with the expectation suite stage (basic mode only: the other modes don't hold a sample)
+    cache = sample_cache.get_sample_cache(other_params)
+
+    if profiling_mode == "streaming":
+        # fetching and profiling are interleaved batch by batch, so each worker process streams its own tables
+        batch_size = int(other_params.get("batch_size", streaming_profiler.DEFAULT_BATCH_SIZE))
+        profiled_tables, failed_tables = run_per_table(
+            profile_table_streaming,
+            tables_to_profile,
+            max_workers,
+            ProcessPoolExecutor,
+            batch_size,
+            table_specs,
+            batches=scheduling.schedule(tables_to_profile, table_metadata, max_workers, table_specs),
+        )
+    elif profiling_mode == "pushdown":
+        # the work happens in the warehouse, so threads sharing the connection pool are enough here. The whole
+        # table is profiled, so 'sampling' settings don't apply. 'pushdown_dialect' is only set for other warehouses
+        # (see pushdown_profiler.DIALECTS), e.g. the local stand-in used by the benchmarks
+        profiled_tables, failed_tables = run_per_table(
+            profile_table_pushdown,
+            tables_to_profile,
+            max_workers,
+            ThreadPoolExecutor,
+            table_specs,
+            other_params.get("pushdown_dialect", "snowflake"),
+            batches=scheduling.schedule(tables_to_profile, table_metadata, max_workers, table_specs, sampled=False),
+        )
+    elif profiling_mode == "sharded":
+        # tables are profiled one at a time, each one's columns split into 'column_shards' groups (by default a few
+        # per worker) profiled concurrently. This suits wide tables, where a single table is the bottleneck
+        shard_count = int(other_params.get("column_shards", max_workers * sharded_profiler.DEFAULT_SHARDS_PER_WORKER))
+        with sharded_profiler.create_executor(max_workers) as executor:
+            profiled_tables, failed_tables = run_per_table(
+                profile_table_sharded,
+                tables_to_profile,
+                1,
+                None,
+                executor,
+                shard_count,
+                table_specs,
+                cache,
             )
-            generate_data_profiling_html(pandas_dataset, input_table)
+    elif other_params.get("async_queries"):
+        # every sample query is submitted up front, so the warehouse runs them concurrently
+        profiled_tables, failed_tables = profile_tables_async(
+            tables_to_profile, max_workers, table_specs, cache, other_params.get("max_queries_in_flight")
+        )
+    elif max_workers > 1:
+        logger.debug(f"Profiling {len(tables_to_profile)} table(s) with {max_workers} workers")
+        profiled_tables, failed_tables = profile_tables_concurrently(tables_to_profile, max_workers, table_specs, cache)
+    else:
+        profiled_tables, failed_tables = profile_tables_serially(tables_to_profile, table_specs, cache)
+
+    failed_tables.update(projection_failures)
+    update_profiling_index(profiled_tables, reused_tables)
+    if incremental:
+        record_profiled_tables(profiled_tables, state, fingerprints)
+
+    return failed_tables
+
+
+def main():
+    run_id = instrumentation.start_run()
+    try:
+        input_tables, other_params = config.load_config_from_yaml()
+        input_tables, other_params = table_discovery.discover_tables(input_tables, other_params)
+        failed_tables = profile_input_tables(input_tables, other_params)
     except Exception as e:
         logger.error(f"\nAn error occurred: {e}")
         sys.exit(1)
+    finally:
+        instrumentation.finish_run(run_id)
+
+    if failed_tables:
+        report_failed_tables(failed_tables, len(input_tables))
+        sys.exit(1)
 
 
 if __name__ == "__main__":
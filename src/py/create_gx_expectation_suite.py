@@ -1,10 +1,18 @@
+import logging
 import sys
 import warnings
+from concurrent.futures import as_completed
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from time import time
 
 import common
-import great_expectations as gx
+import config
+import instrumentation
+import projection
+import sample_cache
+import scheduling
+import table_discovery
+import table_state
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
@@ -12,17 +20,43 @@ load_dotenv()  # Load environment variables from .env file
 # Set up logging
 logger = common.get_logger()
 
-# Create a GX context
-context = gx.get_context()
+# great_expectations (and the GX context) are only loaded on first use, see common.LazyObject
+context = common.LazyObject(common.get_gx_context)
+gx_core = common.lazy_import("great_expectations.core")
+gx_resource_identifiers = common.lazy_import("great_expectations.data_context.types.resource_identifiers")
+gx_types_base = common.lazy_import("great_expectations.data_context.types.base")
+
+# Name of this stage's section in the table state file (see table_state)
+EXPECTATION_SUITE_STAGE = "expectation_suite"
+
+# Pandas datasource holding the cached table samples, when the sample cache is enabled
+SAMPLE_CACHE_DATASOURCE_NAME = "sample_cache"
+
+# Checkpoints only store their results: data docs are built once per run, see build_changed_data_docs()
+CHECKPOINT_ACTION_LIST = [
+    {"name": "store_validation_result", "action": {"class_name": "StoreValidationResultAction"}},
+    {"name": "store_evaluation_params", "action": {"class_name": "StoreEvaluationParametersAction"}},
+]
+
+# With 'batch_validation' set, every table is validated in one run of this checkpoint. Its action list also
+# records each validation's elapsed time (see validation_actions)
+BATCH_CHECKPOINT_NAME = "batch_checkpoint"
+BATCH_CHECKPOINT_ACTION_LIST = CHECKPOINT_ACTION_LIST + [
+    {
+        "name": "record_validation_time",
+        "action": {"class_name": "ValidationTimingAction", "module_name": "validation_actions"},
+    },
+]
 
 # Suppress DeprecationWarning for create_expectation_suite
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 
 def create_and_run_checkpoint(batch_request, expectation_suite_name):
-    """Create a checkpoint, run validations, and build data documentation."""
+    """Create a checkpoint and run validations (without building data documentation)."""
     checkpoint = context.add_or_update_checkpoint(
         name="my_checkpoint",
+        action_list=CHECKPOINT_ACTION_LIST,
         validations=[
             {
                 "batch_request": batch_request,
@@ -31,26 +65,128 @@ def create_and_run_checkpoint(batch_request, expectation_suite_name):
         ],
     )
     checkpoint_result = checkpoint.run()
-    context.build_data_docs()
 
     return checkpoint_result
 
 
-def save_expectation_suite(data_assistant_result, expectation_suite_name):
+def bounded_concurrency_config(max_workers):
+    """Return GX's concurrency config, with a checkpoint's validation threads capped at 'max_workers'.
+
+    GX otherwise starts a thread per validation (up to 100), i.e. one per table in a batch checkpoint.
+    """
+
+    class BoundedConcurrencyConfig(gx_types_base.ConcurrencyConfig):
+        @property
+        def max_database_query_concurrency(self):
+            return max_workers
+
+    return BoundedConcurrencyConfig(enabled=True)
+
+
+def run_batch_checkpoint(validations, max_workers):
+    """Validate every {"batch_request", "expectation_suite_name"} in 'validations' in a single checkpoint run.
+
+    The checkpoint is registered once, with the validations passed at run time, and they run on up to
+    'max_workers' threads. Returns the aggregated checkpoint result and each validation's elapsed seconds, by
+    expectation suite name.
+    """
+    checkpoint = context.add_or_update_checkpoint(name=BATCH_CHECKPOINT_NAME, action_list=BATCH_CHECKPOINT_ACTION_LIST)
+
+    # only for this run: the project's own concurrency setting is restored (and never saved)
+    concurrency = context.variables.concurrency
+    context.variables.concurrency = bounded_concurrency_config(max_workers)
+    try:
+        checkpoint_result = checkpoint.run(validations=validations)
+    finally:
+        context.variables.concurrency = concurrency
+
+    validation_times = {
+        validation_result_identifier.expectation_suite_identifier.expectation_suite_name: run_result["actions_results"][
+            "record_validation_time"
+        ]["elapsed_seconds"]
+        for validation_result_identifier, run_result in checkpoint_result.run_results.items()
+    }
+
+    return checkpoint_result, validation_times
+
+
+def validate_tables_in_batch(validations, max_workers):
+    """Validate the tables' expectation suites in one batch checkpoint run.
+
+    'validations' maps each table to its {"batch_request", "expectation_suite_name"}. If the batch run fails, the
+    tables are validated one checkpoint run at a time instead, so one bad table doesn't fail the others. Returns
+    the validation result identifiers, by table, and the tables that failed to validate.
+    """
+    validation_result_identifiers, failed_tables = {}, {}
+    tables_by_suite_name = {
+        validation["expectation_suite_name"]: input_table for input_table, validation in validations.items()
+    }
+
+    try:
+        checkpoint_result, validation_times = run_batch_checkpoint(list(validations.values()), max_workers)
+    except Exception as e:
+        logger.error(f"Batch checkpoint run failed, validating table by table instead: {e}")
+        for input_table, validation in validations.items():
+            try:
+                with instrumentation.timer("checkpoint", input_table):
+                    checkpoint_result = create_and_run_checkpoint(
+                        validation["batch_request"], validation["expectation_suite_name"]
+                    )
+            except Exception as e:
+                logger.error(f"Error validating table '{input_table}': {e}")
+                failed_tables[input_table] = e
+            else:
+                validation_result_identifiers[input_table] = checkpoint_result.list_validation_result_identifiers()
+        return validation_result_identifiers, failed_tables
+
+    for validation_result_identifier in checkpoint_result.list_validation_result_identifiers():
+        input_table = tables_by_suite_name[
+            validation_result_identifier.expectation_suite_identifier.expectation_suite_name
+        ]
+        validation_result_identifiers.setdefault(input_table, []).append(validation_result_identifier)
+
+    logger.info(
+        f"Validated {len(validations)} table(s) in one checkpoint run (success: {checkpoint_result.success}). "
+        "Time taken to validate each table:"
+    )
+    for expectation_suite_name, elapsed_time in sorted(validation_times.items()):
+        logger.info(f"{tables_by_suite_name[expectation_suite_name]}: {elapsed_time} seconds.")
+        instrumentation.record("checkpoint_seconds", elapsed_time, tables_by_suite_name[expectation_suite_name])
+
+    return validation_result_identifiers, failed_tables
+
+
+def build_changed_data_docs(resource_identifiers):
+    """Build data docs once, rendering only the given suites and validation results (plus the index page).
+
+    Pages for everything else already in the store are left untouched on disk.
+    """
+    if not resource_identifiers:
+        logger.info("No expectation suites or validations changed, data docs are up to date.")
+        return
+
+    with instrumentation.timer("docs_build"):
+        context.build_data_docs(resource_identifiers=resource_identifiers)
+    logger.debug(f"Built data docs for {len(resource_identifiers)} changed suite(s)/validation(s)")
+
+
+def save_expectation_suite(expectation_suite):
     """Save the expectation suite obtained from the data assistant."""
     try:
-        expectation_suite = data_assistant_result.get_expectation_suite(expectation_suite_name=expectation_suite_name)
         context.add_or_update_expectation_suite(expectation_suite=expectation_suite)
-        logger.info(f"\nExpectation suite '{expectation_suite_name}' saved successfully.\n")
+        logger.info(f"\nExpectation suite '{expectation_suite.expectation_suite_name}' saved successfully.\n")
     except Exception as e:
         logger.error(f"Error saving expectation suite: {e}")
         raise
 
 
-def run_onboarding_data_assistant(batch_request, exclude_column_names=[]):
+def run_onboarding_data_assistant(batch_request, exclude_column_names=None):
     """Run onboarding data assistant with the provided batch request and exclude column names."""
+    exclude_column_names = list(exclude_column_names or [])
     try:
-        data_assistant_result = context.assistants.onboarding.run(batch_request=batch_request)
+        data_assistant_result = context.assistants.onboarding.run(
+            batch_request=batch_request, exclude_column_names=exclude_column_names
+        )
         logger.debug("Data assistant run successful.")
         return data_assistant_result
     except Exception as e:
@@ -78,49 +214,289 @@ def prepare_batch_request(input_table, gx_data_src_name, row_count_limit):
     my_asset = context.get_datasource(gx_data_src_name).get_asset(input_table)  # Retrieve data asset
     batch_request = my_asset.build_batch_request()  # build batch request
 
-    batches = my_asset.get_batch_list_from_batch_request(batch_request)
-
-    [logger.debug(batch.batch_spec) for batch in batches]
+    # listing the batches runs the asset's query, so only do it when it's logged
+    if logger.isEnabledFor(logging.DEBUG):
+        batches = my_asset.get_batch_list_from_batch_request(batch_request)
+        [logger.debug(batch.batch_spec) for batch in batches]
 
     return batch_request
 
 
-def main():
-    """Main function to execute the script."""
+def prepare_cached_batch_request(datasource, input_table, table_spec, cache):
+    """Prepare a batch request over the table's cached sample, fetching it from Snowflake on a cache miss."""
+    df = sample_cache.fetch_sample(
+        input_table,
+        table_spec.row_count_limit,
+        table_spec.sampling,
+        cache,
+        table_spec.projection,
+        table_spec.row_count,
+    )
     try:
-        input_tables, other_params = common.load_config_from_yaml()
-        gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
-        logger.debug(
-            f"input tables = {input_tables}\ngx_data_src_name = {gx_data_src_name}\nrow_count_limit = {row_count_limit}"
-        )
+        my_asset = datasource.get_asset(input_table)
+    except LookupError:
+        my_asset = datasource.add_dataframe_asset(name=input_table)
+
+    return my_asset.build_batch_request(dataframe=df)
+
+
+def register_sample_cache_assets(input_tables):
+    """Add a dataframe asset per table to the sample cache datasource, before any worker processes start.
+
+    Workers then only read the datasource config, so they never race on writing great_expectations.yml.
+    """
+    datasource = context.sources.add_or_update_pandas(name=SAMPLE_CACHE_DATASOURCE_NAME)
+    for input_table in input_tables:
+        datasource.add_dataframe_asset(name=input_table)
+
+
+def build_batch_request(input_table, gx_data_src_name, table_spec, cache=None):
+    """Prepare a batch request over the table's cached sample (with the sample cache enabled) or its query asset."""
+    if cache is not None:
+        datasource = context.get_datasource(SAMPLE_CACHE_DATASOURCE_NAME)
+        return prepare_cached_batch_request(datasource, input_table, table_spec, cache)
+
+    return prepare_batch_request(input_table, gx_data_src_name, table_spec.row_count_limit)
+
+
+def select_changed_tables(input_tables, table_specs):
+    """Return the input tables whose data (or settings) changed since their suite was last validated, with the
+    table state and the tables' fingerprints (see record_validated_table).
+
+    Unchanged tables keep their existing expectation suite and validation results.
+    """
+    state = table_state.load_table_state()
+    settings_by_table = {input_table: table_specs[input_table].settings() for input_table in input_tables}
+    fingerprints = table_state.fetch_table_fingerprints(input_tables, settings_by_table)
+    existing_suite_names = set(context.list_expectation_suite_names())
+
+    changed_tables = []
+    for input_table in input_tables:
+        entry = table_state.get_unchanged_entry(state, EXPECTATION_SUITE_STAGE, input_table, fingerprints[input_table])
+        if entry is not None and entry["expectation_suite_name"] in existing_suite_names:
+            logger.info(f"Skipped unchanged table: {input_table}")
+        else:
+            changed_tables.append(input_table)
+
+    return changed_tables, state, fingerprints
+
+
+def record_validated_table(state, fingerprints, input_table, expectation_suite_name):
+    """Record a table's fingerprint and expectation suite once it's been validated (for incremental runs, i.e. with
+    a 'state' from select_changed_tables).
+    """
+    if state is None:
+        return
+    table_state.record_table_state(
+        state,
+        EXPECTATION_SUITE_STAGE,
+        input_table,
+        fingerprints[input_table],
+        expectation_suite_name=expectation_suite_name,
+    )
+    # saved per table, so a failed run doesn't redo the tables it already finished
+    table_state.save_table_state(state)
+
+
+def init_worker_context():
+    """Give each worker process its own GX context, rather than sharing the one inherited from the parent."""
+    common.reset_gx_context()
+
+
+def build_expectation_suite(input_table, expectation_suite_name, gx_data_src_name, table_spec, cache):
+    """Run the onboarding data assistant for a table and return its suite (as a dict) and the elapsed seconds.
+
+    The table's excluded columns (e.g. audit columns) aren't assessed. This only reads from the GX store, so it's
+    safe to run in worker processes: the suite is saved (and validated) by the parent process.
+    """
+    with instrumentation.table_scope(input_table):
+        batch_request = build_batch_request(input_table, gx_data_src_name, table_spec, cache)
 
-        table_times = []  # List to store elapsed time for each table
+        # Measure time taken by run_onboarding_data_assistant
+        with instrumentation.timer("data_assistant") as timing:
+            data_assistant_result = run_onboarding_data_assistant(
+                batch_request, exclude_column_names=table_spec.exclude_column_names()
+            )
 
+        expectation_suite = data_assistant_result.get_expectation_suite(expectation_suite_name=expectation_suite_name)
+        instrumentation.record_peak_rss()
+
+    return expectation_suite.to_json_dict(), int(round(timing.elapsed, 0))
+
+
+def generate_expectation_suites(input_tables, max_workers, task_args):
+    """Yield (input_table, expectation_suite_name, result, error) as each table's suite is built.
+
+    With max_workers > 1 the data assistant runs on a process pool, one GX context per worker. Results are
+    yielded in the parent process, which is the only writer to the GX store. 'task_args' maps each table to the
+    remaining build_expectation_suite() arguments.
+    """
+    expectation_suite_names = {input_table: prepare_expectation_suite(input_table) for input_table in input_tables}
+
+    if max_workers > 1 and len(input_tables) > 1:
+        logger.info(f"\nCreating (test) expectation suites for {len(input_tables)} table(s) with {max_workers} workers")
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker_context) as executor:
+            futures = {
+                executor.submit(
+                    build_expectation_suite, input_table, expectation_suite_names[input_table], *task_args[input_table]
+                ): input_table
+                for input_table in input_tables
+            }
+            for future in as_completed(futures):
+                input_table = futures[future]
+                try:
+                    yield input_table, expectation_suite_names[input_table], future.result(), None
+                except Exception as e:
+                    yield input_table, expectation_suite_names[input_table], None, e
+    else:
         for input_table in input_tables:
             logger.info(f"\nCreating (test) expectation suite for table: {input_table}")
-            batch_request = prepare_batch_request(input_table, gx_data_src_name, row_count_limit)
-            expectation_suite_name = prepare_expectation_suite(input_table)
+            try:
+                result = build_expectation_suite(
+                    input_table, expectation_suite_names[input_table], *task_args[input_table]
+                )
+            except Exception as e:
+                yield input_table, expectation_suite_names[input_table], None, e
+            else:
+                yield input_table, expectation_suite_names[input_table], result, None
+
+
+def save_and_validate_suite(input_table, expectation_suite_name, suite_dict, task_args, validations):
+    """Save a table's expectation suite, then validate it. Returns the changed resources (see
+    build_changed_data_docs).
+
+    With 'validations' given (batch validation), the table's validation is added to it to be run later with the
+    others, see validate_suites_in_batch().
+    """
+    # suites are saved and validated here, in one process, so workers never race on the GX store
+    with instrumentation.timer("suite_save", input_table):
+        save_expectation_suite(gx_core.ExpectationSuite(**suite_dict))
+    with instrumentation.table_scope(input_table):
+        batch_request = build_batch_request(input_table, *task_args)
+    changed_resources = [gx_resource_identifiers.ExpectationSuiteIdentifier(expectation_suite_name)]
+
+    if validations is not None:
+        validations[input_table] = {"batch_request": batch_request, "expectation_suite_name": expectation_suite_name}
+        return changed_resources
+
+    with instrumentation.timer("checkpoint", input_table):
+        checkpoint_result = create_and_run_checkpoint(batch_request, expectation_suite_name)
+    return changed_resources + checkpoint_result.list_validation_result_identifiers()
+
+
+def validate_suites_in_batch(validations, max_workers, state, fingerprints):
+    """Validate the saved suites in a single checkpoint run (see validate_tables_in_batch), recording each
+    validated table. Returns the changed resources and the tables that failed, with their errors.
+    """
+    changed_resources = []
+    validation_result_identifiers, failed_validations = validate_tables_in_batch(validations, max_workers)
+    for input_table, identifiers in validation_result_identifiers.items():
+        changed_resources.extend(identifiers)
+        record_validated_table(state, fingerprints, input_table, validations[input_table]["expectation_suite_name"])
+
+    return changed_resources, failed_validations
+
+
+def create_expectation_suites(input_tables, other_params):
+    """Build, save and validate the input tables' expectation suites, then build their data docs.
+
+    This is the expectation suite stage of both this script and the pipeline runner (run_pipeline.py). Returns the
+    tables that failed, with their errors.
+    """
+    gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
+    max_workers = int(other_params.get("max_workers", 1))
+    logger.debug(
+        f"input tables = {input_tables}\ngx_data_src_name = {gx_data_src_name}\nrow_count_limit = {row_count_limit}"
+    )
+    # row_count_limit, sampling and excluded columns, per table (see config.get_table_spec)
+    table_specs = config.get_table_specs(input_tables, other_params)
+
+    table_times = []  # List to store elapsed time for each table
+    failed_tables = {}
+    changed_resources = []  # suites and validation results to render in this run's data docs build
+
+    # With the sample cache enabled, the suites are built from the samples the profiler already fetched
+    cache = sample_cache.get_sample_cache(other_params)
+    if cache is not None:
+        register_sample_cache_assets(input_tables)
+
+    # With 'incremental' set, tables whose data hasn't changed since their last successful run keep their
+    # existing expectation suite and validation results
+    tables_to_process, state, fingerprints = input_tables, None, None
+    if other_params.get("incremental", False):
+        tables_to_process, state, fingerprints = select_changed_tables(input_tables, table_specs)
+
+    # Highest priority and largest tables first, so none of them is left running alone at the end (see scheduling)
+    tables_to_process = scheduling.order_largest_first(
+        tables_to_process, other_params.get("table_metadata"), table_specs
+    )
+
+    # The samples are read with the same projections as the query assets and the profiler's (see projection)
+    if cache is not None:
+        table_specs, failed_tables = projection.project_table_specs(table_specs, other_params, tables_to_process)
+        tables_to_process = [input_table for input_table in tables_to_process if input_table not in failed_tables]
+
+    # With 'batch_validation' set, the suites are saved as they're built, then validated all at once
+    validations = {} if other_params.get("batch_validation", False) else None
+
+    task_args = {input_table: (gx_data_src_name, table_specs[input_table], cache) for input_table in tables_to_process}
+    for input_table, expectation_suite_name, result, error in generate_expectation_suites(
+        tables_to_process, max_workers, task_args
+    ):
+        if error is not None:
+            logger.error(f"Error creating expectation suite for table '{input_table}': {error}")
+            failed_tables[input_table] = error
+            continue
+
+        suite_dict, elapsed_time = result
+        # Store elapsed time and input table information in the list
+        table_times.append({"table": input_table, "elapsed_time": elapsed_time})
+
+        changed_resources.extend(
+            save_and_validate_suite(
+                input_table, expectation_suite_name, suite_dict, task_args[input_table], validations
+            )
+        )
+        if validations is None:
+            record_validated_table(state, fingerprints, input_table, expectation_suite_name)
+
+    if validations:
+        batch_resources, failed_validations = validate_suites_in_batch(validations, max_workers, state, fingerprints)
+        changed_resources.extend(batch_resources)
+        failed_tables.update(failed_validations)
+    build_changed_data_docs(changed_resources)
 
-            # Measure time taken by run_onboarding_data_assistant
-            START_TIME = time()
-            data_assistant_result = run_onboarding_data_assistant(batch_request)
-            ELAPSED_TIME = int(round(time() - START_TIME, 0))
+    logger.info("Time taken to create (test) expectation suite for tables:")
+    # Log the elapsed time for each table after the for loop
+    for table_info in table_times:
+        logger.info(f"{table_info['table']}': {table_info['elapsed_time']} seconds.")
 
-            # Store elapsed time and input table information in the list
-            table_times.append({"table": input_table, "elapsed_time": ELAPSED_TIME})
+    return failed_tables
 
-            save_expectation_suite(data_assistant_result, expectation_suite_name)
-            create_and_run_checkpoint(batch_request, expectation_suite_name)
-        context.build_data_docs()
 
-        logger.info("Time taken to create (test) expectation suite for tables:")
-        # Log the elapsed time for each table after the for loop
-        for table_info in table_times:
-            logger.info(f"{table_info['table']}': {table_info['elapsed_time']} seconds.")
+def report_failed_tables(failed_tables, table_count):
+    """Log a summary of the tables whose expectation suite couldn't be created or validated."""
+    logger.error(f"\n{len(failed_tables)} of {table_count} table(s) failed:")
+    for input_table, error in failed_tables.items():
+        logger.error(f"{input_table}: {error}")
 
+
+def main():
+    """Main function to execute the script."""
+    run_id = instrumentation.start_run()
+    try:
+        input_tables, other_params = config.load_config_from_yaml()
+        input_tables, other_params = table_discovery.discover_tables(input_tables, other_params)
+        failed_tables = create_expectation_suites(input_tables, other_params)
     except Exception as e:
         logger.error(f"\nAn error occurred: {e}")
         sys.exit(1)
+    finally:
+        instrumentation.finish_run(run_id)
+
+    if failed_tables:
+        report_failed_tables(failed_tables, len(input_tables))
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -3,11 +3,20 @@ import sys
 import warnings
 
 import common
-import great_expectations as gx
+import config
+import projection
+import sampling
+import table_discovery
 
 # Set up logging
 logger = common.get_logger(log_level=logging.INFO)
 
+# great_expectations is only loaded on first use, see common.lazy_import
+gx_sql_datasource = common.lazy_import("great_expectations.datasource.fluent.sql_datasource")
+
+# Batch metadata marking the query assets registered by this script: only those are ever removed from the datasource
+LOADER_BATCH_METADATA = {"registered_by": "create_gx_snowflake_table_loader"}
+
 # Suppress DeprecationWarning for create_expectation_suite
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
@@ -24,35 +33,126 @@ def get_or_create_datasource(context, gx_data_src_name):
         )
 
 
+def build_wanted_queries(input_tables, other_params):
+    """Return each input table's query asset query, sampling up to its row_count_limit rows of the columns in its
+    projection (see projection): {table: query}. Also returns the tables that can't be queried, with their errors.
+    """
+    table_specs, failed_tables = projection.project_table_specs(
+        config.get_table_specs(input_tables, other_params), other_params
+    )
+    wanted_queries = {
+        table: sampling.build_sample_query(
+            table,
+            table_spec.row_count_limit,
+            table_spec.sampling,
+            warehouse_only=True,
+            projection=table_spec.projection,
+        )
+        for table, table_spec in table_specs.items()
+        if table not in failed_tables
+    }
+    return wanted_queries, failed_tables
+
+
+def diff_assets(registered_queries, wanted_queries, removable_assets, remove_unlisted=True):
+    """Compare the registered query assets ({name: query}) with the wanted ones.
+
+    Returns the names of the assets to add (new, or replacing one whose query changed), to remove (those of
+    'removable_assets' no longer listed, when 'remove_unlisted' is set) and to keep as they are.
+    """
+    to_add = [name for name, query in wanted_queries.items() if registered_queries.get(name) != query]
+    to_remove = [
+        name
+        for name in registered_queries
+        if name not in wanted_queries and name in removable_assets and remove_unlisted
+    ]
+    to_keep = [name for name in registered_queries if name not in to_add and name not in to_remove]
+    return to_add, to_remove, to_keep
+
+
+def find_conflicting_assets(registered_queries, wanted_queries, loader_assets):
+    """Return the wanted tables whose asset name is taken by an asset this script didn't register (e.g. a table
+    asset), with their errors. Those assets are never replaced.
+    """
+    return {
+        name: ValueError(f"'{name}' is already an asset of the datasource, not registered by this script")
+        for name, query in wanted_queries.items()
+        if name in registered_queries and name not in loader_assets and registered_queries[name] != query
+    }
+
+
+def register_snowflake_tables(input_tables, other_params, remove_unlisted=True):
+    """Register the input tables with the GX Snowflake datasource as query assets sampling up to row_count_limit rows.
+
+    The wanted assets are diffed against those already registered: only new tables and tables whose query changed
+    (e.g. new sampling settings) are (re-)added, and query assets this script registered for tables no longer listed
+    are removed unless 'remove_unlisted' is False. Other assets on the datasource are left alone: a table whose
+    name one of them already has is reported as failed. The datasource config is then saved once, however many
+    tables changed. This is the table loading stage of both this script and the pipeline runner (run_pipeline.py).
+    Returns the tables that couldn't be registered, with their errors (their existing assets are kept as they are).
+    """
+    # Set up a data context (created on first use, shared with any later stage in the same process)
+    context = common.get_gx_context()
+    datasource = get_or_create_datasource(context, other_params["gx_data_src_name"])
+
+    wanted_queries, failed_tables = build_wanted_queries(input_tables, other_params)
+    registered_assets = {asset.name: asset for asset in datasource.assets}
+    # table assets (not created by this script) have no query, so they never match a wanted query asset
+    registered_queries = {name: getattr(asset, "query", None) for name, asset in registered_assets.items()}
+    registered_by = LOADER_BATCH_METADATA["registered_by"]
+    loader_assets = {
+        name for name, asset in registered_assets.items() if asset.batch_metadata.get("registered_by") == registered_by
+    }
+    conflicting_assets = find_conflicting_assets(registered_queries, wanted_queries, loader_assets)
+    for name, error in conflicting_assets.items():
+        logger.error(f"Can't register table '{name}': {error}")
+    failed_tables.update(conflicting_assets)
+    wanted_queries.update({name: registered_queries[name] for name in failed_tables if name in registered_queries})
+    to_add, to_remove, to_keep = diff_assets(registered_queries, wanted_queries, loader_assets, remove_unlisted)
+
+    if not to_add and not to_remove:
+        logger.info(f"All {len(input_tables)} table(s) are already registered.")
+        return failed_tables
+
+    # the assets are built in memory (add_query_asset() would save the whole config for each one), as the
+    # datasource's own query asset type ...
+    query_asset_type = next(
+        asset_type for asset_type in datasource.asset_types if issubclass(asset_type, gx_sql_datasource.QueryAsset)
+    )
+    datasource.assets = [registered_assets[name] for name in to_keep] + [
+        query_asset_type(name=name, query=wanted_queries[name], batch_metadata=dict(LOADER_BATCH_METADATA))
+        for name in to_add
+    ]
+    # ... then the datasource is validated and saved once
+    context.update_datasource(datasource)
+
+    logger.info(
+        f"Registered {len(input_tables)} table(s): {len(to_add)} added or updated, {len(to_remove)} removed and "
+        f"{len(to_keep)} unchanged."
+    )
+
+    return failed_tables
+
+
 def add_snowflake_tables_to_gx():
     """Load configuration and add assets to the Great Expectations data context."""
     try:
         # Validate environment variables
         common.validate_environment_variables()
 
-        # Set up a data context
-        context = gx.data_context.DataContext()
-
         # Fetch input parameters from config.yaml
-        input_tables, other_params = common.load_config_from_yaml()
-
-        # Fetch the remaining params
-        gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
-
-        # Get or create datasource and add assets
-        for table in input_tables:
-            try:
-                datasource = get_or_create_datasource(context, gx_data_src_name)
-                # Add table as a query asset with row_count_limit
-                datasource.add_query_asset(name=table, query=f"SELECT * FROM {table} LIMIT {row_count_limit}")
-                logger.debug(f"Table '{table}' added successfully.")
-            except Exception as e:
-                logger.error(f"Error adding table '{table}': {e}")
-                raise
+        input_tables, other_params = config.load_config_from_yaml()
+        input_tables, other_params = table_discovery.discover_tables(input_tables, other_params, fetch_metadata=False)
+
+        failed_tables = register_snowflake_tables(input_tables, other_params)
     except (common.MissingEnvironmentVariableError, ValueError) as e:
         logger.error(f"\nAn error occurred: {e}")
         sys.exit(1)
 
+    if failed_tables:
+        logger.error(f"{len(failed_tables)} of {len(input_tables)} table(s) couldn't be registered.")
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     # Load and add assets to the Great Expectations data context
@@ -0,0 +1,233 @@
+import contextvars
+import csv
+import glob
+import json
+import os
+import resource
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from types import SimpleNamespace
+
+import common
+
+# Set up logging
+logger = common.get_logger()
+
+# Each run's metrics, one directory per run: a JSON lines file per process, then the run report
+METRICS_DIR = "gx/uncommitted/run_metrics"
+# Identifies the current run. It's an environment variable so worker processes record to the same run.
+RUN_ID_ENV_VAR = "GX_PROFILING_RUN_ID"
+# Run directories older than the most recent MAX_RUNS_KEPT are deleted when a run finishes
+MAX_RUNS_KEPT = 20
+
+# The timed steps, in pipeline order (as reported). 'fetch' includes 'dataframe_build', which is only reported
+# separately so it isn't counted twice in the per-table totals.
+STEPS = [
+    "fetch",
+    "dataframe_build",
+    "cache_read",
+    "profile",
+    "render",
+    "write",
+    "data_assistant",
+    "suite_save",
+    "checkpoint",
+    "docs_build",
+    "docs_patch",
+]
+NESTED_STEPS = {"dataframe_build"}
+# Counters recorded per table. A table's sample is read more than once (e.g. by both the profiler and the data
+# assistant), so the highest value is reported rather than the sum.
+COUNTERS = ["rows", "bytes", "peak_rss_mb"]
+RUN_LEVEL = "(run)"  # the 'table' of metrics that aren't for any one table, e.g. building the data docs
+
+# The table being processed on this thread, for metrics recorded without an explicit table
+_current_table = contextvars.ContextVar("current_table", default=None)
+_write_lock = threading.Lock()
+
+
+def start_run():
+    """Start recording this run's metrics (and those of its worker processes). Returns the run id.
+
+    When a run is already in progress (e.g. a stage run by the pipeline runner) its id is reused.
+    """
+    run_id = os.environ.get(RUN_ID_ENV_VAR)
+    if not run_id:
+        run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{os.getpid()}"
+        os.environ[RUN_ID_ENV_VAR] = run_id
+    return run_id
+
+
+def get_run_dir(run_id=None):
+    """Return the current (or given) run's metrics directory, or None outside of a run."""
+    run_id = run_id or os.environ.get(RUN_ID_ENV_VAR)
+    return os.path.join(METRICS_DIR, run_id) if run_id else None
+
+
+def record(metric, value, input_table=None):
+    """Record a metric for a table (by default, the table set by table_scope() on this thread)."""
+    run_dir = get_run_dir()
+    if run_dir is None:
+        return
+
+    event = {"table": input_table or _current_table.get() or RUN_LEVEL, "metric": metric, "value": value}
+    with _write_lock:
+        os.makedirs(run_dir, exist_ok=True)
+        with open(os.path.join(run_dir, f"{os.getpid()}.jsonl"), "a") as file:
+            file.write(json.dumps(event) + "\n")
+
+
+@contextmanager
+def table_scope(input_table):
+    """Attribute the metrics recorded on this thread to 'input_table' for the duration of the block."""
+    token = _current_table.set(input_table)
+    try:
+        yield
+    finally:
+        _current_table.reset(token)
+
+
+@contextmanager
+def timer(step, input_table=None):
+    """Time the block as 'step' (recorded as '<step>_seconds', even if it raises).
+
+    Yields an object whose 'elapsed' attribute is set to the elapsed seconds when the block exits.
+    """
+    timing = SimpleNamespace(elapsed=None)
+    start_time = perf_counter()
+    try:
+        yield timing
+    finally:
+        timing.elapsed = perf_counter() - start_time
+        record(f"{step}_seconds", timing.elapsed, input_table)
+
+
+def peak_rss_mb():
+    """Return this process' peak resident set size so far, in MB."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def record_peak_rss(input_table=None):
+    """Record the peak RSS of the process that's just processed a table.
+
+    Processes handle several tables, so this is the highest memory use up to and including that table.
+    """
+    record("peak_rss_mb", peak_rss_mb(), input_table)
+
+
+def load_events(run_dir):
+    """Load the metrics every process recorded during a run."""
+    events = []
+    for events_file in sorted(glob.glob(os.path.join(run_dir, "*.jsonl"))):
+        with open(events_file) as file:
+            events.extend(json.loads(line) for line in file if line.strip())
+    return events
+
+
+def build_report(events):
+    """Aggregate the recorded metrics into {table: {metric: value}} (timings summed, counters the highest seen)."""
+    report = {}
+    for event in events:
+        metrics = report.setdefault(event["table"], {})
+        if event["metric"] in COUNTERS:
+            metrics[event["metric"]] = max(metrics.get(event["metric"], 0), event["value"])
+        else:
+            metrics[event["metric"]] = metrics.get(event["metric"], 0) + event["value"]
+
+    for metrics in report.values():
+        metrics["total_seconds"] = sum(metrics.get(f"{step}_seconds", 0) for step in STEPS if step not in NESTED_STEPS)
+    return report
+
+
+def report_columns(report):
+    """Return the report's metric columns: the known steps and counters first, then anything else recorded."""
+    recorded_metrics = {metric for metrics in report.values() for metric in metrics}
+    known_metrics = [f"{step}_seconds" for step in STEPS] + COUNTERS + ["total_seconds"]
+    return [metric for metric in known_metrics if metric in recorded_metrics] + sorted(
+        recorded_metrics - set(known_metrics)
+    )
+
+
+def write_report(report, run_dir):
+    """Write the run report as JSON and CSV (one row per table). Returns the paths written."""
+    json_file, csv_file = os.path.join(run_dir, "report.json"), os.path.join(run_dir, "report.csv")
+    with open(json_file, "w") as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+    columns = report_columns(report)
+    with open(csv_file, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["table"] + columns)
+        for input_table in sorted(report):
+            writer.writerow([input_table] + [round_metric(report[input_table].get(metric)) for metric in columns])
+
+    return json_file, csv_file
+
+
+def round_metric(value):
+    return round(value, 3) if isinstance(value, float) else value
+
+
+def log_summary(report, slowest_table_count=10):
+    """Log the time spent per step (across tables), the run's totals and the slowest tables."""
+    tables = {input_table: metrics for input_table, metrics in report.items() if input_table != RUN_LEVEL}
+
+    logger.info(f"\n{'step':<18} {'tables':>7} {'total (s)':>10} {'mean (s)':>9} {'max (s)':>8}  slowest table")
+    for step in STEPS:
+        timings = {
+            input_table: metrics[f"{step}_seconds"]
+            for input_table, metrics in report.items()
+            if f"{step}_seconds" in metrics
+        }
+        if not timings:
+            continue
+        slowest_table = max(timings, key=timings.get)
+        logger.info(
+            f"{step:<18} {len(timings):>7} {sum(timings.values()):>10.1f} {sum(timings.values()) / len(timings):>9.2f}"
+            f" {timings[slowest_table]:>8.2f}  {slowest_table}"
+        )
+
+    rows = sum(metrics.get("rows", 0) for metrics in tables.values())
+    megabytes = sum(metrics.get("bytes", 0) for metrics in tables.values()) / 1e6
+    peak_rss = max((metrics.get("peak_rss_mb", 0) for metrics in report.values()), default=0)
+    logger.info(f"\n{len(tables)} table(s), {rows} rows, {megabytes:.1f} MB sampled, peak RSS {peak_rss:.0f} MB")
+
+    slowest_tables = sorted(tables, key=lambda input_table: tables[input_table]["total_seconds"], reverse=True)
+    if slowest_tables:
+        logger.info(f"Slowest table(s): {', '.join(slowest_tables[:slowest_table_count])}")
+
+
+def prune_old_runs(max_runs_kept=MAX_RUNS_KEPT):
+    """Delete all but the most recent run directories."""
+    run_dirs = sorted(glob.glob(os.path.join(METRICS_DIR, "*")), key=os.path.getmtime, reverse=True)
+    for run_dir in run_dirs[max_runs_kept:]:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def finish_run(run_id):
+    """Build, write and log the report for a run started by start_run(). Returns the report.
+
+    Does nothing (and returns None) when called for a run that this process didn't start, so a stage run by the
+    pipeline runner leaves the report to the runner.
+    """
+    if not run_id.endswith(f"_{os.getpid()}"):
+        return None
+
+    run_dir = get_run_dir(run_id)
+    events = load_events(run_dir) if os.path.isdir(run_dir) else []
+    if not events:
+        return None
+
+    report = build_report(events)
+    json_file, csv_file = write_report(report, run_dir)
+    log_summary(report)
+    logger.info(f"Run report: {json_file} (and {os.path.basename(csv_file)})")
+    prune_old_runs()
+
+    return report
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import re
+
+import common
+
+# Set up logging
+logger = common.get_logger()
+
+# Every profiling page written, as {input_table: {date: {page_type: content_hash}}}
+PAGE_MANIFEST_FILE = "gx/uncommitted/profiling_pages.json"
+# Length of the (hex) content hash used as a page's file name
+HASH_LENGTH = 32
+# Parts of a rendered page that change on every run without the profile changing: the logo URL's cache-busting
+# timestamp, the run time shown in the breadcrumb and the random ids of collapsible sections. They're left out of
+# the content hash, so identical profiles map to the same file.
+VOLATILE_CONTENT_PATTERNS = [
+    re.compile(r"logo-long\.png\?d=[0-9TZ.]+"),
+    re.compile(r"(collapse-body-)[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"),
+    re.compile(r'(<li class="ge-breadcrumbs-item breadcrumb-item active" aria-current="page">)[^<]*(</li>)'),
+]
+
+
+def remove_relative_paths(content):
+    """Removes occurrences of the string '../../../../' from the page content.
+
+    GX renders the pages for its own (deeper) directory layout, whereas ours sit one level below the site root.
+    """
+    return content.replace("../../../../", "../")
+
+
+def content_hash(content):
+    """Return the hash of a page's content, ignoring the parts that change on every render."""
+    for pattern in VOLATILE_CONTENT_PATTERNS:
+        content = pattern.sub(lambda match: "".join(group or "" for group in match.groups()), content)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+
+
+def page_hash(page_file):
+    """Return the content hash a page was stored under (its file name)."""
+    return os.path.splitext(os.path.basename(page_file))[0]
+
+
+def write_page(directory, content):
+    """Store a rendered page in 'directory' under its content hash and return its path.
+
+    The relative path fix-up is applied in memory, and the page is written once, atomically. If a page with the
+    same content is already stored it isn't written again.
+    """
+    content = remove_relative_paths(content)
+    page_file = os.path.join(directory, f"{content_hash(content)}.html")
+
+    if os.path.exists(page_file):
+        logger.debug(f"Unchanged page, not rewritten: {page_file}")
+        return page_file
+
+    os.makedirs(directory, exist_ok=True)
+    temp_file = f"{page_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temp_file, page_file)
+    logger.debug(f"Page written: {page_file}")
+
+    return page_file
+
+
+def load_page_manifest(manifest_file=PAGE_MANIFEST_FILE):
+    """Load the page manifest, or an empty one if there isn't one yet."""
+    try:
+        with open(manifest_file) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_page_manifest(manifest, manifest_file=PAGE_MANIFEST_FILE):
+    """Write the page manifest atomically."""
+    os.makedirs(os.path.dirname(manifest_file) or ".", exist_ok=True)
+    temp_file = f"{manifest_file}.tmp"
+    with open(temp_file, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(temp_file, manifest_file)
+
+
+def record_pages(manifest, input_table, date, pages):
+    """Record the content hashes of a table's pages ({page_type: page_file}) for a profiling date."""
+    manifest.setdefault(input_table, {})[date] = {page_type: page_hash(page) for page_type, page in pages.items()}
@@ -0,0 +1,178 @@
+from datetime import datetime
+from datetime import timezone
+from time import time
+
+import great_expectations as gx
+from great_expectations.core import ExpectationConfiguration
+from great_expectations.core import ExpectationSuite
+from great_expectations.core import ExpectationSuiteValidationResult
+from great_expectations.core import ExpectationValidationResult
+from great_expectations.core.profiler_types_mapping import ProfilerTypeMapping
+from great_expectations.core.run_identifier import RunIdentifier
+
+# Quantiles reported for numeric columns, as per BasicDatasetProfiler
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+TYPE_LISTS = {
+    "int": sorted(ProfilerTypeMapping.INT_TYPE_NAMES),
+    "float": sorted(ProfilerTypeMapping.FLOAT_TYPE_NAMES),
+    "string": sorted(ProfilerTypeMapping.STRING_TYPE_NAMES),
+    "datetime": sorted(ProfilerTypeMapping.DATETIME_TYPE_NAMES),
+    "bool": sorted(ProfilerTypeMapping.BOOLEAN_TYPE_NAMES),
+}
+
+NO_EXCEPTION_INFO = {"raised_exception": False, "exception_message": None, "exception_traceback": None}
+
+
+def _percent(part, whole):
+    return 100.0 * part / whole if whole else None
+
+
+def _expectation(profiler_name, expectation_type, **kwargs):
+    return ExpectationConfiguration(
+        expectation_type=expectation_type, kwargs=kwargs, meta={profiler_name: {"confidence": "very low"}}
+    )
+
+
+def _column_statistics(profiler_name, column_profile):
+    """Yield (expectation, result) pairs for one column, mirroring what BasicDatasetProfiler records."""
+    column, kind = column_profile["column"], column_profile["kind"]
+    element_count, null_count = column_profile["element_count"], column_profile["null_count"]
+    non_null_count = element_count - null_count
+    distinct_count = column_profile["distinct_count"]
+    counts = {"element_count": element_count, "missing_count": None, "missing_percent": None}
+
+    if kind in TYPE_LISTS:
+        yield _expectation(
+            profiler_name, "expect_column_values_to_be_in_type_list", column=column, type_list=TYPE_LISTS[kind]
+        ), {"observed_value": column_profile["dtype"]}
+
+    yield _expectation(
+        profiler_name, "expect_column_unique_value_count_to_be_between", column=column, min_value=None, max_value=None
+    ), {"observed_value": distinct_count, **counts}
+    yield _expectation(
+        profiler_name,
+        "expect_column_proportion_of_unique_values_to_be_between",
+        column=column,
+        min_value=None,
+        max_value=None,
+    ), {"observed_value": distinct_count / non_null_count if non_null_count else None, **counts}
+    yield _expectation(profiler_name, "expect_column_values_to_not_be_null", column=column, mostly=0.5), {
+        "element_count": element_count,
+        "unexpected_count": null_count,
+        "unexpected_percent": _percent(null_count, element_count),
+        "unexpected_percent_total": _percent(null_count, element_count),
+        "partial_unexpected_list": [],
+    }
+
+    if column_profile["min"] is not None:
+        for statistic in ("min", "max"):
+            yield _expectation(
+                profiler_name, f"expect_column_{statistic}_to_be_between", column=column, min_value=None, max_value=None
+            ), {"observed_value": column_profile[statistic], **counts}
+
+    if column_profile["mean"] is not None:
+        yield _expectation(
+            profiler_name, "expect_column_mean_to_be_between", column=column, min_value=None, max_value=None
+        ), {"observed_value": column_profile["mean"], **counts}
+
+    if column_profile["stdev"] is not None:
+        yield _expectation(
+            profiler_name, "expect_column_stdev_to_be_between", column=column, min_value=None, max_value=None
+        ), {"observed_value": column_profile["stdev"], **counts}
+
+    if column_profile["quantiles"]:
+        quantiles = list(column_profile["quantiles"])
+        values = list(column_profile["quantiles"].values())
+        if 0.5 in column_profile["quantiles"]:
+            yield _expectation(
+                profiler_name, "expect_column_median_to_be_between", column=column, min_value=None, max_value=None
+            ), {"observed_value": column_profile["quantiles"][0.5], **counts}
+        yield _expectation(
+            profiler_name,
+            "expect_column_quantile_values_to_be_between",
+            column=column,
+            quantile_ranges={"quantiles": quantiles, "value_ranges": [[None, None] for _ in quantiles]},
+        ), {
+            "observed_value": {"quantiles": quantiles, "values": values},
+            **counts,
+            "details": {"success_details": [True for _ in quantiles]},
+        }
+
+
+def _top_values_statistics(profiler_name, column_profile):
+    """Yield the (expectation, result) pair that renders a column's most frequent values as a bar chart."""
+    column, element_count = column_profile["column"], column_profile["element_count"]
+    top_values = column_profile["top_values"]
+
+    yield _expectation(profiler_name, "expect_column_distinct_values_to_be_in_set", column=column, value_set=None), {
+        "observed_value": [value for value, _ in top_values],
+        "element_count": element_count,
+        "missing_count": None,
+        "missing_percent": None,
+        "details": {"value_counts": [{"value": value, "count": count} for value, count in top_values]},
+    }
+
+
+def build_profiling_results(column_profiles, row_count, profiler_name, expectation_suite_name="default"):
+    """Build an expectation suite and profiling validation result from precomputed column statistics.
+
+    'column_profiles' is an ordered list of per-column dicts, as produced by
+    column_sketches.ColumnAccumulator.to_column_profile() or pushdown_profiler.profile_table(). An optional
+    'top_values' list of (value, count) pairs adds a value counts chart for the column. The output has the same
+    shape as the result of PandasDataset.profile(BasicDatasetProfiler), so it renders with
+    ProfilingResultsPageRenderer and ExpectationSuitePageRenderer unchanged.
+    """
+    column_names = [column_profile["column"] for column_profile in column_profiles]
+    statistics = [
+        (
+            _expectation(profiler_name, "expect_table_row_count_to_be_between", min_value=0, max_value=None),
+            {"observed_value": row_count},
+        ),
+        (
+            _expectation(profiler_name, "expect_table_columns_to_match_ordered_list", column_list=None),
+            {"observed_value": column_names},
+        ),
+    ]
+    for column_profile in column_profiles:
+        statistics.extend(_column_statistics(profiler_name, column_profile))
+        if column_profile.get("top_values"):
+            statistics.extend(_top_values_statistics(profiler_name, column_profile))
+
+    suite_meta = {
+        "great_expectations_version": gx.__version__,
+        "columns": {column: {"description": ""} for column in column_names},
+        profiler_name: {"created_by": profiler_name, "created_at": time()},
+    }
+    expectation_suite = ExpectationSuite(
+        expectation_suite_name=expectation_suite_name,
+        expectations=[expectation for expectation, _ in statistics],
+        meta=suite_meta,
+    )
+
+    validation_result = ExpectationSuiteValidationResult(
+        success=True,
+        results=[
+            ExpectationValidationResult(
+                success=True, expectation_config=expectation, result=result, exception_info=dict(NO_EXCEPTION_INFO)
+            )
+            for expectation, result in statistics
+        ],
+        evaluation_parameters={},
+        statistics={
+            "evaluated_expectations": len(statistics),
+            "successful_expectations": len(statistics),
+            "unsuccessful_expectations": 0,
+            "success_percent": 100.0,
+        },
+        meta={
+            "great_expectations_version": gx.__version__,
+            "expectation_suite_name": expectation_suite_name,
+            "run_id": RunIdentifier(run_name="profiling"),
+            "batch_kwargs": {},
+            "validation_time": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ"),
+            "expectation_suite_meta": suite_meta,
+        },
+    )
+
+    return expectation_suite, validation_result
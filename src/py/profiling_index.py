@@ -0,0 +1,126 @@
+import json
+import os
+from datetime import datetime
+
+import common
+import page_store
+
+# Set up logging
+logger = common.get_logger()
+
+DATA_DOCS_DIR = "gx/uncommitted/data_docs/local_site/"
+# Every profiled table's latest pages and headline statistics, maintained by the profiler
+PROFILING_INDEX_FILE = "gx/uncommitted/profiling_index.json"
+# The client-side copy of the index loaded by the data docs 'Profiling Results' tab. It's a script rather than a
+# JSON file as browsers don't allow fetch() from the file:// URLs data docs are opened with.
+PROFILING_MANIFEST_FILE = "profiling_manifest.js"
+
+
+def _table_statistics(validation_result):
+    """Return the row and column counts recorded in a profiling validation result."""
+    row_count = column_count = None
+    for result in validation_result.results:
+        expectation_type = result.expectation_config.expectation_type
+        if expectation_type == "expect_table_row_count_to_be_between":
+            row_count = result.result.get("observed_value")
+        elif expectation_type == "expect_table_columns_to_match_ordered_list":
+            column_count = len(result.result.get("observed_value") or [])
+    return row_count, column_count
+
+
+def _site_path(path):
+    """Return a data docs page's path relative to the site root, as linked from index.html."""
+    if path.startswith(DATA_DOCS_DIR):
+        return path.replace(DATA_DOCS_DIR, "", 1)
+    return os.path.relpath(path, DATA_DOCS_DIR)
+
+
+def build_entry(input_table, output_files, validation_result=None):
+    """Return a table's profiling index entry: its page paths (relative to the data docs site) and headline stats.
+
+    'output_files' are the table's profiling results and expectation suite pages, in that order.
+    """
+    row_count, column_count = _table_statistics(validation_result) if validation_result else (None, None)
+    profiling_results_file, expectation_suite_file = output_files
+
+    return {
+        "table": input_table,
+        "date": datetime.now().strftime("%Y-%m-%d"),
+        "profiling_results_path": _site_path(profiling_results_file),
+        "expectation_suite_path": _site_path(expectation_suite_file),
+        "row_count": row_count,
+        "column_count": column_count,
+    }
+
+
+def entry_pages(entry):
+    """Return the paths of a profiling index entry's pages, as {page_type: page_file}."""
+    return {
+        page_type: os.path.join(DATA_DOCS_DIR, entry[f"{page_type}_path"])
+        for page_type in ("profiling_results", "expectation_suite")
+    }
+
+
+def entry_from_page_manifest(input_table, page_manifest):
+    """Return an index entry (without statistics) for a table's latest pages in the page manifest (see page_store),
+    or None if it has none.
+    """
+    table_pages = page_manifest.get(input_table)
+    if not table_pages:
+        return None
+
+    date = max(table_pages)
+    page_hashes = table_pages[date]
+    entry = build_entry(
+        input_table,
+        [
+            os.path.join(DATA_DOCS_DIR, page_type, f"{page_hashes[page_type]}.html")
+            for page_type in ("profiling_results", "expectation_suite")
+        ],
+    )
+    entry["date"] = date
+    return entry
+
+
+def load_profiling_index(index_file=PROFILING_INDEX_FILE):
+    """Load the profiling index as {input_table: entry}, or an empty index if there isn't one yet."""
+    try:
+        with open(index_file) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_profiling_index(index, index_file=PROFILING_INDEX_FILE):
+    """Write the profiling index atomically."""
+    os.makedirs(os.path.dirname(index_file) or ".", exist_ok=True)
+    temp_file = f"{index_file}.tmp"
+    with open(temp_file, "w") as file:
+        json.dump(index, file, indent=2, sort_keys=True)
+    os.replace(temp_file, index_file)
+
+
+def write_profiling_manifest(input_tables, manifest_dir=DATA_DOCS_DIR, index_file=PROFILING_INDEX_FILE):
+    """Write the compact manifest of the input tables' profiling pages that the data docs index loads on demand.
+
+    Tables missing from the profiling index (e.g. profiled before it existed) get an entry for their latest pages in
+    the page manifest, without statistics, and tables with no pages at all are left out. Returns the manifest's path.
+    """
+    index = load_profiling_index(index_file)
+    page_manifest = page_store.load_page_manifest()
+    entries = [
+        entry
+        for input_table in input_tables
+        if (entry := index.get(input_table) or entry_from_page_manifest(input_table, page_manifest))
+    ]
+    if len(entries) < len(input_tables):
+        logger.debug(f"{len(input_tables) - len(entries)} table(s) have no profiling pages yet.")
+
+    # '</' is escaped so a table name can never close the <script> element the manifest is loaded into
+    manifest_json = json.dumps(entries, separators=(",", ":")).replace("</", "<\\/")
+    manifest_file = os.path.join(manifest_dir, PROFILING_MANIFEST_FILE)
+    with open(manifest_file, "w", encoding="utf-8") as file:
+        file.write(f"window.profilingManifest = {manifest_json};\n")
+    logger.debug(f"Wrote profiling manifest for {len(entries)} table(s): {manifest_file}")
+
+    return manifest_file
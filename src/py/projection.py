@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+import pushdown_profiler
+import snowflake_client
+
+# Set up logging
+logger = common.get_logger()
+
+# Column types that are read in a compact form instead of in full: semi-structured values can be arbitrarily
+# large, and aren't profiled beyond counts and distinct values anyway
+COMPACT_PROJECTIONS = {
+    "VARIANT": "TYPEOF({column})",  # the type of the JSON value, e.g. 'object' or 'integer'
+    "OBJECT": "ARRAY_SIZE(OBJECT_KEYS({column}))",  # number of keys
+    "ARRAY": "ARRAY_SIZE({column})",  # number of elements
+    "BINARY": "LENGTH({column})",  # bytes
+    "BLOB": "LENGTH({column})",
+    "GEOGRAPHY": "ST_NPOINTS({column})",  # number of points
+    "GEOMETRY": "ST_NPOINTS({column})",
+}
+
+# Projections built so far in this process: {(dialect, table, exclude_columns, max_text_length): select list}
+_projections = {}
+
+
+def build_projection(columns, exclude_columns=(), max_text_length=None):
+    """Build the select list for a table's columns [(column_name, sql_type_name)].
+
+    Excluded columns are left out, semi-structured and binary columns are read in a compact form (see
+    COMPACT_PROJECTIONS) and, with 'max_text_length' set, text columns are truncated to that many characters. Each
+    column keeps its name. Returns '*' if that's the same as selecting every column as it is.
+    """
+    excluded = {column.upper() for column in exclude_columns}
+    select_items, projected = [], False
+
+    for column_name, type_name in columns:
+        if column_name.upper() in excluded:
+            projected = True
+            continue
+
+        column = pushdown_profiler.quote_identifier(column_name)
+        base_type = (type_name or "").strip().upper().split("(")[0]
+        if base_type in COMPACT_PROJECTIONS:
+            expression = COMPACT_PROJECTIONS[base_type].format(column=column)
+        elif max_text_length and pushdown_profiler.kind_from_sql_type(type_name) == "string":
+            expression = f"SUBSTR({column}, 1, {max_text_length})"
+        else:
+            select_items.append(column)
+            continue
+
+        select_items.append(f"{expression} AS {column}")
+        projected = True
+
+    if not select_items:
+        raise ValueError("Every column is excluded, so there's nothing to profile.")
+
+    return ", ".join(select_items) if projected else "*"
+
+
+def get_projection(input_table, table_spec, dialect_name="snowflake"):
+    """Return a table's select list (see build_projection), reading its columns from the warehouse once.
+
+    The columns are described by an empty query, so nothing is scanned. If that fails the table is read in full
+    ('*') and the error is left to the query that samples it.
+    """
+    key = (dialect_name, input_table, table_spec.exclude_columns, table_spec.max_text_length)
+    if key not in _projections:
+        try:
+            with snowflake_client.get_connection_pool().connection() as conn:
+                columns = pushdown_profiler.DIALECTS[dialect_name].describe_columns(conn, input_table)
+        except Exception as e:
+            logger.warning(f"Couldn't read the columns of '{input_table}', all of them will be queried: {e}")
+            return "*"
+        _projections[key] = build_projection(columns, table_spec.exclude_columns, table_spec.max_text_length)
+        logger.debug(f"Projection for '{input_table}': {_projections[key]}")
+
+    return _projections[key]
+
+
+def project_table_specs(table_specs, other_params, input_tables=None):
+    """Set the projections of 'input_tables' (by default every table) in their table specs, describing their
+    columns on up to 'max_workers' threads. The projections are built in this process, so worker processes are
+    handed them with the specs.
+
+    Returns the table specs and {input_table: error} for the tables that can't be projected (every column is
+    excluded), which are left for the caller to report as failed rather than failing every table.
+
+    Set 'column_projection: false' to query every column instead. 'pushdown_dialect' (see
+    pushdown_profiler.DIALECTS) is only set for warehouses other than Snowflake, e.g. the local stand-in used by
+    the benchmarks.
+    """
+    if not other_params.get("column_projection", True):
+        return table_specs, {}
+
+    dialect_name = other_params.get("pushdown_dialect", "snowflake")
+    max_workers = int(other_params.get("max_workers", 1))
+    input_tables = list(table_specs) if input_tables is None else input_tables
+
+    def project(input_table):
+        table_spec = table_specs[input_table]
+        try:
+            return (
+                input_table,
+                table_spec.replace(projection=get_projection(input_table, table_spec, dialect_name)),
+                None,
+            )
+        except ValueError as e:
+            return input_table, table_spec, e
+
+    projected_specs, failed_tables = dict(table_specs), {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for input_table, table_spec, error in executor.map(project, input_tables):
+            if error is not None:
+                logger.error(f"Can't query table '{input_table}': {error}")
+                failed_tables[input_table] = error
+            projected_specs[input_table] = table_spec
+
+    return projected_specs, failed_tables
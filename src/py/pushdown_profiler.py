@@ -0,0 +1,237 @@
+import json
+import math
+import re
+from decimal import Decimal
+
+import common
+import instrumentation
+
+# Set up logging
+logger = common.get_logger()
+
+# profile_results builds GX objects, so great_expectations (like the Snowflake connector) is imported on first use
+profile_results = common.lazy_import("profile_results")
+snowflake_constants = common.lazy_import("snowflake.connector.constants")
+
+PROFILER_NAME = "PushdownProfiler"
+DEFAULT_TOP_K = 10  # most frequent values reported per (non-numeric) column
+
+# SQL type name prefixes -> the broad column kinds used by profile_results
+SQL_TYPE_KINDS = [
+    (r"^(BOOL)", "bool"),
+    (r"^(TINYINT|SMALLINT|INT|BIGINT|HUGEINT|UBIGINT|UINTEGER|USMALLINT|UTINYINT|BYTEINT)", "int"),
+    (r"^(NUMBER|NUMERIC|DECIMAL|FIXED)\s*\(\s*\d+\s*,\s*0\s*\)", "int"),
+    (r"^(NUMBER|NUMERIC|DECIMAL|FIXED|REAL|FLOAT|DOUBLE)", "float"),
+    (r"^(DATE|TIME|DATETIME|TIMESTAMP)", "datetime"),
+    (r"^(TEXT|VARCHAR|CHAR|STRING|CHARACTER|NCHAR|NVARCHAR|CLOB)", "string"),
+]
+
+
+def kind_from_sql_type(type_name):
+    """Map a SQL column type name to 'int', 'float', 'bool', 'datetime', 'string' or 'unknown'."""
+    type_name = (type_name or "").strip().upper()
+    for pattern, kind in SQL_TYPE_KINDS:
+        if re.match(pattern, type_name):
+            return kind
+    # e.g. VARIANT, OBJECT, ARRAY, BINARY, GEOGRAPHY: only counts/nulls/distinct values are computed
+    return "unknown"
+
+
+class SnowflakeDialect:
+    """Aggregate SQL for Snowflake, using its approximate (sketch-based) aggregate functions."""
+
+    name = "snowflake"
+
+    def describe_columns(self, conn, input_tbl):
+        """Return [(column_name, sql_type_name)] for a table, from the result metadata of an empty query."""
+        snowflake_cursor = conn.cursor()
+        try:
+            snowflake_cursor.execute(f"SELECT * FROM {input_tbl} LIMIT 0")
+            description = snowflake_cursor.description
+        finally:
+            snowflake_cursor.close()
+
+        columns = []
+        for column in description:
+            type_name = snowflake_constants.FIELD_ID_TO_NAME[column.type_code]
+            if type_name == "FIXED":
+                type_name = f"NUMBER({column.precision}, {column.scale})"
+            columns.append((column.name, type_name))
+        return columns
+
+    def null_count(self, column):
+        return f"COUNT_IF({column} IS NULL)"
+
+    def distinct_count(self, column):
+        return f"APPROX_COUNT_DISTINCT({column})"
+
+    def stdev(self, column):
+        return f"STDDEV({column})"
+
+    def quantile(self, column, quantile):
+        return f"APPROX_PERCENTILE({column}, {quantile})"
+
+    def top_k(self, column, k):
+        return f"APPROX_TOP_K({column}, {k})"
+
+    def parse_top_k(self, value):
+        # APPROX_TOP_K returns a VARIANT array of [value, count] pairs, which the connector hands back as JSON
+        return [tuple(pair) for pair in json.loads(value)] if value else []
+
+
+class DuckDBDialect(SnowflakeDialect):
+    """Aggregate SQL for DuckDB - a local stand-in for Snowflake when developing/benchmarking offline."""
+
+    name = "duckdb"
+
+    def describe_columns(self, conn, input_tbl):
+        rows = conn.execute(f"DESCRIBE SELECT * FROM {input_tbl}").fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def stdev(self, column):
+        return f"STDDEV_SAMP({column})"
+
+    def quantile(self, column, quantile):
+        return f"APPROX_QUANTILE({column}, {quantile})"
+
+    # DuckDB's approx_top_k returns values without their counts, so top-k isn't pushed down
+    top_k = None
+
+
+class SQLiteDialect:
+    """Aggregate SQL for SQLite, which has exact aggregates only (no stddev, percentiles or top-k)."""
+
+    name = "sqlite"
+
+    def describe_columns(self, conn, input_tbl):
+        rows = conn.execute(f"PRAGMA table_info({input_tbl})").fetchall()
+        return [(row[1], row[2]) for row in rows]
+
+    def null_count(self, column):
+        return f"COALESCE(SUM(CASE WHEN {column} IS NULL THEN 1 ELSE 0 END), 0)"
+
+    def distinct_count(self, column):
+        return f"COUNT(DISTINCT {column})"
+
+    def stdev(self, column):
+        # derived from the mean of squares in Python (see _parse_aggregates), as SQLite has no STDDEV
+        return f"AVG(CAST({column} AS REAL) * {column})"
+
+    quantile = None
+    top_k = None
+
+
+DIALECTS = {dialect.name: dialect for dialect in (SnowflakeDialect(), DuckDBDialect(), SQLiteDialect())}
+
+
+def quote_identifier(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def build_aggregate_query(input_tbl, columns, dialect, top_k=DEFAULT_TOP_K):
+    """Build a single aggregate query computing every column's summary statistics.
+
+    Returns the SQL and a list of (column_index, statistic) labels, one per output column after the leading
+    row count, so the result row can be mapped back without relying on the dialect's alias casing.
+    """
+    select_list, labels = ["COUNT(*)"], []
+
+    def add(column_index, statistic, expression):
+        select_list.append(expression)
+        labels.append((column_index, statistic))
+
+    for column_index, (column_name, _, kind) in enumerate(columns):
+        column = quote_identifier(column_name)
+        add(column_index, "null_count", dialect.null_count(column))
+        add(column_index, "distinct_count", dialect.distinct_count(column))
+        if kind in ("int", "float", "datetime"):
+            add(column_index, "min", f"MIN({column})")
+            add(column_index, "max", f"MAX({column})")
+        if kind in ("int", "float"):
+            add(column_index, "mean", f"AVG({column})")
+            add(column_index, "stdev", dialect.stdev(column))
+            if dialect.quantile:
+                for quantile in profile_results.QUANTILES:
+                    add(column_index, ("quantile", quantile), dialect.quantile(column, quantile))
+        elif kind in ("string", "bool") and dialect.top_k and top_k:
+            add(column_index, "top_values", dialect.top_k(column, top_k))
+
+    return f"SELECT {', '.join(select_list)} FROM {input_tbl}", labels
+
+
+def _to_python_number(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _parse_aggregates(row, labels, columns, dialect):
+    """Turn the aggregate query's single result row into per-column profiles for profile_results."""
+    row_count = row[0]
+    column_profiles = [
+        {
+            "column": column_name,
+            "kind": kind,
+            "dtype": type_name,
+            "element_count": row_count,
+            "null_count": 0,
+            "distinct_count": 0,
+            "min": None,
+            "max": None,
+            "mean": None,
+            "stdev": None,
+            "quantiles": {} if kind in ("int", "float") and dialect.quantile else None,
+            "top_values": None,
+        }
+        for column_name, type_name, kind in columns
+    ]
+
+    for (column_index, statistic), value in zip(labels, row[1:]):
+        column_profile = column_profiles[column_index]
+        if isinstance(statistic, tuple):
+            column_profile["quantiles"][statistic[1]] = _to_python_number(value)
+        elif statistic == "top_values":
+            column_profile["top_values"] = dialect.parse_top_k(value)
+        else:
+            column_profile[statistic] = _to_python_number(value)
+
+    for column_profile in column_profiles:
+        non_null_count = row_count - column_profile["null_count"]
+        if dialect.name == "sqlite" and column_profile["stdev"] is not None:
+            # the query returned the mean of squares: convert to a sample standard deviation
+            variance = max(column_profile["stdev"] - column_profile["mean"] ** 2, 0.0)
+            column_profile["stdev"] = (
+                math.sqrt(variance * non_null_count / (non_null_count - 1)) if non_null_count > 1 else None
+            )
+        if column_profile["kind"] == "int" and column_profile["min"] is not None:
+            column_profile["min"], column_profile["max"] = int(column_profile["min"]), int(column_profile["max"])
+
+    return row_count, column_profiles
+
+
+def profile_table(conn, input_tbl, dialect_name="snowflake", top_k=DEFAULT_TOP_K, exclude_columns=()):
+    """Profile a whole table in the warehouse with one aggregate query, returning (suite, validation_result).
+
+    Only the single summary row is transferred, so the full table is profiled without sampling it into Python.
+    'exclude_columns' are left out of the query.
+    """
+    dialect = DIALECTS[dialect_name]
+    excluded = {column.upper() for column in exclude_columns}
+    columns = [
+        (column_name, type_name, kind_from_sql_type(type_name))
+        for column_name, type_name in dialect.describe_columns(conn, input_tbl)
+        if column_name.upper() not in excluded
+    ]
+    sql_query, labels = build_aggregate_query(input_tbl, columns, dialect, top_k)
+    logger.debug(sql_query)
+
+    cursor = conn.cursor()
+    try:
+        with instrumentation.timer("fetch"):
+            cursor.execute(sql_query)
+            row = cursor.fetchone()
+    finally:
+        cursor.close()
+
+    row_count, column_profiles = _parse_aggregates(row, labels, columns, dialect)
+    instrumentation.record("rows", row_count)
+
+    return profile_results.build_profiling_results(column_profiles, row_count, PROFILER_NAME)
@@ -0,0 +1,62 @@
+import os
+from functools import lru_cache
+
+import common
+from jinja2 import Environment
+from jinja2 import FileSystemBytecodeCache
+from jinja2 import FileSystemLoader
+
+# GX's renderers and views are only imported once a page is rendered
+gx_renderer = common.lazy_import("great_expectations.render.renderer")
+gx_view = common.lazy_import("great_expectations.render.view")
+
+# Compiled templates, shared across runs and worker processes (Jinja writes each entry atomically)
+BYTECODE_CACHE_DIR = "gx/uncommitted/jinja_bytecode_cache"
+
+# Each process builds its environments, views and renderers once (lru_cache) and reuses them for every page, so
+# templates are loaded and compiled at most once per process, and only read from the bytecode cache after the
+# first run. Worker processes forked after first use inherit them.
+
+
+@lru_cache(maxsize=None)
+def get_bytecode_cache(cache_dir=BYTECODE_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    return FileSystemBytecodeCache(cache_dir)
+
+
+@lru_cache(maxsize=None)
+def get_jinja_environment(templates_dir):
+    """Return the shared Jinja environment for a templates directory."""
+    return Environment(loader=FileSystemLoader(templates_dir), autoescape=True, bytecode_cache=get_bytecode_cache())
+
+
+@lru_cache(maxsize=None)
+def get_page_view():
+    """Return the shared GX page view.
+
+    Every DefaultJinjaPageView creates its own Jinja environment, so a new view per page recompiles all of GX's
+    page templates; a single view keeps them in its environment's template cache.
+    """
+    page_view = gx_view.DefaultJinjaPageView()
+    page_view.env.bytecode_cache = get_bytecode_cache()
+    return page_view
+
+
+@lru_cache(maxsize=None)
+def get_profiling_results_renderer():
+    return gx_renderer.ProfilingResultsPageRenderer()
+
+
+@lru_cache(maxsize=None)
+def get_expectation_suite_renderer():
+    return gx_renderer.ExpectationSuitePageRenderer()
+
+
+def render_profiling_results_page(validation_result):
+    """Render a profiling validation result as a data docs HTML page."""
+    return get_page_view().render(get_profiling_results_renderer().render(validation_result))
+
+
+def render_expectation_suite_page(expectation_suite):
+    """Render an expectation suite as a data docs HTML page."""
+    return get_page_view().render(get_expectation_suite_renderer().render(expectation_suite))
@@ -0,0 +1,253 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from datetime import datetime
+from functools import partial
+from time import perf_counter
+
+import common
+import config
+import create_gx_data_profiler
+import create_gx_expectation_suite
+import create_gx_snowflake_table_loader
+import instrumentation
+import table_discovery
+import update_gx_data_docs
+
+# Set up logging
+logger = common.get_logger()
+
+# ---------------------
+# Constants
+# ---------------------
+# The pipeline's stages, in the order they run when run one at a time, with the stages each one depends on
+STAGE_DEPENDENCIES = {
+    "load_tables": [],
+    "profile": [],
+    "expectation_suites": ["load_tables"],
+    "data_docs": ["profile", "expectation_suites"],
+}
+STAGES = list(STAGE_DEPENDENCIES)
+# Stages that are independent of each other (e.g. profiling and loading the tables) can run at the same time
+DEFAULT_MAX_CONCURRENT_STAGES = 2
+# Each stage's outcome in the last run, so a failed run can be resumed from where it stopped
+PIPELINE_STATE_FILE = "gx/uncommitted/pipeline_state.json"
+# Loaded once by the fork server that the stages' worker processes are started from (see main)
+FORKSERVER_PRELOAD = ["great_expectations", "pandas", "pyarrow"]
+
+
+def get_stage_dependencies(other_params):
+    """Return each stage's dependencies for this config.
+
+    With the sample cache enabled, the expectation suites are built from the samples the profiler fetched, so that
+    stage waits for profiling rather than querying Snowflake for the same rows at the same time.
+    """
+    stage_dependencies = {stage: list(dependencies) for stage, dependencies in STAGE_DEPENDENCIES.items()}
+    if other_params.get("sample_cache"):
+        stage_dependencies["expectation_suites"].append("profile")
+    return stage_dependencies
+
+
+def get_upstream_stages(stage, stage_dependencies):
+    """Return every stage that 'stage' depends on, directly or indirectly."""
+    upstream_stages = set()
+    for dependency in stage_dependencies[stage]:
+        upstream_stages |= {dependency} | get_upstream_stages(dependency, stage_dependencies)
+    return upstream_stages
+
+
+def select_stages(stage_dependencies, stages=None, from_stage=None, completed_stages=()):
+    """Return the stages to run, in pipeline order.
+
+    'stages' limits the run to those stages, 'from_stage' to that stage and everything downstream of it, and
+    'completed_stages' (when resuming) are skipped. Dependencies outside the selection are assumed to be done.
+    """
+    selected_stages = [stage for stage in STAGES if not stages or stage in stages]
+    if from_stage:
+        selected_stages = [
+            stage
+            for stage in selected_stages
+            if stage == from_stage or from_stage in get_upstream_stages(stage, stage_dependencies)
+        ]
+    return [stage for stage in selected_stages if stage not in completed_stages]
+
+
+def load_pipeline_state(state_file=PIPELINE_STATE_FILE):
+    """Load the last run's stage outcomes, or an empty state if there isn't one."""
+    try:
+        with open(state_file) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"stages": {}}
+
+
+def save_pipeline_state(state, state_file=PIPELINE_STATE_FILE):
+    """Write the pipeline state atomically."""
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, "w") as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    os.replace(temp_file, state_file)
+
+
+def run_stage(stage, input_tables, other_params, open_data_docs=True):
+    """Run a single stage in this process. Returns the tables that failed, with their errors."""
+    if stage == "load_tables":
+        common.validate_environment_variables()
+        return create_gx_snowflake_table_loader.register_snowflake_tables(input_tables, other_params)
+    if stage == "profile":
+        return create_gx_data_profiler.profile_input_tables(input_tables, other_params)
+    if stage == "expectation_suites":
+        return create_gx_expectation_suite.create_expectation_suites(input_tables, other_params)
+    if stage == "data_docs":
+        update_gx_data_docs.update_data_docs(input_tables, open_data_docs)
+        return {}
+    raise ValueError(f"Unknown pipeline stage: {stage}. Expected one of {STAGES}.")
+
+
+def record_stage_outcome(stage, future, statuses, state):
+    """Log a finished stage's outcome, and record it in 'statuses' and the (saved) pipeline state."""
+    try:
+        failed_tables, elapsed_time = future.result()
+    except Exception as e:
+        logger.error(f"Stage '{stage}' failed: {e}")
+        statuses[stage] = "failed"
+        state["stages"][stage] = {"status": "failed", "error": str(e)}
+    else:
+        statuses[stage] = "failed" if failed_tables else "completed"
+        state["stages"][stage] = {
+            "status": statuses[stage],
+            "elapsed_seconds": round(elapsed_time, 1),
+            "failed_tables": sorted(failed_tables),
+        }
+        if failed_tables:
+            logger.error(f"Stage '{stage}' failed for {len(failed_tables)} table(s):")
+            for input_table, error in failed_tables.items():
+                logger.error(f"{input_table}: {error}")
+        else:
+            logger.info(f"Completed stage '{stage}' in {elapsed_time:.1f} seconds.")
+    state["stages"][stage]["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    save_pipeline_state(state)
+
+
+def run_stages(selected_stages, stage_dependencies, stage_runner, state, max_concurrent_stages):
+    """Run the selected stages as a DAG: each starts once the stages it depends on have completed.
+
+    Up to 'max_concurrent_stages' independent stages run at the same time, on threads sharing this process' GX
+    context, Snowflake connection pool and sample cache. Stages downstream of a failed stage are skipped. Each
+    stage's outcome is saved to the pipeline state as it finishes. Returns {stage: status}.
+    """
+    statuses = {}
+    pending_stages = list(selected_stages)
+    running_stages = {}
+
+    with ThreadPoolExecutor(max_workers=max_concurrent_stages) as executor:
+        while pending_stages or running_stages:
+            for stage in list(pending_stages):
+                dependencies = [dependency for dependency in stage_dependencies[stage] if dependency in selected_stages]
+                if any(statuses.get(dependency) in ("failed", "skipped") for dependency in dependencies):
+                    logger.error(f"Skipping stage '{stage}': a stage it depends on didn't complete.")
+                    statuses[stage] = "skipped"
+                    pending_stages.remove(stage)
+                elif all(statuses.get(dependency) == "completed" for dependency in dependencies):
+                    logger.info(f"\nStarting stage: {stage}")
+                    running_stages[executor.submit(timed_stage, stage_runner, stage)] = stage
+                    pending_stages.remove(stage)
+
+            if not running_stages:
+                continue
+
+            finished_stages, _ = wait(running_stages, return_when=FIRST_COMPLETED)
+            for future in finished_stages:
+                record_stage_outcome(running_stages.pop(future), future, statuses, state)
+
+    return statuses
+
+
+def timed_stage(stage_runner, stage):
+    """Run a stage and return (failed_tables, elapsed seconds). The time is also recorded in the run report."""
+    with instrumentation.timer(f"{stage}_stage") as timing:
+        failed_tables = stage_runner(stage)
+    return failed_tables, timing.elapsed
+
+
+def use_forkserver():
+    """Start the stages' worker processes from a fork server rather than forking this (multi-threaded) process.
+
+    Forking while another stage's thread holds a lock can deadlock the child. The fork server is single-threaded,
+    and preloads the heavy imports so workers don't each pay for them.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("forkserver", force=True)
+        multiprocessing.set_forkserver_preload(FORKSERVER_PRELOAD)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run the GX profiling pipeline (load tables, profile, expectation suites, data docs) in one process."
+    )
+    parser.add_argument("--config", default="config.yaml", help="Config file (default: config.yaml)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="Only run these stages")
+    parser.add_argument("--from-stage", choices=STAGES, help="Run this stage and the stages downstream of it")
+    parser.add_argument("--resume", action="store_true", help="Skip the stages that completed in the last run")
+    parser.add_argument(
+        "--max-concurrent-stages",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENT_STAGES,
+        help=f"Independent stages to run at the same time (default: {DEFAULT_MAX_CONCURRENT_STAGES})",
+    )
+    parser.add_argument("--no-open", action="store_true", help="Don't open the data docs when they're updated")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # every stage (and its worker processes) records to this run's report
+    run_id = instrumentation.start_run()
+    try:
+        # config.yaml is loaded (and validated) once for every stage
+        input_tables, other_params = config.load_config_from_yaml(args.config)
+        # table patterns are resolved, and the tables' sizes looked up (to schedule them), once too
+        input_tables, other_params = table_discovery.discover_tables(input_tables, other_params)
+        stage_dependencies = get_stage_dependencies(other_params)
+
+        state = load_pipeline_state() if args.resume else {"stages": {}}
+        completed_stages = [stage for stage, outcome in state["stages"].items() if outcome["status"] == "completed"]
+        selected_stages = select_stages(stage_dependencies, args.stages, args.from_stage, completed_stages)
+        if not selected_stages:
+            logger.info("No stages to run.")
+            return
+        logger.info(f"Running stage(s): {', '.join(selected_stages)}")
+
+        if args.max_concurrent_stages > 1:
+            use_forkserver()
+
+        stage_runner = partial(
+            run_stage, input_tables=input_tables, other_params=other_params, open_data_docs=not args.no_open
+        )
+        START_TIME = perf_counter()
+        statuses = run_stages(selected_stages, stage_dependencies, stage_runner, state, args.max_concurrent_stages)
+        ELAPSED_TIME = perf_counter() - START_TIME
+    except Exception as e:
+        logger.error(f"\nAn error occurred: {e}")
+        sys.exit(1)
+    finally:
+        instrumentation.finish_run(run_id)
+
+    logger.info(f"\nPipeline finished in {ELAPSED_TIME:.1f} seconds:")
+    for stage in selected_stages:
+        logger.info(f"{stage}: {statuses[stage]}")
+
+    if any(status != "completed" for status in statuses.values()):
+        logger.error("Run again with --resume to retry the stages that didn't complete.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import time
+
+import common
+import instrumentation
+import pyarrow as pa
+import sampling
+import snowflake_client
+
+# Set up logging
+logger = common.get_logger()
+
+CACHE_DIR = "gx/uncommitted/sample_cache"
+DEFAULT_TTL_SECONDS = 24 * 60 * 60  # samples older than this are fetched again
+DEFAULT_MAX_SIZE_MB = 1024  # least recently used samples are evicted beyond this
+CREATED_AT_KEY = b"sample_cache.created_at"
+
+
+class SampleCache:
+    """On-disk cache of fetched table samples, stored as uncompressed Arrow IPC files.
+
+    Entries are keyed by (table, query, sampling settings), expire after 'ttl_seconds' and are evicted least
+    recently used first once the cache grows beyond 'max_size_mb'. Reads are memory-mapped, so a cached sample is
+    loaded without copying it through Python file reads. Writes are atomic, so concurrent readers and writers
+    (threads or separate pipeline stages) never see a partly written file.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl_seconds=DEFAULT_TTL_SECONDS, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def cache_key(input_table, sql_query, sampling_spec):
+        """Return a stable key for a table sample: a hash of the table name, query and sampling settings."""
+        key_source = json.dumps([input_table, sql_query, sampling_spec], sort_keys=True, default=str)
+        return hashlib.sha256(key_source.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.arrow")
+
+    def get(self, key):
+        """Return the cached sample for a key as an Arrow table, or None if it's missing or has expired."""
+        path = self._path(key)
+        try:
+            with pa.memory_map(path) as source:
+                arrow_table = pa.ipc.open_file(source).read_all()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+
+        created_at = float((arrow_table.schema.metadata or {}).get(CREATED_AT_KEY, 0))
+        if time.time() - created_at > self.ttl_seconds:
+            logger.debug(f"Sample cache entry expired: {key}")
+            self._remove(path)
+            return None
+
+        # the modification time tracks when an entry was last used, for LRU eviction
+        os.utime(path)
+
+        return arrow_table
+
+    def put(self, key, arrow_table):
+        """Write a sample to the cache, then evict entries if the cache has grown beyond its size limit."""
+        metadata = {**(arrow_table.schema.metadata or {}), CREATED_AT_KEY: str(time.time()).encode()}
+        arrow_table = arrow_table.replace_schema_metadata(metadata)
+
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+        os.replace(temp_path, path)
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits within its size limit."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".arrow"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        cache_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if cache_size <= self.max_bytes:
+                break
+            logger.debug(f"Evicting sample cache entry: {path}")
+            self._remove(path)
+            cache_size -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_sample_cache(other_params):
+    """Return the SampleCache configured under 'other_params.sample_cache' in config.yaml, or None if not enabled."""
+    cache_settings = other_params.get("sample_cache")
+    if not cache_settings:
+        return None
+    if cache_settings is True:
+        cache_settings = {}
+
+    return SampleCache(
+        cache_dir=cache_settings.get("cache_dir", CACHE_DIR),
+        ttl_seconds=cache_settings.get("ttl_seconds", DEFAULT_TTL_SECONDS),
+        max_size_mb=cache_settings.get("max_size_mb", DEFAULT_MAX_SIZE_MB),
+    )
+
+
+def sample_cache_key(sample_cache, input_table, row_count_limit, sampling_spec, projection="*"):
+    """Return a table sample's key in the cache: its query is part of the key, so 'projection' (see
+    projection.build_projection) is too.
+    """
+    return sample_cache.cache_key(
+        input_table,
+        sampling.build_sample_query(input_table, row_count_limit, sampling_spec, projection=projection),
+        sampling_spec,
+    )
+
+
+def read_cached_sample(sample_cache, key, input_table):
+    """Return a cached sample as a DataFrame, or None if it's not in the cache."""
+    with instrumentation.timer("cache_read", input_table):
+        arrow_table = sample_cache.get(key)
+        df = None if arrow_table is None else snowflake_client.arrow_table_to_dataframe(arrow_table)
+    if df is not None:
+        logger.debug(f"Read sample of '{input_table}' from the sample cache")
+        instrumentation.record("rows", len(df), input_table)
+    return df
+
+
+def write_cached_sample(sample_cache, key, df):
+    sample_cache.put(key, pa.Table.from_pandas(df, preserve_index=False))
+
+
+def fetch_sample(
+    input_table, row_count_limit, sampling_spec=None, sample_cache=None, projection="*", total_row_count=None
+):
+    """Fetch a sample of the input table as a pandas DataFrame, reading/writing the sample cache when given one.
+
+    'projection' is the select list (see projection.build_projection). 'total_row_count' (from INFORMATION_SCHEMA,
+    see table_discovery) is only used to log the sampling rate.
+
+    This is the single place the profiler and the expectation suite builder fetch samples from, so with the cache
+    enabled both stages share one warehouse query per table. (With 'async_queries' set, the profiler fetches its
+    samples through async_sampler instead, which uses the same cache entries.)
+    """
+    sampling_spec = sampling_spec or sampling.DEFAULT_SAMPLING_SPEC
+    if sample_cache is not None:
+        key = sample_cache_key(sample_cache, input_table, row_count_limit, sampling_spec, projection)
+        df = read_cached_sample(sample_cache, key, input_table)
+        if df is not None:
+            return df
+
+    with instrumentation.timer("fetch", input_table), snowflake_client.get_connection_pool().connection() as conn:
+        df = snowflake_client.snowflake_query_dataframe(conn, input_table, row_count_limit, sampling_spec, projection)
+    sampling.report_sample(input_table, len(df), total_row_count, sampling_spec)
+    instrumentation.record("rows", len(df), input_table)
+
+    if sample_cache is not None:
+        write_cached_sample(sample_cache, key, df)
+
+    return df
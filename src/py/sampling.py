@@ -0,0 +1,168 @@
+import common
+import numpy as np
+import pandas as pd
+
+# Set up logging
+logger = common.get_logger()
+
+# limit:       the first 'row_count_limit' rows (the original behaviour - cheap, but not representative)
+# bernoulli:   each row kept with probability 'rate_percent' (Snowflake SAMPLE BERNOULLI)
+# system:      each micro-partition kept with probability 'rate_percent' (Snowflake SAMPLE SYSTEM - fastest)
+# stratified:  up to 'rows_per_stratum' random rows per distinct value of 'column'
+# time_window: only rows where 'column' falls in the last 'window_days' days
+# reservoir:   a uniform random sample of 'row_count_limit' rows, drawn while streaming the whole result
+SAMPLING_METHODS = ("limit", "bernoulli", "system", "stratified", "time_window", "reservoir")
+REQUIRED_SAMPLING_KEYS = {
+    "bernoulli": ["rate_percent"],
+    "system": ["rate_percent"],
+    "stratified": ["column"],
+    "time_window": ["column", "window_days"],
+}
+DEFAULT_SAMPLING_SPEC = {"method": "limit"}
+DEFAULT_ROWS_PER_STRATUM = 100
+# Numbers the rows within their stratum in the stratified sample query (and is left out of its result)
+STRATUM_ROW_COLUMN = "STRATUM_ROW_NUMBER"
+RESERVOIR_BATCH_SIZE = 100000
+
+
+def get_sampling_spec(input_table, other_params):
+    """Return the validated sampling settings for a table.
+
+    Settings come from 'other_params.sampling' in config.yaml: a 'default' entry applies to every table and
+    entries under 'tables' override it per table, e.g.
+
+        sampling:
+            default: {method: bernoulli, rate_percent: 10}
+            tables:
+                table_b: {method: stratified, column: REGION, rows_per_stratum: 500}
+    """
+    sampling = other_params.get("sampling") or {}
+    sampling_spec = {
+        **DEFAULT_SAMPLING_SPEC,
+        **(sampling.get("default") or {}),
+        **((sampling.get("tables") or {}).get(input_table) or {}),
+    }
+
+    method = sampling_spec["method"]
+    if method not in SAMPLING_METHODS:
+        raise ValueError(
+            f"Invalid sampling method '{method}' for table '{input_table}'. Expected one of {SAMPLING_METHODS}."
+        )
+    for key in REQUIRED_SAMPLING_KEYS.get(method, []):
+        if sampling_spec.get(key) is None:
+            raise ValueError(f"Sampling method '{method}' for table '{input_table}' requires '{key}'.")
+
+    return sampling_spec
+
+
+def build_sample_query(input_tbl, row_count_limit, sampling_spec=None, warehouse_only=False, projection="*"):
+    """Build the query that samples up to 'row_count_limit' rows of a table using the given sampling settings.
+
+    'projection' is the select list (see projection.build_projection), by default every column.
+
+    For 'reservoir' sampling the query returns every row (or up to 'scan_limit' rows) and the sample is drawn
+    while streaming the result, see reservoir_sample(). Where the sample must be drawn entirely in the warehouse
+    (e.g. for GX query assets), set 'warehouse_only' to use Snowflake's fixed-size row sampling instead.
+    """
+    sampling_spec = sampling_spec or DEFAULT_SAMPLING_SPEC
+    method = sampling_spec["method"]
+    seed_clause = f" SEED ({sampling_spec['seed']})" if sampling_spec.get("seed") is not None else ""
+
+    if method == "bernoulli":
+        return (
+            f"SELECT {projection} FROM {input_tbl} "
+            f"SAMPLE BERNOULLI ({sampling_spec['rate_percent']}){seed_clause} "
+            f"LIMIT {row_count_limit}"
+        )
+    if method == "system":
+        return (
+            f"SELECT {projection} FROM {input_tbl} "
+            f"SAMPLE SYSTEM ({sampling_spec['rate_percent']}){seed_clause} "
+            f"LIMIT {row_count_limit}"
+        )
+    if method == "stratified":
+        # rows are numbered at random within their stratum and returned in that order, so when there are more
+        # strata than 'row_count_limit' allows in full, every stratum is cut back evenly
+        rows_per_stratum = sampling_spec.get("rows_per_stratum", DEFAULT_ROWS_PER_STRATUM)
+        select_list = f"* EXCLUDE ({STRATUM_ROW_COLUMN})" if projection == "*" else projection
+        return (
+            f"SELECT {select_list} FROM (SELECT *, ROW_NUMBER() OVER "
+            f"(PARTITION BY {sampling_spec['column']} ORDER BY RANDOM()) AS {STRATUM_ROW_COLUMN} FROM {input_tbl}) "
+            f"WHERE {STRATUM_ROW_COLUMN} <= {rows_per_stratum} ORDER BY {STRATUM_ROW_COLUMN} LIMIT {row_count_limit}"
+        )
+    if method == "time_window":
+        return (
+            f"SELECT {projection} FROM {input_tbl} "
+            f"WHERE {sampling_spec['column']} >= DATEADD(day, -{sampling_spec['window_days']}, CURRENT_TIMESTAMP()) "
+            f"LIMIT {row_count_limit}"
+        )
+    if method == "reservoir":
+        if warehouse_only:
+            # Snowflake doesn't take a seed for fixed-size sampling, so this sample isn't repeatable
+            return f"SELECT {projection} FROM {input_tbl} SAMPLE ({row_count_limit} ROWS)"
+        scan_limit = sampling_spec.get("scan_limit")
+        return f"SELECT {projection} FROM {input_tbl}" + (f" LIMIT {scan_limit}" if scan_limit else "")
+
+    return f"SELECT {projection} FROM {input_tbl} LIMIT {row_count_limit}"
+
+
+def reservoir_sample(batches, sample_size, seed=None):
+    """Draw a uniform random sample of 'sample_size' rows from a stream of DataFrame batches (Algorithm R).
+
+    Only the reservoir and the current batch are held in memory. Returns the sample and the number of rows seen.
+    """
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    rows_seen = 0
+
+    for batch in batches:
+        batch = batch.reset_index(drop=True)
+
+        # fill the reservoir first
+        if reservoir is None:
+            reservoir = batch.iloc[:0]
+        fill_count = min(max(sample_size - len(reservoir), 0), len(batch))
+        if fill_count:
+            reservoir = pd.concat([reservoir, batch.iloc[:fill_count]], ignore_index=True)
+        rows_seen += fill_count
+
+        # then row 'i' (0-based, over the whole stream) replaces a random slot with probability sample_size / (i + 1)
+        remaining_rows = len(batch) - fill_count
+        if remaining_rows > 0:
+            stream_positions = np.arange(rows_seen, rows_seen + remaining_rows)
+            slots = rng.integers(0, stream_positions + 1)
+            accepted = np.flatnonzero(slots < sample_size)
+            if len(accepted):
+                # when several rows of a batch land on the same slot, the last one wins (as in the sequential form)
+                unique_slots, last_positions = np.unique(slots[accepted][::-1], return_index=True)
+                replacement_rows = accepted[::-1][last_positions] + fill_count
+                kept_slots = np.setdiff1d(np.arange(len(reservoir)), unique_slots)
+                reservoir = pd.concat([reservoir.iloc[kept_slots], batch.iloc[replacement_rows]], ignore_index=True)
+            rows_seen += remaining_rows
+
+    if reservoir is None:
+        reservoir = pd.DataFrame()
+
+    return reservoir, rows_seen
+
+
+def report_sample(input_table, sample_size, total_row_count, sampling_spec=None):
+    """Log (and return) the achieved sample size and sampling rate for a table."""
+    sampling_spec = sampling_spec or DEFAULT_SAMPLING_SPEC
+    sample_rate = sample_size / total_row_count if total_row_count else None
+    rate_str = f"{sample_rate:.4%}" if sample_rate is not None else "n/a"
+    # the total is only known for tables (not views) found in INFORMATION_SCHEMA, see table_discovery
+    total_str = f"{total_row_count} rows" if total_row_count is not None else "an unknown number of rows"
+
+    logger.info(
+        f"Sampled {sample_size} of {total_str} from '{input_table}' "
+        f"(method: {sampling_spec['method']}, rate: {rate_str})"
+    )
+
+    return {
+        "table": input_table,
+        "method": sampling_spec["method"],
+        "sample_size": sample_size,
+        "total_row_count": total_row_count,
+        "sample_rate": sample_rate,
+    }
@@ -0,0 +1,97 @@
+import common
+
+# Set up logging
+logger = common.get_logger()
+
+# Batches per worker to aim for: small tables are packed into batches of about total cost / (workers x this), so
+# the last batches to finish are short ones
+DEFAULT_BATCHES_PER_WORKER = 4
+
+
+def estimate_cost(metadata, row_count_limit=None):
+    """A table's expected processing cost, in bytes read: its size, scaled down to the sample if it's sampled.
+
+    Returns None if its size isn't known (e.g. views, or tables not found in INFORMATION_SCHEMA).
+    """
+    if not metadata or metadata.get("bytes") is None:
+        return None
+
+    table_bytes, row_count = metadata["bytes"], metadata.get("row_count")
+    if row_count_limit and row_count:
+        return table_bytes * min(1.0, row_count_limit / row_count)
+    return table_bytes
+
+
+def table_costs(input_tables, table_metadata, table_specs=None, sampled=True):
+    """Estimate each table's cost. With 'sampled' set, only its TableSpec's 'row_count_limit' rows are read."""
+    table_specs = table_specs or {}
+    return {
+        input_table: estimate_cost(
+            (table_metadata or {}).get(input_table),
+            table_specs[input_table].row_count_limit if sampled and input_table in table_specs else None,
+        )
+        for input_table in input_tables
+    }
+
+
+def get_priority(input_table, table_specs):
+    return table_specs[input_table].priority if table_specs and input_table in table_specs else 0
+
+
+def order_largest_first(input_tables, table_metadata, table_specs=None, sampled=True):
+    """Sort the tables by priority (see config.TableSpec, highest first), then by estimated cost, largest first
+    (tables of unknown size first, in their listed order).
+
+    Starting the longest tables first keeps one of them from being the last thing running in a parallel run.
+    """
+    costs = table_costs(input_tables, table_metadata, table_specs, sampled)
+    return sorted(
+        input_tables,
+        key=lambda input_table: (
+            -get_priority(input_table, table_specs),
+            costs[input_table] is not None,
+            -(costs[input_table] or 0),
+        ),
+    )
+
+
+def schedule(input_tables, table_metadata, max_workers, table_specs=None, sampled=True):
+    """Group the tables into batches for 'max_workers' workers, by priority (highest first) and largest first.
+
+    Within a priority, tables costing more than the target batch size (total cost / (workers x
+    DEFAULT_BATCHES_PER_WORKER)), or of unknown size, get a batch of their own. The rest are packed first-fit
+    decreasing into batches of up to the target, so many small tables don't each pay a task's overhead. Without
+    metadata every table is its own batch, in priority order. Returns a list of batches (lists of tables).
+    """
+    if not table_metadata:
+        return [[input_table] for input_table in order_largest_first(input_tables, None, table_specs)]
+
+    costs = table_costs(input_tables, table_metadata, table_specs, sampled)
+    known_total = sum(cost for cost in costs.values() if cost is not None)
+    target = known_total / (max(1, max_workers) * DEFAULT_BATCHES_PER_WORKER)
+
+    batches = []
+    priorities = {input_table: get_priority(input_table, table_specs) for input_table in input_tables}
+    for priority in sorted(set(priorities.values()), reverse=True):
+        tables = [input_table for input_table in input_tables if priorities[input_table] == priority]
+        large_batches, small_batches = [], []
+        for input_table in order_largest_first(tables, table_metadata, table_specs, sampled):
+            cost = costs[input_table]
+            if cost is None or cost >= target:
+                large_batches.append([input_table])
+                continue
+            for small_batch in small_batches:
+                if small_batch[1] + cost <= target:
+                    small_batch[0].append(input_table)
+                    small_batch[1] += cost
+                    break
+            else:
+                small_batches.append([[input_table], cost])
+
+        # small batches cost less than the target, so they're all scheduled after the tables that have their own
+        batches.extend(large_batches)
+        batches.extend(batch for batch, _ in sorted(small_batches, key=lambda small_batch: -small_batch[1]))
+
+    logger.debug(f"Scheduled {len(input_tables)} table(s) in {len(batches)} batch(es) for {max_workers} worker(s)")
+
+    return batches
@@ -0,0 +1,155 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+import common
+import pyarrow as pa
+
+# Set up logging
+logger = common.get_logger()
+
+# great_expectations is only imported once a shard is profiled in this process
+gx_pandas_dataset = common.lazy_import("great_expectations.dataset.pandas_dataset")
+gx_basic_dataset_profiler = common.lazy_import("great_expectations.profile.basic_dataset_profiler")
+
+# Shards per worker: with more (smaller) shards, a worker that draws cheap columns picks up more of them
+DEFAULT_SHARDS_PER_WORKER = 2
+# BasicDatasetProfiler's table-level expectations, which every shard reports for its own columns
+TABLE_EXPECTATION_TYPES = ("expect_table_row_count_to_be_between", "expect_table_columns_to_match_ordered_list")
+
+
+def split_columns(column_names, shard_count):
+    """Split the columns into up to 'shard_count' contiguous, evenly sized groups (so their order is kept)."""
+    shard_size = math.ceil(len(column_names) / max(1, min(shard_count, len(column_names))))
+    return [column_names[i : i + shard_size] for i in range(0, len(column_names), shard_size)]  # noqa: E203
+
+
+@contextmanager
+def shared_arrow_table(df):
+    """Write the DataFrame to shared memory as an Arrow IPC stream and yield the block's name.
+
+    Worker processes map the block (see profile_column_shard) instead of each being sent a pickled copy of the frame.
+    The block is freed when the context exits.
+    """
+    arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # size the stream first, so it's written straight into the shared memory block
+    mock_sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(mock_sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+
+    shared_block = shared_memory.SharedMemory(create=True, size=max(1, mock_sink.size()))
+    try:
+        block_buffer = pa.py_buffer(shared_block.buf)
+        with pa.ipc.new_stream(pa.FixedSizeBufferWriter(block_buffer), arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+        # the block can only be closed once nothing refers to its memory
+        del arrow_table, writer, block_buffer
+        yield shared_block.name
+    finally:
+        shared_block.close()
+        shared_block.unlink()
+
+
+def attach_shared_block(shared_block_name):
+    """Attach to a shared memory block owned (and freed) by another process."""
+    try:
+        # the owner unlinks the block, so it isn't tracked here as well (Python 3.13+)
+        return shared_memory.SharedMemory(name=shared_block_name, track=False)
+    except TypeError:
+        # before 3.13 it's registered again with the resource tracker shared with the owner (see create_executor)
+        return shared_memory.SharedMemory(name=shared_block_name)
+
+
+def create_executor(max_workers):
+    """Create the process pool that profile_dataframe() runs the shards on.
+
+    The resource tracker is started first, so the workers share it with this process. Otherwise a worker started
+    before it would start its own, which would unlink the blocks the worker attached to (again) when it exits.
+    """
+    resource_tracker.ensure_running()
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+
+def profile_column_shard(shared_block_name, columns):
+    """Profile a group of columns with BasicDatasetProfiler (runs inside a worker process).
+
+    Only those columns are read from the shared DataFrame. Returns the shard's (expectation_suite,
+    validation_result).
+    """
+    shared_block = attach_shared_block(shared_block_name)
+    arrow_table = df = None
+    try:
+        arrow_table = pa.ipc.open_stream(pa.py_buffer(shared_block.buf)).read_all()
+        df = arrow_table.select(columns).to_pandas(date_as_object=False)
+        profiling_results = gx_pandas_dataset.PandasDataset(df).profile(gx_basic_dataset_profiler.BasicDatasetProfiler)
+    finally:
+        # the DataFrame may point into the block, so it must be released before the block is closed
+        arrow_table = df = None
+        try:
+            shared_block.close()
+        except BufferError as e:
+            # still referenced, e.g. by the traceback of a profiling error, which mustn't be hidden by this one
+            logger.warning(f"Couldn't close shared memory block '{shared_block_name}': {e}")
+    return profiling_results
+
+
+def is_table_expectation(expectation_config):
+    return expectation_config.expectation_type in TABLE_EXPECTATION_TYPES
+
+
+def merge_profiling_results(shard_results, column_names):
+    """Merge the shards' (expectation_suite, validation_result) pairs into a single pair for the whole table.
+
+    The table-level expectations are taken from the first shard, with the full column list, followed by every
+    column's expectations in column order. The validation statistics are recomputed over the merged results.
+    """
+    expectation_suite, validation_result = shard_results[0]
+
+    for shard_suite, shard_validation_result in shard_results[1:]:
+        expectation_suite.expectations.extend(
+            expectation for expectation in shard_suite.expectations if not is_table_expectation(expectation)
+        )
+        validation_result.results.extend(
+            result for result in shard_validation_result.results if not is_table_expectation(result.expectation_config)
+        )
+        expectation_suite.meta["columns"].update(shard_suite.meta["columns"])
+
+    for result in validation_result.results:
+        if result.expectation_config.expectation_type == "expect_table_columns_to_match_ordered_list":
+            result.result["observed_value"] = list(column_names)
+
+    successful_expectations = sum(1 for result in validation_result.results if result.success)
+    evaluated_expectations = len(validation_result.results)
+    validation_result.success = successful_expectations == evaluated_expectations
+    validation_result.statistics = {
+        "evaluated_expectations": evaluated_expectations,
+        "successful_expectations": successful_expectations,
+        "unsuccessful_expectations": evaluated_expectations - successful_expectations,
+        "success_percent": 100.0 * successful_expectations / evaluated_expectations if evaluated_expectations else None,
+    }
+    validation_result.meta["expectation_suite_meta"] = expectation_suite.meta
+
+    return expectation_suite, validation_result
+
+
+def profile_dataframe(df, executor, shard_count):
+    """Profile a (wide) DataFrame's columns in up to 'shard_count' groups, concurrently on 'executor'.
+
+    The frame is written once to shared memory, which the workers read their columns from. Returns the merged
+    (expectation_suite, validation_result), the same shape as PandasDataset.profile(BasicDatasetProfiler) for the
+    whole frame.
+    """
+    column_names = list(df.columns)
+    column_shards = split_columns(column_names, shard_count)
+    logger.debug(f"Profiling {len(column_names)} columns in {len(column_shards)} shard(s)")
+
+    with shared_arrow_table(df) as shared_block_name:
+        # map() returns the shards' results in column order
+        shard_results = list(
+            executor.map(profile_column_shard, [shared_block_name] * len(column_shards), column_shards)
+        )
+
+    return merge_profiling_results(shard_results, column_names)
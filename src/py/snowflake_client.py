@@ -1,13 +1,30 @@
+import atexit
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from time import monotonic
 
+import common
+import instrumentation
 import pandas as pd
-import snowflake.connector
+import pyarrow as pa
+import sampling
 from dotenv import load_dotenv
-from great_expectations.dataset.pandas_dataset import PandasDataset
 
 # Load environment variables from .env file
 load_dotenv()
 
+# The Snowflake connector (and great_expectations, for snowflake_query) are imported on first use
+snowflake_connector = common.lazy_import("snowflake.connector")
+snowflake_errors = common.lazy_import("snowflake.connector.errors")
+gx_pandas_dataset = common.lazy_import("great_expectations.dataset.pandas_dataset")
+
+# Connection pool defaults
+DEFAULT_POOL_SIZE = 4  # max number of live Snowflake sessions
+MAX_CONNECTION_AGE = 3600  # seconds before a session is recycled (ahead of Snowflake's session expiry)
+HEALTH_CHECK_INTERVAL = 300  # seconds a session may sit idle before it's pinged on checkout
+
 
 def validate_inputs():
     """Validate the presence of required environment variables."""
@@ -33,7 +50,10 @@ def validate_inputs():
     return snowflake_env_vars
 
 
-def setup_snowflake_connection(snowflake_env_vars=validate_inputs()):
+def setup_snowflake_connection(snowflake_env_vars=None):
+    if snowflake_env_vars is None:
+        snowflake_env_vars = validate_inputs()
+
     snowflake_params = {
         "account": snowflake_env_vars["SNOWFLAKE_ACCOUNT"],
         "user": snowflake_env_vars["SNOWFLAKE_USER"],
@@ -43,7 +63,7 @@ def setup_snowflake_connection(snowflake_env_vars=validate_inputs()):
         "schema": snowflake_env_vars["SNOWFLAKE_SCHEMA"],
     }
 
-    conn = snowflake.connector.connect(
+    conn = snowflake_connector.connect(
         account=snowflake_params["account"],
         user=snowflake_params["user"],
         password=snowflake_params["password"],
@@ -55,17 +75,309 @@ def setup_snowflake_connection(snowflake_env_vars=validate_inputs()):
     return conn
 
 
-def snowflake_query(conn, input_tbl, row_count_limit):
-    sql_query = f"SELECT * FROM {input_tbl} LIMIT {row_count_limit};"
-    snowflake_cursor = conn.cursor()
-    snowflake_cursor.execute(sql_query)
-    result = snowflake_cursor.fetchall()
-    snowflake_cursor.close()
-    conn.close()
+class PooledConnection:
+    """A live Snowflake connection plus the bookkeeping the pool needs to health-check it."""
+
+    __slots__ = ("conn", "created_at", "last_used_at")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used_at = monotonic()
+
+
+class SnowflakeConnectionPool:
+    """A bounded, thread-safe pool of reusable Snowflake connections.
+
+    Connections are created lazily (up to 'pool_size'), handed out one per caller, and returned to the pool
+    afterwards rather than closed. On checkout, connections older than 'max_connection_age' are recycled and
+    connections idle for longer than 'health_check_interval' are pinged, reconnecting if the ping fails.
+    """
+
+    def __init__(
+        self,
+        pool_size=DEFAULT_POOL_SIZE,
+        max_connection_age=MAX_CONNECTION_AGE,
+        health_check_interval=HEALTH_CHECK_INTERVAL,
+        snowflake_env_vars=None,
+    ):
+        self.pool_size = pool_size
+        self.max_connection_age = max_connection_age
+        self.health_check_interval = health_check_interval
+        self._snowflake_env_vars = snowflake_env_vars
+        self._slots = threading.Semaphore(pool_size)
+        self._idle_connections = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open_connections = set()
+        self._closed = False
+
+    def grow(self, pool_size):
+        """Raise the pool's size limit to 'pool_size' (it's never lowered)."""
+        with self._lock:
+            extra_slots = pool_size - self.pool_size
+            if extra_slots <= 0:
+                return
+            self.pool_size = pool_size
+        self._slots.release(extra_slots)
+
+    def _connect(self):
+        """Open a new Snowflake session and track it."""
+        if self._snowflake_env_vars is None:
+            self._snowflake_env_vars = validate_inputs()
+
+        pooled = PooledConnection(setup_snowflake_connection(self._snowflake_env_vars))
+        with self._lock:
+            self._open_connections.add(pooled)
+        return pooled
+
+    def _discard(self, pooled):
+        """Close a connection and stop tracking it."""
+        with self._lock:
+            self._open_connections.discard(pooled)
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass  # the session is being thrown away anyway
+
+    def _is_healthy(self, pooled):
+        """Check whether a pooled connection can be handed out again."""
+        now = monotonic()
+        if pooled.conn.is_closed() or now - pooled.created_at > self.max_connection_age:
+            return False
+        if now - pooled.last_used_at > self.health_check_interval:
+            try:
+                with pooled.conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except Exception:
+                return False
+        return True
+
+    def _checkout(self):
+        """Take an idle connection from the pool (or open a new one), reconnecting if it's unhealthy."""
+        try:
+            pooled = self._idle_connections.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+        if not self._is_healthy(pooled):
+            self._discard(pooled)
+            return self._connect()
+        return pooled
+
+    def _checkin(self, pooled):
+        """Return a connection to the pool, or close it if the pool has been shut down."""
+        pooled.last_used_at = monotonic()
+        if self._closed:
+            self._discard(pooled)
+        else:
+            self._idle_connections.put(pooled)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a live connection for the duration of the 'with' block."""
+        if self._closed:
+            raise RuntimeError("Snowflake connection pool has been closed.")
+
+        with self._slots:
+            pooled = self._checkout()
+            try:
+                yield pooled.conn
+            finally:
+                self._checkin(pooled)
+
+    @contextmanager
+    def cursor(self):
+        """Borrow a cursor on a pooled connection for the duration of the 'with' block."""
+        with self.connection() as conn:
+            snowflake_cursor = conn.cursor()
+            try:
+                yield snowflake_cursor
+            finally:
+                snowflake_cursor.close()
+
+    def close_all(self):
+        """Close every connection owned by the pool and refuse further checkouts."""
+        self._closed = True
+        with self._lock:
+            open_connections = list(self._open_connections)
+        for pooled in open_connections:
+            self._discard(pooled)
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool(pool_size=None):
+    """Return the process-wide Snowflake connection pool, creating it on first use.
+
+    'pool_size' (by default DEFAULT_POOL_SIZE) sizes a new pool, and grows the existing pool if it's larger than
+    that pool's size, so a stage asking for more sessions gets them even if an earlier call created the pool.
+    """
+    global _connection_pool
+
+    with _connection_pool_lock:
+        if _connection_pool is None:
+            _connection_pool = SnowflakeConnectionPool(pool_size=pool_size or DEFAULT_POOL_SIZE)
+            atexit.register(_connection_pool.close_all)
+        elif pool_size:
+            _connection_pool.grow(pool_size)
+    return _connection_pool
+
+
+def _reset_connection_pool_after_fork():
+    """Forked worker processes must not reuse the parent's sockets, so they start with no pool."""
+    global _connection_pool, _connection_pool_lock
+
+    _connection_pool = None
+    _connection_pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_connection_pool_after_fork)
+
+
+def fetch_dataframe_from_rows(snowflake_cursor):
+    """Build a DataFrame from an executed cursor via fetchall(), i.e. one Python tuple per row.
 
+    This is the slow path, kept as a fallback for when the result set isn't delivered as Arrow.
+    """
+    result = snowflake_cursor.fetchall()
     column_names = [desc[0] for desc in snowflake_cursor.description]
-    df = pd.DataFrame(result, columns=column_names)
 
-    pandas_dataset = PandasDataset(df)
+    return pd.DataFrame(result, columns=column_names)
+
+
+def normalise_arrow_types(arrow_table):
+    """Cast Snowflake NUMBER (decimal) columns to int64/float64 so pandas doesn't fall back to object dtype.
+
+    NUMBER(p, 0) columns (including NUMBER(38, 0), Snowflake's INTEGER) become int64 when their values fit, and are
+    otherwise left as decimals, so integer IDs and keys never lose precision. Columns with a scale become floats.
+    """
+    columns = []
+    for field, column in zip(arrow_table.schema, arrow_table.columns):
+        if pa.types.is_decimal(field.type) and field.type.scale == 0:
+            try:
+                column = column.cast(pa.int64())
+            except pa.ArrowInvalid:
+                pass  # values beyond int64's range
+        elif pa.types.is_decimal(field.type):
+            column = column.cast(pa.float64(), safe=False)
+        columns.append(column)
+
+    return pa.Table.from_arrays(columns, names=arrow_table.column_names)
+
+
+def fetch_dataframe_from_arrow(snowflake_cursor):
+    """Build a DataFrame from an executed cursor's Arrow result batches, without per-row Python objects."""
+    arrow_tables = list(snowflake_cursor.fetch_arrow_batches())
+
+    if not arrow_tables:
+        # an empty result set yields no batches, so fall back to the cursor metadata for the column names
+        return pd.DataFrame(columns=[desc[0] for desc in snowflake_cursor.description])
+
+    arrow_table = pa.concat_tables(arrow_tables)
+    del arrow_tables
+
+    return arrow_table_to_dataframe(arrow_table)
+
+
+def arrow_table_to_dataframe(arrow_table):
+    """Convert an Arrow table from Snowflake into a DataFrame with numeric/datetime (not object) dtypes."""
+    instrumentation.record("bytes", arrow_table.nbytes)
+    with instrumentation.timer("dataframe_build"):
+        # date_as_object=False gives datetime64 columns, split_blocks/self_destruct keep peak memory close to 1x
+        return normalise_arrow_types(arrow_table).to_pandas(date_as_object=False, split_blocks=True, self_destruct=True)
+
+
+def fetch_dataframe(snowflake_cursor):
+    """Build a DataFrame from an executed cursor, using the Arrow path where the connector supports it."""
+    try:
+        return fetch_dataframe_from_arrow(snowflake_cursor)
+    except (snowflake_errors.NotSupportedError, snowflake_errors.ProgrammingError):
+        # e.g. the session returns JSON result sets, or Arrow isn't available on this platform
+        return fetch_dataframe_from_rows(snowflake_cursor)
+
+
+def iter_dataframe_batches(snowflake_cursor, batch_size):
+    """Yield an executed cursor's result as DataFrames of at most 'batch_size' rows, one batch in memory at a time."""
+    try:
+        for arrow_table in snowflake_cursor.fetch_arrow_batches():
+            for record_batch in arrow_table.to_batches(max_chunksize=batch_size):
+                yield arrow_table_to_dataframe(pa.Table.from_batches([record_batch]))
+    except (snowflake_errors.NotSupportedError, snowflake_errors.ProgrammingError):
+        # no Arrow result set, so page through the rows instead
+        column_names = [desc[0] for desc in snowflake_cursor.description]
+        while rows := snowflake_cursor.fetchmany(batch_size):
+            yield pd.DataFrame(rows, columns=column_names)
+
+
+def read_sample(snowflake_cursor, row_count_limit, sampling_spec):
+    """Read a sample query's result from an executed cursor into a DataFrame.
+
+    For 'reservoir' sampling, the uniform sample of 'row_count_limit' rows is drawn here, as the table streams in.
+    """
+    if sampling_spec["method"] == "reservoir":
+        df, _ = sampling.reservoir_sample(
+            iter_dataframe_batches(snowflake_cursor, sampling.RESERVOIR_BATCH_SIZE),
+            row_count_limit,
+            sampling_spec.get("seed"),
+        )
+        return df
+    return fetch_dataframe(snowflake_cursor)
+
+
+def snowflake_query_dataframe(conn, input_tbl, row_count_limit, sampling_spec=None, projection="*"):
+    """Fetch a sample of up to 'row_count_limit' rows of the input table into a pandas DataFrame.
+
+    'sampling_spec' selects how the rows are sampled (see sampling.get_sampling_spec), defaulting to LIMIT n, and
+    'projection' which columns are read (see projection.build_projection).
+    The connection is left open; it's owned by the caller (typically the connection pool).
+    """
+    sampling_spec = sampling_spec or sampling.DEFAULT_SAMPLING_SPEC
+    sql_query = sampling.build_sample_query(input_tbl, row_count_limit, sampling_spec, projection=projection)
+    snowflake_cursor = conn.cursor()
+    try:
+        snowflake_cursor.execute(sql_query)
+        df = read_sample(snowflake_cursor, row_count_limit, sampling_spec)
+    finally:
+        snowflake_cursor.close()
+
+    return df
+
+
+def submit_query(conn, sql_query):
+    """Submit a query without waiting for it to run, returning its query id (see fetch_query_results)."""
+    snowflake_cursor = conn.cursor()
+    try:
+        snowflake_cursor.execute_async(sql_query)
+        return snowflake_cursor.sfqid
+    finally:
+        snowflake_cursor.close()
+
+
+def is_query_running(conn, query_id):
+    """Whether a submitted query is still queued or running. Raises the query's error if it failed."""
+    return conn.is_still_running(conn.get_query_status_throw_if_error(query_id))
+
+
+def fetch_query_results(conn, query_id, row_count_limit, sampling_spec=None):
+    """Read the sample returned by a finished query (see submit_query) into a DataFrame, by its query id.
+
+    Query ids aren't tied to the session that submitted them, so any pooled connection can read the results.
+    """
+    sampling_spec = sampling_spec or sampling.DEFAULT_SAMPLING_SPEC
+    snowflake_cursor = conn.cursor()
+    try:
+        snowflake_cursor.get_results_from_sfqid(query_id)
+        df = read_sample(snowflake_cursor, row_count_limit, sampling_spec)
+    finally:
+        snowflake_cursor.close()
+
+    return df
+
+
+def snowflake_query(conn, input_tbl, row_count_limit, sampling_spec=None, projection="*"):
+    pandas_dataset = gx_pandas_dataset.PandasDataset(
+        snowflake_query_dataframe(conn, input_tbl, row_count_limit, sampling_spec, projection)
+    )
 
     return pandas_dataset
@@ -0,0 +1,83 @@
+import common
+import instrumentation
+import sampling
+import snowflake_client
+from column_sketches import ColumnAccumulator
+
+# Set up logging
+logger = common.get_logger()
+
+# profile_results builds GX objects, so great_expectations is only imported once a table has been profiled
+profile_results = common.lazy_import("profile_results")
+
+PROFILER_NAME = "StreamingProfiler"
+DEFAULT_BATCH_SIZE = 100000  # rows held in memory at once
+
+
+def profile_batches(batches, exclude_columns=()):
+    """Fold a stream of DataFrame batches into per-column accumulators, skipping the excluded columns.
+
+    Only the current batch and the fixed-size accumulators are held in memory, so memory use doesn't grow with the
+    number of rows profiled. Returns the total row count and the accumulators, in column order.
+    """
+    row_count = 0
+    accumulators = {}
+    excluded = {column.upper() for column in exclude_columns}
+
+    for batch in batches:
+        row_count += len(batch)
+        for column in batch.columns:
+            if str(column).upper() in excluded:
+                continue
+            if column not in accumulators:
+                accumulators[column] = ColumnAccumulator(column)
+            accumulators[column].update(batch[column])
+        logger.debug(f"Profiled {row_count} rows")
+
+    return row_count, list(accumulators.values())
+
+
+def profile_query(conn, sql_query, batch_size=DEFAULT_BATCH_SIZE, exclude_columns=()):
+    """Stream a query's result in batches and return its (expectation_suite, validation_result) profile.
+
+    'exclude_columns' aren't profiled.
+    """
+    snowflake_cursor = conn.cursor()
+    try:
+        snowflake_cursor.execute(sql_query)
+        batches = snowflake_client.iter_dataframe_batches(snowflake_cursor, batch_size)
+        row_count, accumulators = profile_batches(batches, exclude_columns)
+    finally:
+        snowflake_cursor.close()
+    instrumentation.record("rows", row_count)
+
+    column_profiles = [accumulator.to_column_profile(profile_results.QUANTILES) for accumulator in accumulators]
+
+    return profile_results.build_profiling_results(column_profiles, row_count, PROFILER_NAME)
+
+
+def profile_table(
+    conn,
+    input_tbl,
+    row_count_limit,
+    batch_size=DEFAULT_BATCH_SIZE,
+    sampling_spec=None,
+    exclude_columns=(),
+    projection="*",
+):
+    """Stream a sample of up to 'row_count_limit' rows of the input table through the profiler.
+
+    'projection' is the select list (see projection.build_projection). 'exclude_columns' aren't profiled.
+    A 'reservoir' sample is drawn in the warehouse (Snowflake's fixed-size row sampling), so it can be streamed
+    batch by batch too, rather than held in memory as a whole while it's drawn.
+    """
+    sampling_spec = sampling_spec or sampling.DEFAULT_SAMPLING_SPEC
+    sql_query = sampling.build_sample_query(
+        input_tbl,
+        row_count_limit,
+        sampling_spec,
+        warehouse_only=sampling_spec["method"] == "reservoir",
+        projection=projection,
+    )
+
+    return profile_query(conn, sql_query, batch_size, exclude_columns)
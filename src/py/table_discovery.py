@@ -0,0 +1,161 @@
+import fnmatch
+import re
+
+import common
+import snowflake_client
+import table_state
+
+# Set up logging
+logger = common.get_logger()
+
+# An 'input_tables' entry containing any of these is a glob pattern, e.g. 'SALES.FACT_*' or 'DB.*.DIM_?'
+GLOB_CHARACTERS = set("*?[")
+# Unquoted Snowflake identifiers (as stored, i.e. upper case): anything else is quoted in a resolved table name
+UNQUOTED_IDENTIFIER = re.compile(r"[A-Z_][A-Z0-9_$]*")
+TABLE_TYPES = ("BASE TABLE", "VIEW")
+# Snowflake's LIKE has no escape character by default, so '_' in a name would match any character
+LIKE_ESCAPE = "ESCAPE '\\\\'"
+
+
+def is_pattern(input_table):
+    return bool(GLOB_CHARACTERS & set(input_table))
+
+
+def glob_to_like(pattern):
+    """Translate a glob pattern to a LIKE pattern matching (at least) the same names.
+
+    '[...]' character classes become '_' (any character): the exact match is checked with fnmatch afterwards.
+    """
+    like_pattern = re.sub(r"([%_\\])", r"\\\1", pattern)
+    like_pattern = re.sub(r"\[[^\]]*\]", "_", like_pattern)
+    return like_pattern.replace("*", "%").replace("?", "_")
+
+
+def quote_identifier(name):
+    return name if UNQUOTED_IDENTIFIER.fullmatch(name) else '"' + name.replace('"', '""') + '"'
+
+
+def build_metadata_query(entries):
+    """Build one query over INFORMATION_SCHEMA.TABLES for every entry (database, schema, table): UNION ALL-ed per
+    database, with schema and table names filtered by LIKE. Returns (sql_query, params).
+    """
+    conditions_by_database, params_by_database = {}, {}
+    for database, schema, table in entries:
+        conditions, params = conditions_by_database.setdefault(database, []), params_by_database.setdefault(
+            database, []
+        )
+        schema_condition = f"TABLE_SCHEMA LIKE %s {LIKE_ESCAPE}" if schema else "TABLE_SCHEMA = CURRENT_SCHEMA()"
+        conditions.append(f"({schema_condition} AND TABLE_NAME LIKE %s {LIKE_ESCAPE})")
+        params.extend(([glob_to_like(schema)] if schema else []) + [glob_to_like(table)])
+
+    table_types = ", ".join(f"'{table_type}'" for table_type in TABLE_TYPES)
+    queries, params = [], []
+    for database, conditions in conditions_by_database.items():
+        information_schema = f'"{database}".INFORMATION_SCHEMA.TABLES' if database else "INFORMATION_SCHEMA.TABLES"
+        queries.append(
+            "SELECT TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME, ROW_COUNT, BYTES, CURRENT_DATABASE(), CURRENT_SCHEMA() "
+            f"FROM {information_schema} WHERE TABLE_TYPE IN ({table_types}) AND ({' OR '.join(conditions)})"
+        )
+        params.extend(params_by_database[database])
+
+    return " UNION ALL ".join(queries), params
+
+
+def fetch_table_metadata(conn, entries):
+    """Run the metadata query for the entries. Returns a list of dicts, one per matching table or view."""
+    sql_query, params = build_metadata_query(entries)
+    logger.debug(sql_query)
+
+    snowflake_cursor = conn.cursor()
+    try:
+        snowflake_cursor.execute(sql_query, params)
+        rows = snowflake_cursor.fetchall()
+    finally:
+        snowflake_cursor.close()
+
+    return [
+        {
+            "database": database,
+            "schema": schema,
+            "table": table,
+            "row_count": row_count,
+            "bytes": table_bytes,
+            "current_database": current_database,
+            "current_schema": current_schema,
+        }
+        for database, schema, table, row_count, table_bytes, current_database, current_schema in rows
+    ]
+
+
+def matches(entry, row):
+    """Whether a metadata row is matched by an (exact or glob) entry (database, schema, table)."""
+    database, schema, table = entry
+    return (
+        (row["database"] == database if database else row["database"] == row["current_database"])
+        and (fnmatch.fnmatchcase(row["schema"], schema) if schema else row["schema"] == row["current_schema"])
+        and fnmatch.fnmatchcase(row["table"], table)
+    )
+
+
+def resolved_name(entry, row):
+    """A matched table's name, qualified to the same level as the pattern that matched it."""
+    parts = [row["database"], row["schema"], row["table"]][3 - sum(part is not None for part in entry) :]  # noqa: E203
+    return ".".join(quote_identifier(part) for part in parts)
+
+
+def resolve_input_tables(input_tables, metadata_rows):
+    """Expand the glob patterns in 'input_tables' against the metadata rows, keeping the listed order.
+
+    Listed table names are kept as they're written. Returns the resolved tables and {table: {"row_count", "bytes"}}
+    (views, and listed tables that weren't found, have no metadata).
+    """
+    resolved_tables, table_metadata = [], {}
+    for input_table in input_tables:
+        entry = table_state.split_table_name(input_table)
+        matched_rows = [row for row in metadata_rows if matches(entry, row)]
+
+        if not is_pattern(input_table):
+            resolved_tables.append(input_table)
+            if matched_rows:
+                table_metadata[input_table] = {key: matched_rows[0][key] for key in ("row_count", "bytes")}
+            continue
+
+        if not matched_rows:
+            logger.warning(f"No tables match the pattern '{input_table}'")
+        for row in sorted(matched_rows, key=lambda row: (row["database"], row["schema"], row["table"])):
+            table = resolved_name(entry, row)
+            if table not in table_metadata and table not in resolved_tables:
+                resolved_tables.append(table)
+                table_metadata[table] = {key: row[key] for key in ("row_count", "bytes")}
+
+    return resolved_tables, table_metadata
+
+
+def discover_tables(input_tables, other_params, fetch_metadata=True):
+    """Resolve the glob patterns in 'input_tables' and look up every table's row count and size, in one query.
+
+    Returns the resolved tables, and other_params with their metadata added as 'table_metadata' (used to schedule
+    the largest tables first, see scheduling). Listed tables are only looked up with 'fetch_metadata' set, and if
+    the lookup fails they're processed without metadata.
+    """
+    patterns = [input_table for input_table in input_tables if is_pattern(input_table)]
+    if not patterns and not fetch_metadata:
+        return input_tables, other_params
+
+    entries = list(dict.fromkeys(table_state.split_table_name(input_table) for input_table in input_tables))
+    try:
+        with snowflake_client.get_connection_pool().connection() as conn:
+            metadata_rows = fetch_table_metadata(conn, entries)
+    except Exception as e:
+        if patterns:
+            raise
+        logger.warning(f"Couldn't look up the input tables' sizes, they'll be processed in the listed order: {e}")
+        return input_tables, other_params
+
+    resolved_tables, table_metadata = resolve_input_tables(input_tables, metadata_rows)
+    if not resolved_tables:
+        raise ValueError(f"No tables match the 'input_tables' patterns: {', '.join(patterns)}")
+    if patterns:
+        logger.info(f"Resolved {len(input_tables)} 'input_tables' entries to {len(resolved_tables)} table(s)")
+
+    return resolved_tables, {**other_params, "table_metadata": table_metadata}
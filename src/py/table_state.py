@@ -0,0 +1,116 @@
+import json
+import os
+
+import common
+import snowflake_client
+
+# Set up logging
+logger = common.get_logger()
+
+# Per-table fingerprints recorded by each stage's last successful run
+STATE_FILE = "gx/uncommitted/table_state.json"
+
+
+def split_table_name(input_tbl):
+    """Split a (possibly qualified) table name into normalised (database, schema, table) parts.
+
+    Missing parts are returned as None. Unquoted identifiers are upper-cased, as Snowflake stores them.
+    """
+    parts = [part.strip() for part in input_tbl.split(".")]
+    parts = [part[1:-1] if part.startswith('"') and part.endswith('"') else part.upper() for part in parts]
+
+    return tuple([None] * (3 - len(parts)) + parts)
+
+
+def fetch_table_fingerprint(conn, input_tbl):
+    """Return a table's change fingerprint (last-altered time, row count and size) from Snowflake's metadata.
+
+    This is a metadata lookup, so no warehouse compute is used. Returns None for views and tables that can't be
+    found, which are then always treated as changed.
+    """
+    database, schema, table = split_table_name(input_tbl)
+    information_schema = f'"{database}".INFORMATION_SCHEMA.TABLES' if database else "INFORMATION_SCHEMA.TABLES"
+    schema_filter = "TABLE_SCHEMA = %s" if schema else "TABLE_SCHEMA = CURRENT_SCHEMA()"
+    params = [schema, table] if schema else [table]
+
+    snowflake_cursor = conn.cursor()
+    try:
+        snowflake_cursor.execute(
+            f"SELECT TO_VARCHAR(LAST_ALTERED), ROW_COUNT, BYTES FROM {information_schema} "
+            f"WHERE {schema_filter} AND TABLE_NAME = %s AND TABLE_TYPE = 'BASE TABLE'",
+            params,
+        )
+        row = snowflake_cursor.fetchone()
+    finally:
+        snowflake_cursor.close()
+
+    if row is None:
+        logger.debug(f"No change metadata found for '{input_tbl}', it will always be processed")
+        return None
+
+    last_altered, row_count, table_bytes = row
+    return {"last_altered": last_altered, "row_count": row_count, "bytes": table_bytes}
+
+
+def fetch_table_fingerprints(input_tables, settings_by_table):
+    """Return {input_table: fingerprint} for the input tables, each combined with that table's stage settings."""
+    with snowflake_client.get_connection_pool().connection() as conn:
+        return {
+            input_table: with_settings(fetch_table_fingerprint(conn, input_table), settings_by_table[input_table])
+            for input_table in input_tables
+        }
+
+
+def load_table_state(state_file=STATE_FILE):
+    """Load the recorded table state, or an empty state if there's no (readable) state file."""
+    try:
+        with open(state_file) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable state file '{state_file}': {e}")
+        return {}
+
+
+def save_table_state(state, state_file=STATE_FILE):
+    """Write the table state atomically, so an interrupted run can't leave a truncated file behind."""
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, "w") as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    os.replace(temp_file, state_file)
+
+
+def get_unchanged_entry(state, stage, input_table, fingerprint):
+    """Return the recorded entry for a table if its fingerprint (and stage settings) match the last run, else None.
+
+    Entries with outputs are only reusable while all of those output files still exist.
+    """
+    if fingerprint is None:
+        return None
+
+    entry = state.get(stage, {}).get(input_table)
+    if entry is None or entry["fingerprint"] != fingerprint:
+        return None
+    if not all(os.path.exists(output) for output in entry.get("outputs", [])):
+        return None
+
+    return entry
+
+
+def record_table_state(state, stage, input_table, fingerprint, **details):
+    """Record a table's fingerprint (and any details, e.g. its outputs) after a stage processed it successfully."""
+    if fingerprint is None:
+        state.get(stage, {}).pop(input_table, None)
+        return
+
+    state.setdefault(stage, {})[input_table] = {"fingerprint": fingerprint, **details}
+
+
+def with_settings(fingerprint, settings):
+    """Combine a table's fingerprint with the stage settings, so changing e.g. the sample size forces a re-run."""
+    if fingerprint is None:
+        return None
+
+    return {**fingerprint, "settings": json.loads(json.dumps(settings, sort_keys=True, default=str))}
@@ -1,21 +1,20 @@
 import os
-import re
-import shutil
 import sys
 from datetime import datetime
 
 import common
-import great_expectations as gx
-from bs4 import BeautifulSoup
-from jinja2 import Environment
-from jinja2 import FileSystemLoader
+import config
+import instrumentation
+import profiling_index
+import rendering
+import table_discovery
 
 # Set up logging
 logger = common.get_logger()
 # logger = common.get_logger(log_level=logging.DEBUG)
 
-# Create a GX context
-context = gx.get_context()
+# Create a GX context (on first use: only opening the data docs needs it)
+context = common.LazyObject(common.get_gx_context)
 
 # ---------------------
 # Constants
@@ -25,233 +24,147 @@ context = gx.get_context()
 SCRIPT_DIR = os.path.dirname(__file__)
 PROJECT_DIR = os.path.dirname(os.path.dirname(SCRIPT_DIR))
 TEMPLATES_DIR = os.path.join(PROJECT_DIR, "src", "templates", "jinja_templates")
-PYTHON_SCRIPTS_DIR = os.path.join(PROJECT_DIR, "src", "py")
 # ---------------------
 # Other
 # ---------------------
 GX_DATA_DOCS_DIR = "gx/uncommitted/data_docs/local_site/"
 GX_DATA_DOCS_HTML_FILE = os.path.join(GX_DATA_DOCS_DIR, "index.html")
-HTML_JINJA_TEMPLATE = os.path.join(TEMPLATES_DIR, "index.html.j2")
+GX_DATA_DOCS_BACKUP_FILE = os.path.join(GX_DATA_DOCS_DIR, "bkp_index.html")
+PROFILING_RESULTS_TAB_TEMPLATE = "profiling_results_tab.html.j2"
 CURRENT_DATE_STR = datetime.now().strftime("%Y%m%d")
-
-
-def create_backup(file_path):
-    backup_path = os.path.join(GX_DATA_DOCS_DIR, "bkp_index.html")
-    try:
-        shutil.copyfile(file_path, backup_path)
-        logger.debug(f"Backup created: {backup_path}")
-    except Exception as e:
-        logger.error(f"Error creating backup: {e}")
-
-
-def modify_html_file(file_path):
-    """Modifies the specified HTML file content, replacing the specified text."""
-
-    # Read the content of the HTML file
-    with open(file_path) as file:
-        content = file.read()
-
-    # Define the pattern to be found using a regular expression
-    old_text_pattern = r'<li class="nav-item">\s*<a\s*aria-controls="Expectation-Suites"\s*aria-selected="false"\s*class="nav-link"\s*data-toggle="tab"\s*href="#Expectation-Suites"\s*id="Expectation-Suites-tab"\s*role="tab">\s*Expectation Suites\s*</a>\s*</li>'  # noqa
-
-    # Specify the text to be replaced and its replacement
-    # old_text = (
-    #     '<li class="nav-item">\n'
-    #     '    <a class="nav-link" id="Expectation-Suites-tab" data-toggle="tab" href="#Expectation-Suites"\n'
-    #     '      role="tab" aria-selected="false" aria-controls="Expectation-Suites">\n'
-    #     "      Expectation Suites\n"
-    #     "    </a>\n"
-    #     "  </li>"
-    # )
-
-    # Define the replacement text
-    new_text = (
-        '<li class="nav-item">\n'
-        '    <a class="nav-link" id="Expectation-Suites-tab" data-toggle="tab" href="#Expectation-Suites"\n'
-        '      role="tab" aria-selected="false" aria-controls="Expectation-Suites">\n'
-        "      Expectation Suites\n"
-        "    </a>\n"
-        "</li>"
-        "\n"
-        '<li class="nav-item">\n'
-        '    <a class="nav-link" id="Profiling-Results-tab" data-toggle="tab" href="#Profiling-Results"\n'
-        '      role="tab" aria-selected="false" aria-controls="Profiling-Results">\n'
-        "      Profiling Results\n"
-        "    </a>\n"
-        "  </li>\n"
-    )
-
-    # Use re.search to check if the pattern exists in the content
-    if re.search(old_text_pattern, content, re.DOTALL):
-        # Use re.sub to replace the old text with the new text in the content
-        modified_content = re.sub(old_text_pattern, new_text, content)
-
-        # Write the modified content back to the file
-        with open(file_path, "w") as file:
-            file.write(modified_content)
-        logger.debug(f"Text substitution successful in {file_path}")
-    else:
-        logger.error(f"No substitution made in {file_path}")
-        sys.exit(1)
-
-
-def add_data_profiling_content():
-    try:
-        input_tables, other_params = common.load_config_from_yaml()
-        logger.debug(f"input tables = {input_tables}")
-
-        jinja_template = setup_jinja_template("index.html.j2")
-        template_path = os.path.join(TEMPLATES_DIR, "index.html.j2")
-
-        # Validate the Jinja template
-        if not os.path.exists(template_path):
-            logger.error(f"Error: Jinja template '{jinja_template}' not found.")
-            sys.exit(1)
-
-        with open(GX_DATA_DOCS_HTML_FILE, "w") as op_file:
-            op_file.write(jinja_template.render(input_tables=input_tables, current_data_str=CURRENT_DATE_STR))
-
-    except Exception as e:
-        logger.error(f"\nAn error occurred: {e}")
-        sys.exit(1)
+# ---------------------
+# Anchors in GX's generated index.html
+# ---------------------
+# the 'Expectation Suites' tab link: the 'Profiling Results' tab link goes after its closing </li>
+NAV_TAB_ANCHOR = 'id="Expectation-Suites-tab"'
+# the click handler at the end of the 'Expectation Suites' tab pane: the 'Profiling Results' tab pane goes after
+# the </script> that ends it and the </div> that closes the pane
+TAB_PANE_ANCHOR = "$(\"#section-1-content-block-2-2-body-table\").on('click-row.bs.table'"
+# present once the index has been patched
+PATCHED_MARKER = 'id="Profiling-Results-tab"'
+
+PROFILING_RESULTS_NAV_ITEM = (
+    "\n"
+    '<li class="nav-item">\n'
+    '    <a class="nav-link" id="Profiling-Results-tab" data-toggle="tab" href="#Profiling-Results"\n'
+    '      role="tab" aria-selected="false" aria-controls="Profiling-Results">\n'
+    "      Profiling Results\n"
+    "    </a>\n"
+    "  </li>\n"
+)
 
 
 def setup_jinja_template(ip_jinja_template_file):
-    """Set up/get the Jinja template"""
-    jinja_env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=True)
-    return jinja_env.get_template(ip_jinja_template_file)
-
+    """Set up/get the Jinja template (compiled once, then served from the shared environment's caches)"""
+    return rendering.get_jinja_environment(TEMPLATES_DIR).get_template(ip_jinja_template_file)
 
-def read_target_html_from_file(file_path):
-    try:
-        with open(file_path, encoding="utf-8") as file:
-            return file.read()
-    except Exception as e:
-        logger.debug(f"ERROR: An error occurred while reading the input file: {e}")
-        sys.exit(1)
 
+def render_profiling_results_tab():
+    """Render the 'Profiling Results' tab pane, which lists the tables in the profiling manifest.
 
-def prettify_html(input_file):
-    try:
-        with open(input_file, encoding="utf-8") as file:
-            html_content = file.read()
-
-        # Parse HTML content using BeautifulSoup
-        soup = BeautifulSoup(html_content, "html.parser")
+    The tab's size doesn't depend on the number of tables: the manifest is loaded, and rendered a page at a time,
+    in the browser.
+    """
+    jinja_template = setup_jinja_template(PROFILING_RESULTS_TAB_TEMPLATE)
+    return jinja_template.render(
+        manifest_file=profiling_index.PROFILING_MANIFEST_FILE, manifest_version=datetime.now().strftime("%Y%m%d%H%M%S")
+    )
 
-        # Prettify the HTML content for formatting
-        prettified_html = soup.prettify()
 
-        # Save the prettified HTML content to a new file
-        with open(input_file, "w", encoding="utf-8") as file:
-            file.write(prettified_html)
+def find_end_of(content, anchor, closing_tags):
+    """Return the position just after the given closing tags, found in order after 'anchor' (-1 if not found)."""
+    position = content.find(anchor)
+    for closing_tag in closing_tags:
+        if position == -1:
+            return -1
+        position = content.find(closing_tag, position)
+        if position != -1:
+            position += len(closing_tag)
+    return position
+
+
+def patch_index_html(content, profiling_results_tab_html):
+    """Insert the 'Profiling Results' tab link and tab pane into GX's index.html content.
+
+    The insertion points are found with plain substring searches on the unmodified file, so this is a single
+    linear scan with no HTML parsing or regular expressions.
+    """
+    nav_position = find_end_of(content, NAV_TAB_ANCHOR, ["</li>"])
+    if nav_position == -1:
+        raise ValueError("'Expectation Suites' tab link not found in the data docs index.")
+
+    tab_pane_position = find_end_of(content, TAB_PANE_ANCHOR, ["</script>", "</div>"])
+    if tab_pane_position == -1:
+        raise ValueError("End of the 'Expectation Suites' tab pane not found in the data docs index.")
+
+    return "".join(
+        [
+            content[:nav_position],
+            PROFILING_RESULTS_NAV_ITEM,
+            content[nav_position:tab_pane_position],
+            "\n",
+            profiling_results_tab_html,
+            content[tab_pane_position:],
+        ]
+    )
 
-        return prettified_html
 
-    except Exception as e:
-        logger.debug(f"ERROR: An error occurred while processing the input HTML: {e}")
-        sys.exit(1)
+def add_data_profiling_content(index_file, input_tables):
+    """Write the profiling manifest, then patch the data docs index in one read and one write (keeping a backup).
 
+    Returns False (leaving the index untouched) if it has already been patched: it then picks up the new manifest.
+    """
+    profiling_index.write_profiling_manifest(input_tables, os.path.dirname(index_file))
 
-def find_and_replace_html_code():
-    try:
-        # Prettify the HTML content and get the prettified HTML
-        prettified_html = prettify_html(GX_DATA_DOCS_HTML_FILE)
-
-        # -------------------------------------
-        # String pattern declarations
-        # -------------------------------------
-        # HTML code pattern to find
-        html_pattern = r"</script>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*<footer>\s*<p>\s*Stay current on everything GX with our newsletter"  # noqa
-
-        # JavaScript code pattern to find
-        js_pattern = r'\$\(document\)\.ready\(function\(\)\s*\{\s*\$\("#section-1-content-block-2-2-body-table"\)\.on\(\'click-row\.bs\.table\',\s*function\(e,\s*row,\s*\$element\)\s*\{\s*window\.location\s*=\s*\$element\.data\("href"\);\s*\}\)\s*}\s*\);\s*'  # noqa
-
-        # Combined JavaScript/HTML code pattern
-        combined_html_pattern = js_pattern + html_pattern
-
-        # -------------------------------------
-        # Pattern matching/check functions
-        # -------------------------------------
-        # Search for subsequent HTML content
-        html_check_match = re.search(html_pattern, prettified_html, re.DOTALL)
-        # Search for the specific JavaScript content
-        js_match = re.search(js_pattern, prettified_html, re.DOTALL)
-        # search for the above 2 variables combined
-        combined_html_pattern_match = re.search(combined_html_pattern, prettified_html, re.DOTALL)
-
-        # ----------------------------------------
-        # Error handling for pattern matching
-        # ----------------------------------------
-        if html_check_match:
-            logger.debug("SUCCESS: Subsequent HTML elements found in the file.")
-        else:
-            logger.error("ERROR: Subsequent HTML elements not found in the file.")
-            sys.exit(1)
+    with open(index_file, encoding="utf-8") as file:
+        content = file.read()
 
-        if js_match:
-            specific_js_code = js_match.group()
-            logger.debug("SUCCESS: Specific JavaScript code found in the HTML file.")
-            logger.debug(specific_js_code)
-        else:
-            logger.error("ERROR: Specific JavaScript content not found in the HTML file.")
-            sys.exit(1)
+    if PATCHED_MARKER in content:
+        logger.info(f"'{index_file}' already has a 'Profiling Results' tab, skipping.")
+        return False
 
-        # Check if combined pattern is true
-        if combined_html_pattern_match:
-            logger.debug("SUCCESS: Combined JavaScript and HTML patterns found in the file.")
+    updated_content = patch_index_html(content, render_profiling_results_tab())
 
-            # Read in the replacement HTML content (to replace the pattern) from a text file
-            target_html = read_target_html_from_file(os.path.join(PYTHON_SCRIPTS_DIR, "txt/target_html.txt"))
+    # write the new file alongside, then swap it in: the original becomes the backup without being copied
+    temp_file = f"{index_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        file.write(updated_content)
+    os.replace(index_file, GX_DATA_DOCS_BACKUP_FILE)
+    os.replace(temp_file, index_file)
+    logger.debug(f"Backup created: {GX_DATA_DOCS_BACKUP_FILE}")
 
-            # Perform find and replace operation
-            updated_html_file = re.sub(combined_html_pattern, target_html, prettified_html, flags=re.DOTALL)
+    return True
 
-            # we want to write 2 versions of the newly updated file out:
-            # index.html & index.html.j2 - as we need this for jinja-rendering in the function 'add_data_profiling_content()'
-            html_op_files = [GX_DATA_DOCS_HTML_FILE, HTML_JINJA_TEMPLATE]
 
-            for html_file in html_op_files:
-                try:
-                    # Save the modified HTML content to the input file
-                    with open(html_file, "w") as file:
-                        file.write(updated_html_file)
+def update_data_docs(input_tables, open_data_docs=True):
+    """Add the 'Profiling Results' tab to the data docs index, then (optionally) open the data docs.
 
-                    # Parse the updated HTML content using BeautifulSoup for final consistent formatting
-                    prettify_html(html_file)
-                except Exception as e:
-                    logger.error(f"Error occurred while writing {html_file}: {e}")
-                    sys.exit(1)
+    This is the data docs stage of both this script and the pipeline runner (run_pipeline.py).
+    """
+    # Check if the index.html file exists
+    if not os.path.exists(GX_DATA_DOCS_HTML_FILE):
+        raise FileNotFoundError(f"File '{GX_DATA_DOCS_HTML_FILE}' not found.")
 
-            # Output success message
-            logger.debug("SUCCESS: HTML processing and pattern replacement completed.")
-        else:
-            logger.error("ERROR: Combined JavaScript and HTML patterns not found in the file.")
-            sys.exit(1)
+    # Add the data profiling tab and its links to the index page
+    with instrumentation.timer("docs_patch"):
+        add_data_profiling_content(GX_DATA_DOCS_HTML_FILE, input_tables)
 
-    except Exception as e:
-        logger.error(f"ERROR: An error occurred during HTML processing and pattern replacement: {e}")
-        sys.exit(1)
+    if open_data_docs:
+        # Open the Great Expectations data documentation
+        context.open_data_docs()
 
 
 def main():
     try:
         # Check if the index.html file exists
         if os.path.exists(GX_DATA_DOCS_HTML_FILE):
-            # Step 1: Create a backup of the original index.html file
-            create_backup(GX_DATA_DOCS_HTML_FILE)
-
-            # Step 2: Find and replace specific HTML and JavaScript patterns
-            find_and_replace_html_code()
-
-            # Step 3: Add data profiling content using Jinja templates
-            add_data_profiling_content()
-
-            # Step 4: Modify the HTML file content
-            modify_html_file(GX_DATA_DOCS_HTML_FILE)
+            input_tables, other_params = config.load_config_from_yaml()
+            input_tables, other_params = table_discovery.discover_tables(
+                input_tables, other_params, fetch_metadata=False
+            )
+            logger.debug(f"input tables = {input_tables}")
 
-            # Step 5: Open the Great Expectations data documentation
-            context.open_data_docs()
+            update_data_docs(input_tables)
         else:
             # Log an error if the file doesn't exist
             logger.error(f"Error: File '{GX_DATA_DOCS_HTML_FILE}' not found.")
@@ -0,0 +1,29 @@
+from datetime import datetime
+from datetime import timezone
+
+from great_expectations.checkpoint.actions import ValidationAction
+
+# Format of the 'validation_time' GX records in a validation result's meta when the validation starts
+VALIDATION_TIME_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+
+
+class ValidationTimingAction(ValidationAction):
+    """Checkpoint action returning how long a validation took, as {"elapsed_seconds": ...}.
+
+    Actions run once the validation has finished (on the same thread, when a checkpoint runs its validations
+    concurrently), so the time since the validation's start time recorded by GX is its elapsed time.
+    """
+
+    def _run(
+        self,
+        validation_result_suite,
+        validation_result_suite_identifier,
+        data_asset,
+        expectation_suite_identifier=None,
+        checkpoint_identifier=None,
+        **kwargs,
+    ):
+        validation_time = datetime.strptime(validation_result_suite.meta["validation_time"], VALIDATION_TIME_FORMAT)
+        elapsed_time = datetime.now(timezone.utc) - validation_time.replace(tzinfo=timezone.utc)
+
+        return {"elapsed_seconds": round(elapsed_time.total_seconds(), 3)}
@@ -4,6 +4,7 @@ import warnings
 from datetime import datetime
 
 import common
+import config
 import great_expectations as gx
 from dotenv import load_dotenv
 
@@ -50,7 +51,9 @@ def save_expectation_suite(data_assistant_result, expectation_suite_name):
 def run_onboarding_data_assistant(batch_request, exclude_column_names=[]):
     """Run onboarding data assistant with the provided batch request and exclude column names."""
     try:
-        data_assistant_result = context.assistants.onboarding.run(batch_request=batch_request)
+        data_assistant_result = context.assistants.onboarding.run(
+            batch_request=batch_request, exclude_column_names=exclude_column_names
+        )
         logger.debug("Data assistant run successful.")
         return data_assistant_result
     except Exception as e:
@@ -88,21 +91,15 @@ def prepare_batch_request(input_table, gx_data_src_name, row_count_limit):
 def main():
     """Main function to execute the script."""
     try:
-        input_tables, other_params = common.load_config_from_yaml()
+        input_tables, other_params = config.load_config_from_yaml()
         gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
         logger.debug(
             f"input tables = {input_tables}\ngx_data_src_name = {gx_data_src_name}\nrow_count_limit = {row_count_limit}"
         )
 
-        exclude_cols = [
-            "DWH_CREATED_DT",
-            "DWH_UPDATED_DT",
-            "DBT_LAST_MODIFIED",
-            "DW_MODIFIED_TIMESTAMP",
-            "DW_MODIFIED_TIMESTAMP_TZ",
-        ]
-
         for input_table in input_tables:
+            # columns to skip (e.g. audit columns) are set in config.yaml, see config.get_table_spec
+            exclude_cols = config.get_table_spec(input_table, other_params).exclude_column_names()
             logger.info(f"\nCreating (test) expectation suite for table: {input_table}")
             batch_request = prepare_batch_request(input_table, gx_data_src_name, row_count_limit)
             expectation_suite_name = prepare_expectation_suite(input_table)
@@ -110,7 +107,7 @@ def main():
             # Measure time taken by run_onboarding_data_assistant
             START_TIME = time.time()
             data_assistant_result = run_onboarding_data_assistant(batch_request, exclude_column_names=exclude_cols)
-            ELAPSED_TIME = round(time() - START_TIME, 2)
+            ELAPSED_TIME = round(time.time() - START_TIME, 2)
 
             # Log the elapsed time
             logger.info("\n#----------------------------------------------------------------------------")